@@ -0,0 +1,44 @@
+"""usuarios: versao_token (revogação de tokens) e AUTOINCREMENT no SQLite
+
+Revision ID: 4977e0010c4e
+Revises: ecbb2e714c82
+Create Date: 2026-10-19 04:49:03.344203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4977e0010c4e'
+down_revision: Union[str, Sequence[str], None] = 'ecbb2e714c82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    coluna = sa.Column(
+        'versao_token', sa.Integer(), server_default='0', nullable=False
+    )
+    if op.get_bind().dialect.name == 'sqlite':
+        # Ids de usuários removidos não podem voltar (o token carrega o id)
+        with op.batch_alter_table(
+            'usuarios',
+            recreate='always',
+            table_kwargs={'sqlite_autoincrement': True},
+        ) as batch_op:
+            batch_op.add_column(coluna)
+    else:
+        op.add_column('usuarios', coluna)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('usuarios', recreate='always') as batch_op:
+            batch_op.drop_column('versao_token')
+    else:
+        op.drop_column('usuarios', 'versao_token')
@@ -0,0 +1,29 @@
+"""orcamentos row_version
+
+Revision ID: 5e1d93b0c47f
+Revises: 8c2f40a7e6b5
+Create Date: 2026-10-19 04:02:31.447510
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1d93b0c47f'
+down_revision: Union[str, Sequence[str], None] = '8c2f40a7e6b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orcamentos', sa.Column('row_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('orcamentos') as batch_op:
+        batch_op.drop_column('row_version')
@@ -0,0 +1,105 @@
+"""auditoria: data_alteracao com fuso e índices compostos
+
+Revision ID: a3aeaf6fdfa0
+Revises: dd37f177be29
+Create Date: 2026-10-19 04:13:41.210664
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3aeaf6fdfa0'
+down_revision: Union[str, Sequence[str], None] = 'dd37f177be29'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (tabela, coluna) gravadas até aqui como ISO 8601 sem fuso, no horário local
+COLUNAS = [
+    ('historico_auditoria', 'data_alteracao'),
+    ('checkpoints_orcamento', 'data_referencia'),
+]
+
+
+def _para_utc(valor):
+    return datetime.fromisoformat(valor).astimezone(timezone.utc)
+
+
+def _para_iso_local(valor):
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return valor.astimezone().replace(tzinfo=None).isoformat()
+
+
+def _converter(tabela, coluna, tipo_antigo, tipo_novo, converter):
+    """
+    Troca o tipo da coluna convertendo os valores em Python. No SQLite o
+    batch copiaria a tabela com CAST, que transforma '2026-01-02 ...' em 2026.
+    """
+    temporaria = f'{coluna}_nova'
+    op.add_column(tabela, sa.Column(temporaria, tipo_novo, nullable=True))
+
+    conn = op.get_bind()
+    origem = sa.table(tabela, sa.column('id', sa.Integer), sa.column(coluna, tipo_antigo))
+    destino = sa.table(tabela, sa.column('id', sa.Integer), sa.column(temporaria, tipo_novo))
+    linhas = [
+        {'b_id': id_, 'valor': converter(valor)}
+        for id_, valor in conn.execute(sa.select(origem.c.id, origem.c[coluna]))
+    ]
+    if linhas:
+        conn.execute(
+            destino.update()
+            .where(destino.c.id == sa.bindparam('b_id'))
+            .values({temporaria: sa.bindparam('valor')}),
+            linhas,
+        )
+
+    with op.batch_alter_table(tabela) as batch_op:
+        batch_op.drop_column(coluna)
+        batch_op.alter_column(
+            temporaria,
+            new_column_name=coluna,
+            existing_type=tipo_novo,
+            nullable=False,
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for tabela, coluna in COLUNAS:
+        if op.get_bind().dialect.name == 'postgresql':
+            # Sem fuso, o PostgreSQL usa o TimeZone da sessão (o do servidor)
+            op.alter_column(
+                tabela, coluna,
+                existing_type=sa.VARCHAR(),
+                type_=sa.DateTime(timezone=True),
+                existing_nullable=False,
+                postgresql_using=f'{coluna}::timestamptz',
+            )
+        else:
+            _converter(tabela, coluna, sa.VARCHAR(), sa.DateTime(timezone=True), _para_utc)
+    op.create_index('ix_historico_auditoria_orcamento_data', 'historico_auditoria', ['orcamento_id', 'data_alteracao'], unique=False)
+    op.create_index('ix_historico_auditoria_usuario_data', 'historico_auditoria', ['usuario_id', 'data_alteracao'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_historico_auditoria_usuario_data', table_name='historico_auditoria')
+    op.drop_index('ix_historico_auditoria_orcamento_data', table_name='historico_auditoria')
+    for tabela, coluna in COLUNAS:
+        if op.get_bind().dialect.name == 'postgresql':
+            op.alter_column(
+                tabela, coluna,
+                existing_type=sa.DateTime(timezone=True),
+                type_=sa.VARCHAR(),
+                existing_nullable=False,
+                postgresql_using=(
+                    f"to_char({coluna}, 'YYYY-MM-DD\"T\"HH24:MI:SS.US')"
+                ),
+            )
+        else:
+            _converter(tabela, coluna, sa.DateTime(timezone=True), sa.VARCHAR(), _para_iso_local)
@@ -0,0 +1,37 @@
+"""alteracoes: AUTOINCREMENT no SQLite
+
+Revision ID: ecbb2e714c82
+Revises: 90745a3271e0
+Create Date: 2026-10-19 04:29:05.188096
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ecbb2e714c82'
+down_revision: Union[str, Sequence[str], None] = '90745a3271e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        # Ids expurgados pela retenção não podem voltar abaixo do corte
+        with op.batch_alter_table(
+            'alteracoes',
+            recreate='always',
+            table_kwargs={'sqlite_autoincrement': True},
+        ):
+            pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('alteracoes', recreate='always'):
+            pass
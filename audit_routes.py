@@ -1,14 +1,143 @@
-from datetime import datetime
+import base64
+import binascii
+from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
+from auth_routes import verificar_admin, verificar_token
 from database import get_db
-from models import HistoricoAuditoria
-from schemas import HistoricoAuditoriaResponse
+from models import HistoricoAuditoria, ItemOrcamento, Usuario
+from schemas import (
+    AuditoriaPaginaResponse,
+    EstadoOrcamentoResponse,
+    HistoricoAuditoriaResponse,
+    JobResponse,
+)
+from services import arquivo_auditoria, exportacao_auditoria, reconstrucao
+from services.jobs import enfileirar
+from services.request_timing import TimedRoute
+
+audit_router = APIRouter(
+    prefix="/auditoria", tags=["auditoria"], route_class=TimedRoute
+)
+
+
+def _codificar_cursor(registro: HistoricoAuditoria) -> str:
+    chave = f"{registro.data_alteracao.isoformat()}|{registro.id}"
+    return base64.urlsafe_b64encode(chave.encode()).decode()
+
+
+def _decodificar_cursor(cursor: str):
+    try:
+        data, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(data), int(id_)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+@audit_router.get("", response_model=AuditoriaPaginaResponse)
+def listar_auditoria(
+    usuario_id: Optional[int] = None,
+    de: Optional[datetime] = Query(None, description="A partir de (ISO 8601, inclusive)"),
+    ate: Optional[datetime] = Query(None, description="Até (ISO 8601, exclusive)"),
+    tipo: Optional[str] = Query(None, description="HORAS_ITEM ou DESCONTO_ORCAMENTO"),
+    cursor: Optional[str] = Query(None, description="`proximo` da página anterior"),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_token),
+):
+    """
+    Lista a auditoria de todos os orçamentos, da alteração mais recente para
+    a mais antiga, com filtros por usuário, período e tipo.
+
+    Paginação por cursor (keyset em data_alteracao, id): cada página custa o
+    mesmo, em qualquer profundidade. Datas sem fuso são tratadas como UTC.
+    """
+    query = db.query(HistoricoAuditoria)
+    if usuario_id is not None:
+        query = query.filter(HistoricoAuditoria.usuario_id == usuario_id)
+    if tipo is not None:
+        query = query.filter(HistoricoAuditoria.tipo_alteracao == tipo)
+    if de is not None:
+        query = query.filter(HistoricoAuditoria.data_alteracao >= de)
+    if ate is not None:
+        query = query.filter(HistoricoAuditoria.data_alteracao < ate)
+    if cursor is not None:
+        data, id_ = _decodificar_cursor(cursor)
+        query = query.filter(
+            or_(
+                HistoricoAuditoria.data_alteracao < data,
+                and_(
+                    HistoricoAuditoria.data_alteracao == data,
+                    HistoricoAuditoria.id < id_,
+                ),
+            )
+        )
 
-audit_router = APIRouter(prefix="/auditoria", tags=["auditoria"])
+    registros = (
+        query.order_by(
+            HistoricoAuditoria.data_alteracao.desc(), HistoricoAuditoria.id.desc()
+        )
+        .limit(limit + 1)
+        .all()
+    )
+    if len(registros) <= limit:
+        # Arquivados são mais antigos que qualquer evento da tabela
+        registros += arquivo_auditoria.buscar(
+            db,
+            limit + 1 - len(registros),
+            de=de,
+            ate=ate,
+            filtro=lambda e: (usuario_id is None or e.usuario_id == usuario_id)
+            and (tipo is None or e.tipo_alteracao == tipo),
+            por_data=True,
+            antes=(data, id_) if cursor is not None else None,
+        )
+    proximo = None
+    if len(registros) > limit:
+        registros = registros[:limit]
+        proximo = _codificar_cursor(registros[-1])
+    return {"itens": registros, "proximo": proximo}
+
+
+@audit_router.get("/exportar", response_class=StreamingResponse)
+def exportar_auditoria(
+    formato: str = Query(
+        exportacao_auditoria.CSV, pattern="^(csv|ndjson)$", description="csv ou ndjson"
+    ),
+    contrato_id: Optional[int] = None,
+    orcamento_id: Optional[int] = None,
+    usuario_id: Optional[int] = None,
+    de: Optional[datetime] = Query(None, description="A partir de (ISO 8601, inclusive)"),
+    ate: Optional[datetime] = Query(None, description="Até (ISO 8601, exclusive)"),
+    usuario_atual: Usuario = Depends(verificar_token),
+):
+    """
+    Exporta o histórico completo de auditoria (inclusive o arquivado), sem
+    limite de linhas, do evento mais antigo para o mais recente. Cada linha
+    traz contrato, número do orçamento e nome do usuário.
+
+    A resposta é enviada em blocos enquanto é lida do banco: a memória do
+    servidor não cresce com o tamanho da exportação.
+    """
+    return StreamingResponse(
+        exportacao_auditoria.exportar(
+            formato,
+            contrato_id=contrato_id,
+            orcamento_id=orcamento_id,
+            usuario_id=usuario_id,
+            de=de,
+            ate=ate,
+        ),
+        media_type=exportacao_auditoria.TIPOS_MIDIA[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="auditoria.{formato}"'
+        },
+    )
 
 
 @audit_router.get(
@@ -29,16 +158,80 @@ def listar_auditoria_orcamento(
     - Valor anterior → novo valor
     - Motivo da alteração (se fornecido)
     """
-    registros = (
-        db.query(HistoricoAuditoria)
-        .filter(HistoricoAuditoria.orcamento_id == orcamento_id)
-        .order_by(HistoricoAuditoria.id.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    return _pagina_com_arquivados(
+        db.query(HistoricoAuditoria).filter(
+            HistoricoAuditoria.orcamento_id == orcamento_id
+        ),
+        skip,
+        limit,
+        lambda quantidade: arquivo_auditoria.buscar(
+            db, quantidade, orcamento_id=orcamento_id
+        ),
     )
 
-    return registros
+
+@audit_router.get(
+    "/orcamentos/{orcamento_id}/estado", response_model=EstadoOrcamentoResponse
+)
+def obter_estado_orcamento(
+    orcamento_id: int,
+    em: datetime = Query(..., description="Instante desejado (ISO 8601)"),
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_token),
+):
+    """
+    Reconstrói horas dos itens e desconto do orçamento no instante `em`,
+    a partir do histórico de auditoria.
+
+    Parte do checkpoint mais próximo e reaplica só os eventos desde ele
+    (eventos_aplicados).
+    """
+    estado = reconstrucao.reconstruir_orcamento(db, orcamento_id, em)
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Orçamento não encontrado")
+    return estado
+
+
+@audit_router.post("/arquivar", response_model=JobResponse, status_code=202)
+def agendar_arquivamento(
+    response: Response,
+    dias: float = Query(None, ge=0, description="Arquivar eventos com mais de N dias"),
+    db: Session = Depends(get_db),
+    usuario_admin: Usuario = Depends(verificar_admin),
+):
+    """
+    Agenda em segundo plano a passagem dos eventos antigos da auditoria para
+    segmentos comprimidos (padrão: AUDITORIA_RETENCAO_DIAS). As listagens e
+    a reconstrução continuam enxergando os eventos arquivados.
+
+    Acompanhe em GET /jobs/{id} (também no header Location).
+    """
+    job = enfileirar(
+        db, "arquivar_auditoria", {"dias": dias}, usuario_id=usuario_admin.id
+    )
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+
+@audit_router.post("/checkpoints", response_model=JobResponse, status_code=202)
+def agendar_checkpoints(
+    response: Response,
+    k: int = Query(None, ge=1, description="Eventos mínimos desde o último checkpoint"),
+    db: Session = Depends(get_db),
+    usuario_admin: Usuario = Depends(verificar_admin),
+):
+    """
+    Agenda a criação de checkpoints da auditoria em segundo plano (útil para
+    um histórico antigo; normalmente o job roda sozinho a cada
+    AUDITORIA_CHECKPOINT_INTERVALO_S segundos).
+
+    Acompanhe em GET /jobs/{id} (também no header Location).
+    """
+    job = enfileirar(
+        db, "criar_checkpoints_auditoria", {"k": k}, usuario_id=usuario_admin.id
+    )
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
 
 
 @audit_router.get(
@@ -59,16 +252,43 @@ def listar_auditoria_item(
     - Horas anterior → novas horas
     - Motivo da alteração (se fornecido)
     """
-    registros = (
-        db.query(HistoricoAuditoria)
-        .filter(HistoricoAuditoria.item_orcamento_id == item_orcamento_id)
-        .order_by(HistoricoAuditoria.id.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+
+    def arquivados(quantidade):
+        # O índice do arquivo é por orçamento: acha o dono pelo item
+        item = db.get(ItemOrcamento, item_orcamento_id)
+        if item is None:
+            return []
+        return arquivo_auditoria.buscar(
+            db,
+            quantidade,
+            orcamento_id=item.orcamento_id,
+            filtro=lambda e: e.item_orcamento_id == item_orcamento_id,
+        )
+
+    return _pagina_com_arquivados(
+        db.query(HistoricoAuditoria).filter(
+            HistoricoAuditoria.item_orcamento_id == item_orcamento_id
+        ),
+        skip,
+        limit,
+        arquivados,
     )
 
-    return registros
+
+def _pagina_com_arquivados(query, skip: int, limit: int, arquivados):
+    """
+    Página por offset, do evento mais recente para o mais antigo: primeiro
+    os da tabela, depois os arquivados (mais antigos que qualquer um dela).
+    `arquivados(n)` devolve os n arquivados mais recentes do filtro.
+    """
+    registros = (
+        query.order_by(HistoricoAuditoria.id.desc()).offset(skip).limit(limit).all()
+    )
+    if len(registros) == limit:
+        return registros
+    # Sem nenhum da tabela na página, o offset avança pelos arquivados
+    pular = skip - query.count() if skip and not registros else 0
+    return registros + arquivados(pular + limit - len(registros))[pular:]
 
 
 def registrar_auditoria(
@@ -102,7 +322,7 @@ def registrar_auditoria(
         usuario_id=usuario_id,
         valor_anterior=Decimal(str(valor_anterior)),
         valor_novo=Decimal(str(valor_novo)),
-        data_alteracao=datetime.now().isoformat(),
+        data_alteracao=datetime.now(timezone.utc),
         motivo=motivo,
     )
 
@@ -1,16 +1,30 @@
-import hashlib
 import os
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from database import get_db
+from database import SessionLocal, get_db
 from models import Usuario
-from schemas import UsuarioCreate, UsuarioLogin, UsuarioResponse
+from schemas import (
+    ConsultaLentaResponse,
+    PerfilamentoCreate,
+    PerfilamentoResponse,
+    UsuarioCreate,
+    UsuarioLogin,
+    UsuarioResponse,
+)
+from services import senhas
+from services.cache_autenticacao import cache_autenticacao, digest_token
+from services.metrics import metricas
+from services.request_timing import TimedRoute
+from services.versoes_token import versoes_token
 
 # Configurações JWT
 # Em produção, defina a variável de ambiente SECRET_KEY com um valor seguro.
@@ -22,13 +36,25 @@ SECRET_KEY = os.environ.get(
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 horas
 
-auth_router = APIRouter(prefix="/auth", tags=["auth"])
+auth_router = APIRouter(prefix="/auth", tags=["auth"], route_class=TimedRoute)
 security = HTTPBearer()
 
 
 def hash_password(password: str) -> str:
-    """Fazer hash de senha usando SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Fazer hash de senha com scrypt (sal aleatório). Bloqueia: ~50-100 ms."""
+    return senhas.gerar_hash(password)
+
+
+async def _no_executor_de_senhas(funcao, *args):
+    """Roda o KDF nas threads dedicadas; fila cheia ou esgotada vira 503."""
+    try:
+        return await senhas.executor_senhas.executar(funcao, *args)
+    except senhas.SenhasOcupado:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Muitas autenticações simultâneas, tente novamente",
+            headers={"Retry-After": "1"},
+        )
 
 
 def criar_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -44,6 +70,34 @@ def criar_access_token(data: dict, expires_delta: Optional[timedelta] = None) ->
     return encoded_jwt
 
 
+def _decodificar_token(token: str) -> dict:
+    """Verifica assinatura e expiração do JWT e devolve as claims."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido ou expirado",
+        )
+    if payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido"
+        )
+    return payload
+
+
+def _usuario_das_claims(payload: dict) -> Usuario:
+    """Usuario transitório (fora da sessão) montado das claims, sem email."""
+    usuario = Usuario(
+        username=payload["sub"],
+        password_hash=None,
+        admin=payload["admin"],
+    )
+    usuario.id = payload["uid"]
+    usuario.versao_token = payload.get("ver", 0)
+    return usuario
+
+
 def verificar_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
@@ -51,56 +105,123 @@ def verificar_token(
     """
     Verificar se o token JWT é válido e retornar o usuário.
     Esta função é usada como dependency em endpoints que exigem autenticação.
-    """
-    token = credentials.credentials
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    Id, username e admin vêm das claims do token: a requisição não consulta
+    a tabela de usuários, só confere em memória se a versão do token não
+    foi revogada (services/versoes_token.py). Tokens já verificados ficam
+    no cache_autenticacao e não pagam de novo a assinatura.
+    """
+    digest = digest_token(credentials.credentials)
+    payload = cache_autenticacao.obter(digest)
+    if payload is None:
+        payload = _decodificar_token(credentials.credentials)
+        cache_autenticacao.guardar(digest, payload)
+
+    if "uid" not in payload:
+        # Token emitido antes das claims de usuário: vale até expirar
+        usuario = db.query(Usuario).filter(Usuario.username == payload["sub"]).first()
+        if usuario is None:
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido"
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Usuário não encontrado",
             )
-    except JWTError:
+        return usuario
+
+    if not versoes_token.valido(db, payload["uid"], payload.get("ver", 0)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido ou expirado",
+            detail="Token revogado, faça login novamente",
         )
+    return _usuario_das_claims(payload)
 
-    usuario = db.query(Usuario).filter(Usuario.username == username).first()
-    if usuario is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado"
+
+def _usuario_do_header(authorization: Optional[bytes]) -> Optional[Usuario]:
+    """verificar_token fora das rotas (middlewares), sem Depends."""
+    esquema, _, token = (authorization or b"").decode("latin-1").partition(" ")
+    if esquema.lower() != "bearer" or not token:
+        return None
+    db = SessionLocal()
+    try:
+        return verificar_token(
+            HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db
         )
+    except HTTPException:
+        return None
+    finally:
+        db.close()
 
-    return usuario
+
+def nivel_de_acesso(authorization: Optional[bytes]) -> Optional[str]:
+    """
+    "admin" ou "usuario" para um header Authorization com token válido;
+    None caso contrário.
+    """
+    usuario = _usuario_do_header(authorization)
+    if usuario is None:
+        return None
+    return "admin" if usuario.admin == 1 else "usuario"
+
+
+def id_do_usuario(authorization: Optional[bytes]) -> Optional[int]:
+    """Id do usuário de um header Authorization com token válido, ou None."""
+    usuario = _usuario_do_header(authorization)
+    return usuario.id if usuario is not None else None
 
 
-def verificar_admin(usuario: Usuario = Depends(verificar_token)) -> Usuario:
+def verificar_admin(
+    usuario: Usuario = Depends(verificar_token), db: Session = Depends(get_db)
+) -> Usuario:
     """
     Verificar se o usuário é admin.
     Esta função é usada como dependency em endpoints que exigem permissão de admin.
+
+    Além das claims, confere a versão do token e o flag de admin no banco
+    (uma linha, pela chave primária): rebaixar ou remover um admin em
+    qualquer worker corta o acesso às rotas de admin na hora, sem esperar
+    AUTH_VERSOES_TTL.
     """
     if usuario.admin != 1:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Apenas administradores podem realizar esta ação",
         )
+
+    # versao_token do usuário das claims é a do token (claim "ver")
+    linha = (
+        db.query(Usuario.versao_token, Usuario.admin)
+        .filter(Usuario.id == usuario.id)
+        .first()
+    )
+    versoes_token.atualizar(usuario.id, linha[0] if linha else None)
+    if linha is None or linha[0] != usuario.versao_token:
+        metricas.incrementar("auth_tokens_revogados_total")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revogado, faça login novamente",
+        )
+    if linha[1] != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas administradores podem realizar esta ação",
+        )
     return usuario
 
 
 @auth_router.get("/me", response_model=UsuarioResponse)
-def obter_usuario_atual(usuario_atual: Usuario = Depends(verificar_token)):
+def obter_usuario_atual(
+    db: Session = Depends(get_db), usuario_atual: Usuario = Depends(verificar_token)
+):
     """
     Obter as informações do usuário logado atualmente.
     """
-    return usuario_atual
+    # O usuário das claims não traz o email
+    return db.get(Usuario, usuario_atual.id) or usuario_atual
 
 
 @auth_router.post(
     "/registro", response_model=UsuarioResponse, status_code=status.HTTP_201_CREATED
 )
-def registrar_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
+async def registrar_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
     """
     Criar um novo usuário.
 
@@ -108,60 +229,120 @@ def registrar_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
     - **password**: Senha do usuário
     - **email**: Email do usuário (opcional)
     """
-    # Verificar se usuário já existe
-    usuario_existente = (
-        db.query(Usuario).filter(Usuario.username == usuario.username).first()
-    )
-    if usuario_existente:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Usuário já existe com esse username",
-        )
 
-    # Verificar se email já existe (se fornecido)
-    if usuario.email:
-        email_existente = (
-            db.query(Usuario).filter(Usuario.email == usuario.email).first()
+    def verificar_duplicados():
+        try:
+            _verificar_duplicados()
+        finally:
+            # Não segura uma conexão do pool enquanto espera o KDF
+            db.close()
+
+    def _verificar_duplicados():
+        # Verificar se usuário já existe
+        usuario_existente = (
+            db.query(Usuario).filter(Usuario.username == usuario.username).first()
         )
-        if email_existente:
+        if usuario_existente:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Email já cadastrado"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Usuário já existe com esse username",
             )
 
-    # Criar novo usuário
-    novo_usuario = Usuario(
-        username=usuario.username,
-        password_hash=hash_password(usuario.password),
-        email=usuario.email,
-        admin=0,  # Novos usuários são criados como usuários normais
-    )
+        # Verificar se email já existe (se fornecido)
+        if usuario.email:
+            email_existente = (
+                db.query(Usuario).filter(Usuario.email == usuario.email).first()
+            )
+            if email_existente:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Email já cadastrado",
+                )
+
+    def gravar(password_hash: str):
+        # Criar novo usuário
+        novo_usuario = Usuario(
+            username=usuario.username,
+            password_hash=password_hash,
+            email=usuario.email,
+            admin=0,  # Novos usuários são criados como usuários normais
+        )
 
-    db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
+        db.add(novo_usuario)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Registro simultâneo do mesmo username/email passou pela
+            # verificação enquanto este esperava o KDF
+            db.rollback()
+            _verificar_duplicados()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Usuário já existe com esse username",
+            )
+        db.refresh(novo_usuario)
+        return novo_usuario
 
-    return novo_usuario
+    await run_in_threadpool(verificar_duplicados)
+    password_hash = await _no_executor_de_senhas(senhas.gerar_hash, usuario.password)
+    return await run_in_threadpool(gravar, password_hash)
 
 
 @auth_router.post("/login")
-def login(credenciais: UsuarioLogin, db: Session = Depends(get_db)):
+async def login(credenciais: UsuarioLogin, db: Session = Depends(get_db)):
     """
     Fazer login com username e password.
 
-    Retorna um token JWT para usar em requisições autenticadas.
+    Retorna um token JWT para usar em requisições autenticadas. Hashes
+    antigos (SHA-256 sem sal) são trocados por scrypt no primeiro login.
     """
-    usuario = db.query(Usuario).filter(Usuario.username == credenciais.username).first()
 
-    if not usuario or usuario.password_hash != hash_password(credenciais.password):
+    def buscar_usuario():
+        try:
+            return (
+                db.query(Usuario)
+                .filter(Usuario.username == credenciais.username)
+                .first()
+            )
+        finally:
+            # Não segura uma conexão do pool enquanto espera o KDF
+            db.close()
+
+    usuario = await run_in_threadpool(buscar_usuario)
+
+    # Sem o usuário, confere contra um hash fictício: a resposta leva o
+    # mesmo tempo e não revela se o username existe
+    ok, novo_hash = await _no_executor_de_senhas(
+        senhas.conferir,
+        credenciais.password,
+        usuario.password_hash if usuario else senhas.HASH_FICTICIO,
+    )
+    if not ok or usuario is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Username ou password incorretos",
         )
 
+    if novo_hash:
+
+        def regravar_hash():
+            db.query(Usuario).filter(Usuario.id == usuario.id).update(
+                {Usuario.password_hash: novo_hash}
+            )
+            db.commit()
+
+        await run_in_threadpool(regravar_hash)
+
     # Criar token JWT
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = criar_access_token(
-        data={"sub": usuario.username}, expires_delta=access_token_expires
+        data={
+            "sub": usuario.username,
+            "uid": usuario.id,
+            "admin": usuario.admin,
+            "ver": usuario.versao_token,
+        },
+        expires_delta=access_token_expires,
     )
 
     return {
@@ -244,6 +425,7 @@ def deletar_usuario(
 
     db.delete(usuario)
     db.commit()
+    versoes_token.atualizar(user_id, None)
 
 
 @auth_router.post("/usuarios/{user_id}/promote", response_model=UsuarioResponse)
@@ -268,8 +450,10 @@ def promover_admin(
         )
 
     usuario.admin = 1
+    usuario.versao_token = Usuario.versao_token + 1  # revoga os tokens atuais
     db.commit()
     db.refresh(usuario)
+    versoes_token.atualizar(user_id, usuario.versao_token)
 
     return usuario
 
@@ -305,7 +489,96 @@ def remover_admin(
         )
 
     usuario.admin = 0
+    usuario.versao_token = Usuario.versao_token + 1  # revoga os tokens atuais
     db.commit()
     db.refresh(usuario)
+    versoes_token.atualizar(user_id, usuario.versao_token)
 
     return usuario
+
+
+# ========== DIAGNÓSTICO (ADMIN ONLY) ==========
+
+
+@auth_router.get("/consultas-lentas", response_model=list[ConsultaLentaResponse])
+def listar_consultas_lentas(
+    limite: int = Query(20, ge=1, le=500),
+    ordem: str = Query("total_ms", pattern="^(total_ms|max_ms|ocorrencias)$"),
+    usuario_admin: Usuario = Depends(verificar_admin),
+):
+    """
+    Listar as consultas SQL mais lentas desde o início do worker [ADMIN ONLY].
+
+    Cada formato de SQL traz duração total/máxima/média, rota de origem,
+    tipos dos parâmetros e o plano de execução capturado na primeira vez.
+    O limite de lentidão é configurado por SLOW_QUERY_MS.
+    """
+    from services.slow_query_log import slow_query_log
+
+    return slow_query_log.top(limite=limite, ordem=ordem)
+
+
+@auth_router.delete("/consultas-lentas", status_code=204)
+def limpar_consultas_lentas(usuario_admin: Usuario = Depends(verificar_admin)):
+    """
+    Limpar o registro de consultas lentas deste worker [ADMIN ONLY].
+    """
+    from services.slow_query_log import slow_query_log
+
+    slow_query_log.limpar()
+
+
+@auth_router.post("/perfilamento", response_model=PerfilamentoResponse)
+def iniciar_perfilamento(
+    dados: PerfilamentoCreate, usuario_admin: Usuario = Depends(verificar_admin)
+):
+    """
+    Ligar o perfilador por amostragem para as próximas N requisições que
+    correspondem à rota informada [ADMIN ONLY].
+
+    - **rota**: método e template, ex: "PUT /orcamentos/{id}"
+    - **requisicoes**: quantas requisições perfilar
+    - **intervalo_ms**: intervalo entre amostras de pilha
+    """
+    from services.profiler import perfilador
+
+    try:
+        perfilador.iniciar(dados.rota, dados.requisicoes, dados.intervalo_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return perfilador.status()
+
+
+@auth_router.get("/perfilamento", response_model=PerfilamentoResponse)
+def status_perfilamento(usuario_admin: Usuario = Depends(verificar_admin)):
+    """
+    Estado do perfilador por amostragem [ADMIN ONLY].
+    """
+    from services.profiler import perfilador
+
+    return perfilador.status()
+
+
+@auth_router.get("/perfilamento/pilhas", response_class=PlainTextResponse)
+def obter_pilhas_perfilamento(usuario_admin: Usuario = Depends(verificar_admin)):
+    """
+    Pilhas agregadas no formato "collapsed" [ADMIN ONLY].
+
+    Compatível com flamegraph.pl e speedscope:
+        flamegraph.pl pilhas.txt > flamegraph.svg
+    """
+    from services.profiler import perfilador
+
+    return PlainTextResponse(perfilador.pilhas_colapsadas())
+
+
+@auth_router.delete("/perfilamento", response_model=PerfilamentoResponse)
+def parar_perfilamento(usuario_admin: Usuario = Depends(verificar_admin)):
+    """
+    Desligar o perfilador antes de completar as N requisições [ADMIN ONLY].
+    """
+    from services.profiler import perfilador
+
+    perfilador.parar()
+    return perfilador.status()
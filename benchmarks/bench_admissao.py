@@ -0,0 +1,127 @@
+"""
+Rajada de listagens pesadas contra leituras baratas (transporte ASGI, sem rede).
+
+Mede o p50/p99 de GET /auth/me em três fases:
+
+- sem rajada (referência);
+- com rajada de GET /orcamentos/?limit=1000, sem controle de admissão;
+- com a mesma rajada e o controle de admissão (services/admissao.py).
+
+Também conta as listagens atendidas e as recusadas com 503.
+
+Execute:
+    python benchmarks/bench_admissao.py
+    python benchmarks/bench_admissao.py --listagens-simultaneas 8 --duracao 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bench_endpoints import autenticar, cliente_asgi, percentil
+
+
+def preparar_banco():
+    caminho = os.path.join(tempfile.mkdtemp(prefix="bench-admissao-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    from gerar_dados import gerar_dados
+
+    gerar_dados(
+        clientes=10,
+        contratos_por_cliente=1,
+        projetos_por_contrato=1,
+        ciclos=1,
+        fases_por_ciclo=2,
+        atividades_por_fase=20,
+        orcamentos=1000,
+        itens_por_orcamento=5,
+        # Só aprovados: a listagem de rascunhos recalcula e grava, e a rajada
+        # mediria conflitos de versão em vez de carga de leitura
+        proporcao_rascunhos=0.0,
+    )
+
+
+async def medir(client, headers, duracao: float, listagens: int) -> dict:
+    """Requisições sequenciais a GET /auth/me com `listagens` listagens em laço."""
+    fim = time.perf_counter() + duracao
+    resultados = {"listagens_ok": 0, "listagens_503": 0}
+
+    async def listar():
+        while time.perf_counter() < fim:
+            resposta = await client.get(
+                "/orcamentos/", params={"limit": 1000}, headers=headers
+            )
+            if resposta.status_code == 503:
+                resultados["listagens_503"] += 1
+                await asyncio.sleep(0.05)
+            else:
+                resultados["listagens_ok"] += 1
+
+    async def ler():
+        latencias = []
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            resposta = await client.get("/auth/me", headers=headers)
+            resposta.raise_for_status()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        return latencias
+
+    tarefas = [asyncio.create_task(listar()) for _ in range(listagens)]
+    latencias = await ler()
+    await asyncio.gather(*tarefas)
+    return {
+        "requisicoes": len(latencias),
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        **resultados,
+    }
+
+
+async def executar(args):
+    from services.admissao import compartimentos
+
+    async with cliente_asgi() as client:
+        headers = await autenticar(client)
+        fases = (
+            ("sem rajada", 0, True),
+            ("rajada, sem controle", args.listagens_simultaneas, False),
+            ("rajada, com controle", args.listagens_simultaneas, True),
+        )
+        originais = dict(compartimentos)
+        for nome, listagens, com_controle in fases:
+            if not com_controle:
+                compartimentos.clear()
+            try:
+                resultado = await medir(client, headers, args.duracao, listagens)
+            finally:
+                compartimentos.update(originais)
+            print(
+                f"  {nome:<24} p50 {resultado['p50_ms']:>8.2f} ms  "
+                f"p99 {resultado['p99_ms']:>8.2f} ms  "
+                f"({resultado['requisicoes']} leituras, "
+                f"{resultado['listagens_ok']} listagens, "
+                f"{resultado['listagens_503']} × 503)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--listagens-simultaneas", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos por fase")
+    args = parser.parse_args()
+
+    preparar_banco()
+    print(
+        f"✓ GET /auth/me com {args.listagens_simultaneas} listagens simultâneas "
+        f"({args.duracao:.0f}s por fase)"
+    )
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Custo da autenticação por requisição (dependency verificar_token).
+
+Mede, em µs por chamada, sobre um banco SQLite temporário:
+- jwt.decode sozinho (HMAC + JSON + validação das claims);
+- verificar_token sem cache (decode + versão do token em memória);
+- verificar_token com o token já no cache_autenticacao;
+- verificar_token com um token sem as claims de usuário (formato antigo,
+  que ainda consulta a tabela de usuários a cada requisição).
+
+Com PostgreSQL a consulta do usuário ainda soma uma ida e volta de rede.
+
+Execute:
+    python benchmarks/bench_autenticacao.py
+    python benchmarks/bench_autenticacao.py --repeticoes 20000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def preparar_banco():
+    caminho = os.path.join(tempfile.mkdtemp(prefix="bench-auth-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    from main import criar_admin_automatico
+
+    criar_admin_automatico()
+
+
+def _cronometrar(funcao, repeticoes: int) -> dict:
+    for _ in range(min(200, repeticoes)):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter_ns()
+        funcao()
+        tempos.append(time.perf_counter_ns() - inicio)
+    return {
+        "mediana_us": statistics.median(tempos) / 1000,
+        "p99_us": sorted(tempos)[int(len(tempos) * 0.99) - 1] / 1000,
+    }
+
+
+def executar(repeticoes: int):
+    from fastapi.security import HTTPAuthorizationCredentials
+    from jose import jwt
+
+    from auth_routes import ALGORITHM, SECRET_KEY, criar_access_token, verificar_token
+    from database import SessionLocal
+    from models import Usuario
+    from services.cache_autenticacao import cache_autenticacao
+
+    db = SessionLocal()
+    admin = db.query(Usuario).filter(Usuario.username == "admin").one()
+    token = criar_access_token(
+        {
+            "sub": admin.username,
+            "uid": admin.id,
+            "admin": admin.admin,
+            "ver": admin.versao_token,
+        }
+    )
+    credenciais = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    legado = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=criar_access_token({"sub": "admin"})
+    )
+
+    def sem_cache():
+        cache_autenticacao.limpar()
+        verificar_token(credenciais, db)
+        db.rollback()  # devolve a conexão como ao fim de uma requisição
+
+    def com_cache():
+        verificar_token(credenciais, db)
+
+    def token_legado():
+        verificar_token(legado, db)
+        db.rollback()
+
+    fases = [
+        ("jwt.decode", lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])),
+        ("verificar_token sem cache", sem_cache),
+        ("verificar_token com cache", com_cache),
+        ("token sem claims de usuário", token_legado),
+    ]
+    try:
+        for nome, funcao in fases:
+            resultado = _cronometrar(funcao, repeticoes)
+            print(
+                f"  {nome:<28} mediana {resultado['mediana_us']:>8.1f} µs  "
+                f"p99 {resultado['p99_us']:>8.1f} µs"
+            )
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5000)
+    args = parser.parse_args()
+
+    preparar_banco()
+    print(f"✓ Autenticação por requisição ({args.repeticoes} chamadas por fase)")
+    executar(args.repeticoes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
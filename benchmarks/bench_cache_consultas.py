@@ -0,0 +1,109 @@
+"""
+Listagens de cadastro com e sem o cache de consultas (transporte ASGI).
+
+Mede o p50/p99 de GET /contratos/?limit=1000, /projetos/?limit=1000 e
+/catalogo/?limit=1000 com o cache desligado e ligado, e a taxa de acerto e a
+memória ocupada ao final. Uma escrita em contratos a cada `--escrever-a-cada`
+requisições invalida as listagens de contratos.
+
+Execute:
+    python benchmarks/bench_cache_consultas.py
+    python benchmarks/bench_cache_consultas.py --requisicoes 500 --escrever-a-cada 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bench_endpoints import autenticar, cliente_asgi, percentil
+
+URLS = (
+    "/contratos/?limit=1000",
+    "/projetos/?limit=1000",
+    "/catalogo/?limit=1000",
+)
+
+
+def preparar_banco():
+    caminho = os.path.join(tempfile.mkdtemp(prefix="bench-cache-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    from gerar_dados import gerar_dados
+
+    gerar_dados(
+        clientes=500,
+        contratos_por_cliente=2,
+        projetos_por_contrato=1,
+        ciclos=5,
+        fases_por_ciclo=10,
+        atividades_por_fase=20,
+        orcamentos=10,
+        itens_por_orcamento=5,
+    )
+
+
+async def medir(client, headers, requisicoes: int, escrever_a_cada: int) -> dict:
+    latencias = {url: [] for url in URLS}
+    for i in range(requisicoes):
+        if escrever_a_cada and i and i % escrever_a_cada == 0:
+            resposta = await client.put(
+                "/contratos/1", json={"valor_ust": f"{100 + i}.0000"}, headers=headers
+            )
+            resposta.raise_for_status()
+        for url in URLS:
+            inicio = time.perf_counter()
+            resposta = await client.get(url, headers=headers)
+            resposta.raise_for_status()
+            latencias[url].append((time.perf_counter() - inicio) * 1000)
+    return {
+        url: (round(percentil(valores, 50), 2), round(percentil(valores, 99), 2))
+        for url, valores in latencias.items()
+    }
+
+
+async def executar(args):
+    from services.cache_consultas import cache_consultas
+
+    async with cliente_asgi() as client:
+        headers = await autenticar(client)
+        maximo_bytes = cache_consultas.maximo_bytes
+
+        for nome, orcamento in (("sem cache", 0), ("com cache", maximo_bytes)):
+            cache_consultas.limpar()
+            cache_consultas.maximo_bytes = orcamento
+            cache_consultas.hits = cache_consultas.misses = 0
+            resultado = await medir(
+                client, headers, args.requisicoes, args.escrever_a_cada
+            )
+            print(f"  {nome}")
+            for url, (p50, p99) in resultado.items():
+                print(f"    {url:<26} p50 {p50:>7.2f} ms  p99 {p99:>7.2f} ms")
+
+        total = cache_consultas.hits + cache_consultas.misses
+        print(
+            f"  taxa de acerto {cache_consultas.hits / total:.1%}, "
+            f"{len(cache_consultas)} entradas, "
+            f"{cache_consultas.bytes / 1024:.0f} KiB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requisicoes", type=int, default=200, help="por URL")
+    parser.add_argument("--escrever-a-cada", type=int, default=20)
+    args = parser.parse_args()
+
+    preparar_banco()
+    print(
+        f"✓ {args.requisicoes} requisições por URL, uma escrita em contratos a "
+        f"cada {args.escrever_a_cada}"
+    )
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
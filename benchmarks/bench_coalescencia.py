@@ -0,0 +1,134 @@
+"""
+Rajada de GETs idênticos (dashboard aberto por muitos usuários ao mesmo tempo).
+
+Dispara rodadas de N requisições simultâneas a GET /catalogo/?tipo=ATIVIDADE
+e GET /contratos/?status=ativo&limit=1000, sem e com a coalescência
+(services/coalescencia.py), e mede p50/p99 por requisição, quantas vezes as
+rotas realmente executaram e quantas o controle de admissão recusou com 503.
+
+Execute:
+    python benchmarks/bench_coalescencia.py
+    python benchmarks/bench_coalescencia.py --simultaneas 100 --rodadas 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bench_endpoints import autenticar, cliente_asgi, percentil
+
+URLS = ("/catalogo/?tipo=ATIVIDADE", "/contratos/?status=ativo&limit=1000")
+
+
+def preparar_banco():
+    caminho = os.path.join(tempfile.mkdtemp(prefix="bench-coalescencia-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    from gerar_dados import gerar_dados
+
+    gerar_dados(
+        clientes=500,
+        contratos_por_cliente=2,
+        projetos_por_contrato=1,
+        ciclos=5,
+        fases_por_ciclo=10,
+        atividades_por_fase=20,
+        orcamentos=10,
+        itens_por_orcamento=5,
+    )
+
+
+def _middleware(app):
+    """A instância do SingleFlightMiddleware na pilha já montada do app."""
+    from services.coalescencia import SingleFlightMiddleware
+
+    camada = app.middleware_stack
+    while not isinstance(camada, SingleFlightMiddleware):
+        camada = camada.app
+    return camada
+
+
+async def medir(client, headers, simultaneas: int, rodadas: int) -> dict:
+    from services.metrics import metricas
+
+    def execucoes():
+        contadores, _ = metricas._agregar()
+        return contadores.get(("coalescencia_requisicoes_total", (("papel", "lider"),)), 0)
+
+    latencias = []
+    recusadas = 0
+    antes = execucoes()
+    inicio_total = time.perf_counter()
+    for _ in range(rodadas):
+        for url in URLS:
+
+            async def uma():
+                nonlocal recusadas
+                inicio = time.perf_counter()
+                resposta = await client.get(url, headers=headers)
+                if resposta.status_code == 503:  # controle de admissão
+                    recusadas += 1
+                    return
+                resposta.raise_for_status()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+            await asyncio.gather(*(uma() for _ in range(simultaneas)))
+    return {
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "total_s": round(time.perf_counter() - inicio_total, 2),
+        "execucoes": execucoes() - antes,
+        "recusadas": recusadas,
+    }
+
+
+async def executar(args):
+    from main import app
+
+    async with cliente_asgi() as client:
+        headers = await autenticar(client)
+        await client.get(URLS[0], headers=headers)  # monta a pilha de middlewares
+        middleware = _middleware(app)
+        prefixos = middleware.prefixos
+
+        for nome, ativa in (("sem coalescência", False), ("com coalescência", True)):
+            middleware.prefixos = prefixos if ativa else ("/nenhum",)
+            resultado = await medir(client, headers, args.simultaneas, args.rodadas)
+            execucoes = (
+                f"{resultado['execucoes']:.0f}"
+                if ativa
+                else str(
+                    args.simultaneas * args.rodadas * len(URLS)
+                    - resultado["recusadas"]
+                )
+            )
+            print(
+                f"  {nome:<18} p50 {resultado['p50_ms']:>8.2f} ms  "
+                f"p99 {resultado['p99_ms']:>8.2f} ms  "
+                f"total {resultado['total_s']:>6.2f} s  "
+                f"({execucoes} execuções das rotas, "
+                f"{resultado['recusadas']} × 503)"
+            )
+        middleware.prefixos = prefixos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--simultaneas", type=int, default=50)
+    parser.add_argument("--rodadas", type=int, default=5)
+    args = parser.parse_args()
+
+    preparar_banco()
+    print(
+        f"✓ {args.rodadas} rodadas de {args.simultaneas} GETs idênticos "
+        f"em {len(URLS)} URLs"
+    )
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
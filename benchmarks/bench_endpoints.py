@@ -0,0 +1,288 @@
+"""
+Benchmark em processo de todos os routers (transporte ASGI, sem rede).
+
+Para cada endpoint mede p50/p95/p99 e consultas SQL por requisição, e grava
+o resultado em JSON para comparar execuções.
+
+Execute (sobre um banco gerado por benchmarks/gerar_dados.py):
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --database-url sqlite:///./bench.db \
+        --repeticoes 100 --concorrencia 4 --comparar benchmarks/resultados/x.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(RAIZ)
+
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil por interpolação linear (p entre 0 e 100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    fracao = posicao - inferior
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * fracao
+
+
+def resumir(latencias_ms: list, consultas: int, erros: int) -> dict:
+    requisicoes = len(latencias_ms)
+    return {
+        "requisicoes": requisicoes,
+        "erros": erros,
+        "p50_ms": round(percentil(latencias_ms, 50), 3),
+        "p95_ms": round(percentil(latencias_ms, 95), 3),
+        "p99_ms": round(percentil(latencias_ms, 99), 3),
+        "media_ms": round(sum(latencias_ms) / requisicoes, 3) if requisicoes else 0,
+        "consultas_por_requisicao": round(consultas / requisicoes, 2)
+        if requisicoes
+        else 0,
+    }
+
+
+def cliente_asgi():
+    """AsyncClient do httpx ligado diretamente à aplicação (sem rede)."""
+    import httpx
+
+    from main import aquecer_aplicacao, app
+
+    aquecer_aplicacao()
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    )
+
+
+async def autenticar(client, username="admin", password="admin123") -> dict:
+    resposta = await client.post(
+        "/auth/login", json={"username": username, "password": password}
+    )
+    resposta.raise_for_status()
+    return {"Authorization": f"Bearer {resposta.json()['access_token']}"}
+
+
+def montar_cenarios() -> list:
+    """
+    Um cenário por endpoint de leitura de cada router, mais as escritas que
+    podem ser repetidas sem esgotar os dados (criar orçamento, alterar horas
+    e desconto). Usa os primeiros registros existentes no banco.
+    """
+    from database import SessionLocal
+    from models import (
+        Cliente,
+        Contrato,
+        ItemOrcamento,
+        Orcamento,
+        Projeto,
+        ServicosCatalogo,
+    )
+
+    db = SessionLocal()
+    try:
+        cliente = db.query(Cliente).first()
+        contrato = db.query(Contrato).filter(Contrato.status == "ativo").first()
+        projeto = (
+            db.query(Projeto).filter(Projeto.contrato_id == contrato.id).first()
+            if contrato
+            else None
+        )
+        orcamento = db.query(Orcamento).filter(Orcamento.status == "Rascunho").first()
+        item = (
+            db.query(ItemOrcamento)
+            .filter(ItemOrcamento.orcamento_id == orcamento.id)
+            .first()
+            if orcamento
+            else None
+        )
+        atividades = [
+            a.id
+            for a in db.query(ServicosCatalogo)
+            .filter(ServicosCatalogo.tipo == "ATIVIDADE")
+            .limit(10)
+        ]
+    finally:
+        db.close()
+
+    if not all([cliente, contrato, projeto, orcamento, item, atividades]):
+        raise SystemExit(
+            "✗ Banco sem dados suficientes. "
+            "Rode antes: python benchmarks/gerar_dados.py"
+        )
+
+    novo_orcamento = {
+        "contrato_id": contrato.id,
+        "projeto_id": projeto.id,
+        "itens": [{"atividade_id": a, "horas_estimadas": "8"} for a in atividades],
+    }
+
+    return [
+        # auth
+        ("auth_me", "GET", "/auth/me", None),
+        ("auth_listar_usuarios", "GET", "/auth/usuarios", None),
+        # clientes
+        ("clientes_listar", "GET", "/clientes/", None),
+        ("clientes_obter", "GET", f"/clientes/{cliente.id}", None),
+        # contratos
+        ("contratos_listar", "GET", "/contratos/", None),
+        ("contratos_listar_ativos", "GET", "/contratos/?status=ativo", None),
+        ("contratos_obter", "GET", f"/contratos/{contrato.id}", None),
+        # catálogo
+        ("catalogo_listar", "GET", "/catalogo/", None),
+        ("catalogo_listar_atividades", "GET", "/catalogo/?tipo=ATIVIDADE", None),
+        ("catalogo_obter", "GET", f"/catalogo/{atividades[0]}", None),
+        # projetos
+        ("projetos_listar", "GET", "/projetos/", None),
+        ("projetos_obter", "GET", f"/projetos/{projeto.id}", None),
+        # orçamentos
+        ("orcamentos_listar", "GET", "/orcamentos/", None),
+        ("orcamentos_listar_rascunhos", "GET", "/orcamentos/?status=Rascunho", None),
+        ("orcamentos_obter", "GET", f"/orcamentos/{orcamento.id}", None),
+        ("orcamentos_criar", "POST", "/orcamentos/", novo_orcamento),
+        (
+            "orcamentos_alterar_horas",
+            "PATCH",
+            f"/orcamentos/{orcamento.id}/itens/{item.id}",
+            {"horas_estimadas": "12"},
+        ),
+        (
+            "orcamentos_alterar_desconto",
+            "PATCH",
+            f"/orcamentos/{orcamento.id}/desconto",
+            {"desconto_percentual": "5"},
+        ),
+        # auditoria
+        ("auditoria_orcamento", "GET", f"/auditoria/orcamentos/{orcamento.id}", None),
+        ("auditoria_item", "GET", f"/auditoria/itens/{item.id}", None),
+    ]
+
+
+async def medir(client, headers, cenario, repeticoes: int, concorrencia: int):
+    from services.query_detector import contar_consultas
+
+    nome, metodo, caminho, corpo = cenario
+    latencias = []
+    erros = 0
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def uma_requisicao():
+        nonlocal erros
+        async with semaforo:
+            inicio = time.perf_counter()
+            resposta = await client.request(
+                metodo, caminho, json=corpo, headers=headers
+            )
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code >= 400:
+                erros += 1
+
+    # Uma requisição de aquecimento fora da medição
+    await client.request(metodo, caminho, json=corpo, headers=headers)
+
+    with contar_consultas() as contador:
+        await asyncio.gather(*(uma_requisicao() for _ in range(repeticoes)))
+
+    return nome, resumir(latencias, contador.total, erros)
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, text=True
+        ).strip()
+    except Exception:
+        return ""
+
+
+async def executar(repeticoes: int, concorrencia: int, filtro: str = "") -> dict:
+    from database import DATABASE_URL
+
+    cenarios = [c for c in montar_cenarios() if filtro in c[0]]
+    resultados = {}
+
+    async with cliente_asgi() as client:
+        headers = await autenticar(client)
+        for cenario in cenarios:
+            nome, resumo = await medir(
+                client, headers, cenario, repeticoes, concorrencia
+            )
+            resultados[nome] = resumo
+            print(
+                f"  {nome:<32} p50={resumo['p50_ms']:>8.2f}ms "
+                f"p95={resumo['p95_ms']:>8.2f}ms p99={resumo['p99_ms']:>8.2f}ms "
+                f"sql/req={resumo['consultas_por_requisicao']:>6} "
+                f"erros={resumo['erros']}"
+            )
+
+    return {
+        "executado_em": datetime.now().isoformat(),
+        "commit": _commit_atual(),
+        "banco": DATABASE_URL.split("@")[-1],
+        "repeticoes": repeticoes,
+        "concorrencia": concorrencia,
+        "endpoints": resultados,
+    }
+
+
+def comparar(atual: dict, anterior: dict):
+    """Imprime a variação de p95 e consultas/requisição entre duas execuções."""
+    print(f"\nComparação com {anterior.get('commit') or anterior['executado_em']}:")
+    for nome, resumo in atual["endpoints"].items():
+        antes = anterior["endpoints"].get(nome)
+        if not antes:
+            continue
+        variacao = (
+            (resumo["p95_ms"] - antes["p95_ms"]) / antes["p95_ms"] * 100
+            if antes["p95_ms"]
+            else 0
+        )
+        print(
+            f"  {nome:<32} p95 {antes['p95_ms']:>8.2f} → {resumo['p95_ms']:>8.2f}ms "
+            f"({variacao:+6.1f}%)  sql/req {antes['consultas_por_requisicao']} → "
+            f"{resumo['consultas_por_requisicao']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="sobrescreve DATABASE_URL")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--concorrencia", type=int, default=1)
+    parser.add_argument("--filtro", default="", help="só cenários com este trecho")
+    parser.add_argument("--saida", help="arquivo JSON de saída")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    resultado = asyncio.run(
+        executar(args.repeticoes, args.concorrencia, args.filtro)
+    )
+
+    saida = args.saida or os.path.join(
+        DIRETORIO_RESULTADOS,
+        f"endpoints_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n✓ Resultado salvo em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Rajada de logins contra o resto da API (transporte ASGI, sem rede).
+
+Mede o p50/p99 de uma rota comum (GET /clientes/) em três fases:
+
+- sem rajada (referência);
+- com rajada, KDF no executor dedicado (services/senhas.py);
+- com rajada, KDF no threadpool das rotas (como seria um login síncrono
+  com scrypt), para comparação.
+
+Execute:
+    python benchmarks/bench_login.py
+    python benchmarks/bench_login.py --logins-simultaneos 64 --duracao 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bench_endpoints import autenticar, cliente_asgi, percentil
+
+
+def preparar_banco():
+    caminho = os.path.join(tempfile.mkdtemp(prefix="bench-login-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    # A rajada mede o KDF, não o limite de taxa (que a barraria com 429)
+    os.environ["RATE_LIMIT_LOGIN_IP"] = os.environ["RATE_LIMIT_LOGIN_USUARIO"] = "0"
+
+    from gerar_dados import gerar_dados
+
+    gerar_dados(
+        clientes=20,
+        contratos_por_cliente=1,
+        projetos_por_contrato=1,
+        ciclos=1,
+        fases_por_ciclo=1,
+        atividades_por_fase=5,
+        orcamentos=10,
+        itens_por_orcamento=5,
+    )
+
+
+async def medir(client, headers, duracao: float, logins: int) -> dict:
+    """Requisições sequenciais a GET /clientes/ com `logins` logins em laço."""
+    fim = time.perf_counter() + duracao
+    resultados = {"login_ok": 0, "login_503": 0}
+
+    async def logar():
+        while time.perf_counter() < fim:
+            resposta = await client.post(
+                "/auth/login", json={"username": "admin", "password": "admin123"}
+            )
+            if resposta.status_code == 503:
+                resultados["login_503"] += 1
+                await asyncio.sleep(0.05)
+            else:
+                resultados["login_ok"] += 1
+
+    async def ler():
+        latencias = []
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            resposta = await client.get("/clientes/", headers=headers)
+            resposta.raise_for_status()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        return latencias
+
+    tarefas = [asyncio.create_task(logar()) for _ in range(logins)]
+    latencias = await ler()
+    await asyncio.gather(*tarefas)
+    return {
+        "requisicoes": len(latencias),
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        **resultados,
+    }
+
+
+async def executar(args):
+    from starlette.concurrency import run_in_threadpool
+
+    from services import senhas
+
+    async with cliente_asgi() as client:
+        headers = await autenticar(client)
+        fases = [("sem rajada", 0, None)]
+        fases.append(("rajada, executor dedicado", args.logins_simultaneos, None))
+
+        async def no_threadpool(funcao, *argumentos):
+            return await run_in_threadpool(funcao, *argumentos)
+
+        fases.append(
+            ("rajada, threadpool das rotas", args.logins_simultaneos, no_threadpool)
+        )
+
+        original = senhas.executor_senhas.executar
+        for nome, logins, substituto in fases:
+            senhas.executor_senhas.executar = substituto or original
+            try:
+                resultado = await medir(client, headers, args.duracao, logins)
+            finally:
+                senhas.executor_senhas.executar = original
+            print(
+                f"  {nome:<30} p50 {resultado['p50_ms']:>8.2f} ms  "
+                f"p99 {resultado['p99_ms']:>8.2f} ms  "
+                f"({resultado['requisicoes']} leituras, "
+                f"{resultado['login_ok']} logins, {resultado['login_503']} × 503)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins-simultaneos", type=int, default=32)
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos por fase")
+    args = parser.parse_args()
+
+    preparar_banco()
+    print(
+        f"✓ GET /clientes/ com {args.logins_simultaneos} logins simultâneos "
+        f"({args.duracao:.0f}s por fase)"
+    )
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
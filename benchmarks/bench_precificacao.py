@@ -0,0 +1,283 @@
+"""
+Microbenchmarks do núcleo de precificação, sem banco de dados.
+
+Mede tempo e alocações por item de:
+- calcular_item_orcamento (preço de um item);
+- recalculate_orcamento para orçamentos de 10, 1k e 100k itens;
+- calcular_valor_liquido (aplicação do desconto).
+
+Os objetos do ORM são substituídos por fakes em memória, então o resultado
+reflete só a aritmética e o laço do recálculo.
+
+Execute:
+    python benchmarks/bench_precificacao.py
+    python benchmarks/bench_precificacao.py --tamanhos 10,1000 --repeticoes 20
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import services.orcamento_service as orcamento_service  # noqa: E402
+from models import (  # noqa: E402
+    VersaoTabela,
+    calcular_item_orcamento,
+    calcular_valor_liquido,
+)
+from services.catalogo_cache import CatalogoCache  # noqa: E402
+
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+ATIVIDADES = 3000
+
+
+# ========== FAKES ==========
+
+
+class ItemFake:
+    __slots__ = (
+        "atividade_id",
+        "horas_estimadas",
+        "valor_ust_snapshot",
+        "complexidade_snapshot",
+        "subtotal_ust",
+        "subtotal_bruto",
+    )
+
+    def __init__(self, atividade_id, horas_estimadas, valor_ust_snapshot):
+        self.atividade_id = atividade_id
+        self.horas_estimadas = horas_estimadas
+        self.valor_ust_snapshot = valor_ust_snapshot
+        self.complexidade_snapshot = Decimal("0.0000")
+        self.subtotal_ust = Decimal("0.0000")
+        self.subtotal_bruto = Decimal("0.0000")
+
+
+class OrcamentoFake:
+    __slots__ = (
+        "status",
+        "itens",
+        "desconto_percentual",
+        "valor_total_bruto",
+        "valor_total_liquido",
+    )
+
+    def __init__(self, itens, desconto_percentual):
+        self.status = "Rascunho"
+        self.itens = itens
+        self.desconto_percentual = desconto_percentual
+        self.valor_total_bruto = Decimal("0.0000")
+        self.valor_total_liquido = Decimal("0.0000")
+
+
+class _ConsultaFake:
+    def __init__(self, linhas):
+        self._linhas = linhas
+
+    def filter(self, *criterios):
+        return self
+
+    def all(self):
+        return self._linhas
+
+    def __iter__(self):
+        return iter(self._linhas)
+
+
+class SessaoFake:
+    """Só o que recalculate_orcamento e o cache do catálogo usam da Session."""
+
+    def __init__(self, complexidades):
+        self._linhas = list(complexidades.items())
+        self.info = {}
+
+    def query(self, *entidades):
+        if entidades[0].class_ is VersaoTabela:
+            return _ConsultaFake([])  # catálogo nunca alterado: versão 0
+        return _ConsultaFake(self._linhas)
+
+    def refresh(self, objeto):
+        pass
+
+    def commit(self):
+        pass
+
+
+def _dados(rnd, itens: int):
+    complexidades = {
+        atividade_id: Decimal(rnd.randint(5, 80)) / 10
+        for atividade_id in range(1, ATIVIDADES + 1)
+    }
+    valor_ust = Decimal(rnd.randint(10000, 30000)) / 100
+    linhas = [
+        (
+            rnd.randint(1, ATIVIDADES),
+            Decimal(rnd.randint(1, 400)) / 4,
+            valor_ust,
+        )
+        for _ in range(itens)
+    ]
+    return complexidades, linhas
+
+
+# ========== MEDIÇÃO ==========
+
+
+def _cronometrar(funcao, repeticoes: int) -> list:
+    """Tempos (ns) de `repeticoes` execuções de funcao()."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter_ns()
+        funcao()
+        tempos.append(time.perf_counter_ns() - inicio)
+    return tempos
+
+
+def _alocacoes(funcao) -> tuple:
+    """(pico, retido) em bytes alocados durante uma execução de funcao()."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        resultado = funcao()  # noqa: F841 - mantém o resultado vivo na medição
+        atual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico - base, atual - base
+
+
+def _resumo(tempos_ns: list, itens: int, pico: int, retido: int) -> dict:
+    return {
+        "itens": itens,
+        "repeticoes": len(tempos_ns),
+        "mediana_ns_por_item": round(statistics.median(tempos_ns) / itens, 1),
+        "minimo_ns_por_item": round(min(tempos_ns) / itens, 1),
+        "pico_bytes_por_item": round(pico / itens, 1),
+        "retido_bytes_por_item": round(retido / itens, 1),
+    }
+
+
+# ========== CENÁRIOS ==========
+
+
+def bench_item(rnd, itens: int, repeticoes: int) -> dict:
+    complexidades, linhas = _dados(rnd, itens)
+    entradas = [(horas, complexidades[a], valor) for a, horas, valor in linhas]
+
+    def precificar():
+        return [calcular_item_orcamento(h, c, v) for h, c, v in entradas]
+
+    tempos = _cronometrar(precificar, repeticoes)
+    return _resumo(tempos, itens, *_alocacoes(precificar))
+
+
+def bench_recalculo(rnd, itens: int, repeticoes: int) -> dict:
+    complexidades, linhas = _dados(rnd, itens)
+    sessao = SessaoFake(complexidades)
+    # Cache próprio e já carregado: mede o recálculo, não a carga do catálogo
+    cache = CatalogoCache()
+    cache.complexidades(sessao)
+
+    def novo_orcamento():
+        return OrcamentoFake(
+            [ItemFake(a, horas, valor) for a, horas, valor in linhas],
+            Decimal("7.5"),
+        )
+
+    recalcular = orcamento_service.recalculate_orcamento
+    cache_original = orcamento_service.catalogo_cache
+    orcamento_service.catalogo_cache = cache
+    try:
+        orcamentos = [novo_orcamento() for _ in range(repeticoes)]
+        fila = iter(orcamentos)
+        tempos = _cronometrar(
+            lambda: recalcular(sessao, next(fila)), repeticoes
+        )
+        orcamento = novo_orcamento()
+        pico, retido = _alocacoes(lambda: recalcular(sessao, orcamento))
+    finally:
+        orcamento_service.catalogo_cache = cache_original
+
+    return _resumo(tempos, itens, pico, retido)
+
+
+def bench_desconto(rnd, itens: int, repeticoes: int) -> dict:
+    totais = [
+        (
+            Decimal(rnd.randint(0, 10**9)) / 10000,
+            Decimal(rnd.choice(["0", "5", "7.5", "10"])),
+        )
+        for _ in range(itens)
+    ]
+
+    def aplicar():
+        return [calcular_valor_liquido(total, desconto) for total, desconto in totais]
+
+    tempos = _cronometrar(aplicar, repeticoes)
+    return _resumo(tempos, itens, *_alocacoes(aplicar))
+
+
+def executar(tamanhos: list, repeticoes: int, semente: int = 42) -> dict:
+    rnd = random.Random(semente)
+    resultados = {}
+
+    def registrar(nome, resumo):
+        resultados[nome] = resumo
+        print(
+            f"  {nome:<28} {resumo['mediana_ns_por_item']:>10.1f} ns/item "
+            f"(mín {resumo['minimo_ns_por_item']:>9.1f})  "
+            f"pico {resumo['pico_bytes_por_item']:>8.1f} B/item  "
+            f"retido {resumo['retido_bytes_por_item']:>8.1f} B/item"
+        )
+
+    registrar("item", bench_item(rnd, 1000, repeticoes))
+    for tamanho in tamanhos:
+        # Orçamentos grandes com menos repetições, para o total ficar parecido
+        vezes = max(3, min(repeticoes, repeticoes * 1000 // tamanho))
+        registrar(f"recalculo_{tamanho}", bench_recalculo(rnd, tamanho, vezes))
+    registrar("desconto", bench_desconto(rnd, 1000, repeticoes))
+
+    return {
+        "executado_em": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "semente": semente,
+        "microbenchmarks": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--tamanhos",
+        default="10,1000,100000",
+        help="itens por orçamento no recálculo, separados por vírgula",
+    )
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON de saída")
+    args = parser.parse_args()
+
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+    resultado = executar(tamanhos, args.repeticoes, args.semente)
+
+    saida = args.saida or os.path.join(
+        DIRETORIO_RESULTADOS,
+        f"precificacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n✓ Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Gera uma massa de dados sintética para testes de carga e benchmarks.
+
+Usa inserts em lote (executemany) em vez do ORM objeto a objeto, então
+1M de itens de orçamento levam minutos e não horas.
+
+Execute (banco separado do de desenvolvimento!):
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/gerar_dados.py
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/gerar_dados.py \
+        --orcamentos 50 --itens-por-orcamento 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from database import SessionLocal, create_tables  # noqa: E402
+from models import (  # noqa: E402
+    Cliente,
+    Contrato,
+    HistoricoAuditoria,
+    ItemOrcamento,
+    Orcamento,
+    Projeto,
+    ServicosCatalogo,
+    calcular_item_orcamento,
+)
+
+TAMANHO_LOTE = 5000
+
+
+def _em_lotes(db, modelo, linhas):
+    for inicio in range(0, len(linhas), TAMANHO_LOTE):
+        db.execute(insert(modelo), linhas[inicio : inicio + TAMANHO_LOTE])
+
+
+def _ids(db, coluna, filtro=None):
+    consulta = select(coluna)
+    if filtro is not None:
+        consulta = consulta.where(filtro)
+    return list(db.execute(consulta).scalars())
+
+
+def gerar_catalogo(db, ciclos: int, fases: int, atividades: int, rnd) -> list:
+    """Catálogo de 3 níveis: ciclos -> fases -> atividades. Retorna as atividades."""
+    prefixo = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    _em_lotes(
+        db,
+        ServicosCatalogo,
+        [
+            {"nome": f"Ciclo {prefixo}-{c}", "tipo": "CICLO", "complexidade_ust": 0}
+            for c in range(ciclos)
+        ],
+    )
+    ids_ciclos = _ids(
+        db, ServicosCatalogo.id, ServicosCatalogo.nome.like(f"Ciclo {prefixo}-%")
+    )
+
+    _em_lotes(
+        db,
+        ServicosCatalogo,
+        [
+            {
+                "nome": f"Fase {prefixo}-{c}.{f}",
+                "tipo": "FASE",
+                "parent_id": ciclo_id,
+                "complexidade_ust": 0,
+            }
+            for c, ciclo_id in enumerate(ids_ciclos)
+            for f in range(fases)
+        ],
+    )
+    ids_fases = _ids(
+        db, ServicosCatalogo.id, ServicosCatalogo.nome.like(f"Fase {prefixo}-%")
+    )
+
+    _em_lotes(
+        db,
+        ServicosCatalogo,
+        [
+            {
+                "nome": f"Atividade {prefixo}-{fase_id}.{a}",
+                "tipo": "ATIVIDADE",
+                "parent_id": fase_id,
+                "complexidade_ust": Decimal(rnd.randint(5, 80)) / 10,
+            }
+            for fase_id in ids_fases
+            for a in range(atividades)
+        ],
+    )
+    return list(
+        db.execute(
+            select(ServicosCatalogo.id, ServicosCatalogo.complexidade_ust).where(
+                ServicosCatalogo.nome.like(f"Atividade {prefixo}-%")
+            )
+        )
+    )
+
+
+def gerar_dados(
+    clientes: int = 200,
+    contratos_por_cliente: int = 2,
+    projetos_por_contrato: int = 3,
+    ciclos: int = 5,
+    fases_por_ciclo: int = 10,
+    atividades_por_fase: int = 60,
+    orcamentos: int = 5000,
+    itens_por_orcamento: int = 200,
+    auditoria_por_orcamento: int = 4,
+    proporcao_rascunhos: float = 0.7,
+    semente: int = 42,
+):
+    rnd = random.Random(semente)
+    create_tables()
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    sufixo = datetime.now().strftime("%Y%m%d%H%M%S%f")
+
+    try:
+        atividades = gerar_catalogo(
+            db, ciclos, fases_por_ciclo, atividades_por_fase, rnd
+        )
+        print(f"✓ Catálogo: {len(atividades)} atividades")
+
+        _em_lotes(
+            db,
+            Cliente,
+            [
+                {"razao_social": f"Cliente {c}", "cnpj": f"{sufixo}-{c}"}
+                for c in range(clientes)
+            ],
+        )
+        ids_clientes = _ids(db, Cliente.id, Cliente.cnpj.like(f"{sufixo}-%"))
+
+        _em_lotes(
+            db,
+            Contrato,
+            [
+                {
+                    "numero_contrato": f"CT-{sufixo}-{cliente_id}-{n}",
+                    "cliente_id": cliente_id,
+                    "valor_ust": Decimal(rnd.randint(10000, 30000)) / 100,
+                    "data_inicio": date.today() - timedelta(days=365),
+                    "data_fim": date.today() + timedelta(days=365),
+                    "status": "ativo",
+                }
+                for cliente_id in ids_clientes
+                for n in range(contratos_por_cliente)
+            ],
+        )
+        contratos = list(
+            db.execute(
+                select(Contrato.id, Contrato.cliente_id, Contrato.valor_ust).where(
+                    Contrato.numero_contrato.like(f"CT-{sufixo}-%")
+                )
+            )
+        )
+        print(f"✓ Clientes: {len(ids_clientes)} | Contratos: {len(contratos)}")
+
+        _em_lotes(
+            db,
+            Projeto,
+            [
+                {
+                    "nome": f"Projeto {contrato_id}.{n}",
+                    "codigo": f"PRJ-{sufixo}-{contrato_id}-{n}",
+                    "cliente_id": cliente_id,
+                    "contrato_id": contrato_id,
+                    "status": "ativo",
+                }
+                for contrato_id, cliente_id, _ in contratos
+                for n in range(projetos_por_contrato)
+            ],
+        )
+        projetos = list(
+            db.execute(
+                select(Projeto.id, Projeto.contrato_id).where(
+                    Projeto.codigo.like(f"PRJ-{sufixo}-%")
+                )
+            )
+        )
+        print(f"✓ Projetos: {len(projetos)}")
+
+        valor_ust_por_contrato = {c_id: valor for c_id, _, valor in contratos}
+        total_itens = 0
+
+        # Orçamentos em blocos, para não manter 1M de itens em memória
+        for bloco in range(0, orcamentos, 500):
+            quantidade = min(500, orcamentos - bloco)
+            cabecalhos = []
+            itens_por_numero = {}
+            for n in range(bloco, bloco + quantidade):
+                projeto_id, contrato_id = rnd.choice(projetos)
+                valor_ust = valor_ust_por_contrato[contrato_id]
+                desconto = Decimal(rnd.choice([0, 0, 5, 10]))
+                numero = f"ORC/{sufixo}/{n:07d}"
+
+                itens = []
+                total_bruto = Decimal("0.0000")
+                quantos = min(itens_por_orcamento, len(atividades))
+                amostra = rnd.sample(atividades, quantos)
+                for seq, (atividade_id, complexidade) in enumerate(amostra):
+                    horas = Decimal(rnd.randint(1, 400)) / 4
+                    ust_item, valor_bruto = calcular_item_orcamento(
+                        horas, complexidade, valor_ust
+                    )
+                    total_bruto += valor_bruto
+                    itens.append(
+                        {
+                            "atividade_id": atividade_id,
+                            "horas_estimadas": horas,
+                            "complexidade_snapshot": complexidade,
+                            "valor_ust_snapshot": valor_ust,
+                            "sequencia": seq + 1,
+                            "subtotal_ust": ust_item,
+                            "subtotal_bruto": valor_bruto,
+                        }
+                    )
+                itens_por_numero[numero] = itens
+
+                cabecalhos.append(
+                    {
+                        "numero_orcamento": numero,
+                        "projeto_id": projeto_id,
+                        "contrato_id": contrato_id,
+                        "data_emissao": date.today()
+                        - timedelta(days=rnd.randint(0, 365)),
+                        "status": "Rascunho"
+                        if rnd.random() < proporcao_rascunhos
+                        else "Aprovado",
+                        "versao": "1.0",
+                        "valor_total_bruto": total_bruto,
+                        "desconto_percentual": desconto,
+                        "valor_total_liquido": total_bruto
+                        - total_bruto * desconto / Decimal("100"),
+                    }
+                )
+            _em_lotes(db, Orcamento, cabecalhos)
+
+            ids_por_numero = dict(
+                db.execute(
+                    select(Orcamento.numero_orcamento, Orcamento.id).where(
+                        Orcamento.numero_orcamento.in_(list(itens_por_numero))
+                    )
+                ).all()
+            )
+
+            itens = []
+            auditoria = []
+            for cabecalho in cabecalhos:
+                orcamento_id = ids_por_numero[cabecalho["numero_orcamento"]]
+                for item in itens_por_numero[cabecalho["numero_orcamento"]]:
+                    item["orcamento_id"] = orcamento_id
+                    itens.append(item)
+                for _ in range(auditoria_por_orcamento):
+                    alterado_em = datetime.now(timezone.utc) - timedelta(days=rnd.randint(0, 365))
+                    auditoria.append(
+                        {
+                            "tipo_alteracao": "DESCONTO_ORCAMENTO",
+                            "orcamento_id": orcamento_id,
+                            "usuario_id": None,
+                            "valor_anterior": Decimal(0),
+                            "valor_novo": cabecalho["desconto_percentual"],
+                            "data_alteracao": alterado_em,
+                            "motivo": "Carga sintética",
+                        }
+                    )
+
+            _em_lotes(db, ItemOrcamento, itens)
+            _em_lotes(db, HistoricoAuditoria, auditoria)
+            db.commit()
+
+            total_itens += len(itens)
+            print(
+                f"  └─ {bloco + quantidade}/{orcamentos} orçamentos, "
+                f"{total_itens} itens ({time.perf_counter() - inicio:.0f}s)"
+            )
+
+        print(f"✓ Dados gerados em {time.perf_counter() - inicio:.1f}s")
+    except Exception as e:
+        print(f"✗ Erro ao gerar dados: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--contratos-por-cliente", type=int, default=2)
+    parser.add_argument("--projetos-por-contrato", type=int, default=3)
+    parser.add_argument("--ciclos", type=int, default=5)
+    parser.add_argument("--fases-por-ciclo", type=int, default=10)
+    parser.add_argument("--atividades-por-fase", type=int, default=60)
+    parser.add_argument("--orcamentos", type=int, default=5000)
+    parser.add_argument("--itens-por-orcamento", type=int, default=200)
+    parser.add_argument("--auditoria-por-orcamento", type=int, default=4)
+    parser.add_argument("--proporcao-rascunhos", type=float, default=0.7)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    gerar_dados(**{k: v for k, v in vars(args).items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Gate de regressão de desempenho contra uma baseline versionada.
+
+Gera um banco SQLite novo e sempre igual (semente fixa), roda um conjunto fixo
+de cenários e compara com benchmarks/baseline.json:
+
+- latência p95 (tolerância relativa, com um piso absoluto contra ruído);
+- consultas SQL por requisição (por padrão, qualquer aumento reprova);
+- pico de memória alocada por requisição (tracemalloc).
+
+Sai com código 1 se algum cenário piorar além da tolerância, para uso em CI.
+
+Execute:
+    python benchmarks/regressao.py
+    python benchmarks/regressao.py --atualizar-baseline   # grava nova baseline
+
+Medição e baseline usam a mesma regra: cada cenário roda --passadas vezes
+(padrão 3) e vale a passada de p95 mediano.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_endpoints import _commit_atual, autenticar, cliente_asgi, percentil
+
+ARQUIVO_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Massa de dados fixa: 1200 orçamentos (~1080 rascunhos) com 20 itens cada
+MASSA = {
+    "clientes": 20,
+    "contratos_por_cliente": 2,
+    "projetos_por_contrato": 2,
+    "ciclos": 2,
+    "fases_por_ciclo": 5,
+    "atividades_por_fase": 40,
+    "orcamentos": 1200,
+    "itens_por_orcamento": 20,
+    "auditoria_por_orcamento": 4,
+    "proporcao_rascunhos": 0.9,
+    "semente": 42,
+}
+
+TOLERANCIAS_PADRAO = {
+    # p95 pode subir até 50%, mas diferenças abaixo de 5 ms são ignoradas
+    "latencia_p95": 0.5,
+    "latencia_minima_ms": 5.0,
+    # consultas: qualquer aumento reprova, exceto 1 consulta ocasional
+    # (ex: um cache relendo a versão das tabelas no meio da medição)
+    "consultas": 0.0,
+    "consultas_extras": 1.0,
+    "memoria_pico": 0.25,
+}
+
+
+def preparar_banco(database_url: str = None) -> str:
+    """Aponta DATABASE_URL para um SQLite temporário e gera a massa fixa."""
+    if not database_url:
+        caminho = os.path.join(tempfile.mkdtemp(prefix="regressao-"), "bench.db")
+        database_url = f"sqlite:///{caminho}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    # Só importa depois de DATABASE_URL definida: database.py lê na importação
+    from gerar_dados import gerar_dados
+
+    gerar_dados(**MASSA)
+    return database_url
+
+
+def montar_cenarios() -> list:
+    """(nome, método, caminho, corpo, repetições) de cada cenário fixo."""
+    from sqlalchemy import func
+
+    from database import SessionLocal
+    from models import HistoricoAuditoria, ItemOrcamento, Orcamento, ServicosCatalogo
+
+    db = SessionLocal()
+    try:
+        rascunhos = (
+            db.query(Orcamento)
+            .filter(Orcamento.status == "Rascunho")
+            .order_by(Orcamento.id)
+            .limit(2)
+            .all()
+        )
+        total_rascunhos = (
+            db.query(func.count(Orcamento.id))
+            .filter(Orcamento.status == "Rascunho")
+            .scalar()
+        )
+        if len(rascunhos) < 2 or total_rascunhos < 1000:
+            raise SystemExit("✗ Massa de dados com menos de 1000 rascunhos")
+        editado, auditado = rascunhos
+
+        item = (
+            db.query(ItemOrcamento)
+            .filter(ItemOrcamento.orcamento_id == editado.id)
+            .order_by(ItemOrcamento.id)
+            .first()
+        )
+        atividades = [
+            a.id
+            for a in db.query(ServicosCatalogo.id)
+            .filter(ServicosCatalogo.tipo == "ATIVIDADE")
+            .order_by(ServicosCatalogo.id)
+            .limit(200)
+        ]
+        auditoria = (
+            db.query(func.count(HistoricoAuditoria.id))
+            .filter(HistoricoAuditoria.orcamento_id == auditado.id)
+            .scalar()
+        )
+        contrato_id, projeto_id = editado.contrato_id, editado.projeto_id
+    finally:
+        db.close()
+
+    if len(atividades) < 200 or not auditoria:
+        raise SystemExit("✗ Massa de dados incompleta para os cenários")
+
+    novo_orcamento = {
+        "contrato_id": contrato_id,
+        "projeto_id": projeto_id,
+        "itens": [{"atividade_id": a, "horas_estimadas": "8"} for a in atividades],
+    }
+
+    return [
+        ("criar_orcamento_200_itens", "POST", "/orcamentos/", novo_orcamento, 10),
+        (
+            "listar_1000_rascunhos",
+            "GET",
+            "/orcamentos/?status=Rascunho&limit=1000",
+            None,
+            3,
+        ),
+        (
+            "alterar_horas_item",
+            "PATCH",
+            f"/orcamentos/{editado.id}/itens/{item.id}",
+            {"horas_estimadas": "12"},
+            20,
+        ),
+        ("arvore_catalogo", "GET", "/catalogo/?limit=1000", None, 20),
+        (
+            "listar_auditoria",
+            "GET",
+            f"/auditoria/orcamentos/{auditado.id}",
+            None,
+            20,
+        ),
+    ]
+
+
+async def medir(client, headers, cenario) -> dict:
+    from services.query_detector import contar_consultas
+
+    nome, metodo, caminho, corpo, repeticoes = cenario
+
+    async def requisitar():
+        resposta = await client.request(
+            metodo, caminho, json=corpo, headers=headers
+        )
+        if resposta.status_code >= 400:
+            raise SystemExit(
+                f"✗ {nome}: HTTP {resposta.status_code} {resposta.text[:200]}"
+            )
+
+    # Aquecimento fora da medição
+    await requisitar()
+
+    latencias = []
+    with contar_consultas() as contador:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            await requisitar()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    # Memória em uma passada separada: o tracemalloc distorce a latência
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        await requisitar()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "repeticoes": repeticoes,
+        "p50_ms": round(percentil(latencias, 50), 3),
+        "p95_ms": round(percentil(latencias, 95), 3),
+        "consultas_por_requisicao": round(contador.total / repeticoes, 2),
+        "memoria_pico_kb": round((pico - base) / 1024, 1),
+    }
+
+
+async def executar(passadas: int = 1) -> dict:
+    """
+    Roda os cenários `passadas` vezes e fica, em cada cenário, com a passada
+    de p95 mediano: um pico isolado da máquina não vira a baseline.
+    """
+    medicoes = {}
+    async with cliente_asgi() as client:
+        headers = await autenticar(client)
+        for _ in range(passadas):
+            for cenario in montar_cenarios():
+                medicoes.setdefault(cenario[0], []).append(
+                    await medir(client, headers, cenario)
+                )
+    return {
+        nome: sorted(resumos, key=lambda r: r["p95_ms"])[len(resumos) // 2]
+        for nome, resumos in medicoes.items()
+    }
+
+
+def avaliar(atual: dict, baseline: dict) -> list:
+    """Imprime a comparação e retorna a lista de regressões encontradas."""
+    tolerancias = {**TOLERANCIAS_PADRAO, **baseline.get("tolerancias", {})}
+    regressoes = []
+
+    def verificar(nome, metrica, antes, depois, relativa, absoluta=0.0):
+        limite = max(antes * (1 + relativa), antes + absoluta)
+        situacao = "ok"
+        if depois > limite:
+            situacao = "REGRESSÃO"
+            regressoes.append(
+                f"{nome}.{metrica}: {antes} → {depois} (limite {limite:.2f})"
+            )
+        elif depois < antes:
+            situacao = "melhorou"
+        print(f"  {nome:<28} {metrica:<26} {antes:>10} → {depois:>10}  {situacao}")
+
+    for nome, resumo in atual.items():
+        antes = baseline["cenarios"].get(nome)
+        if antes is None:
+            print(f"  {nome:<28} sem baseline")
+            continue
+        verificar(
+            nome,
+            "p95_ms",
+            antes["p95_ms"],
+            resumo["p95_ms"],
+            tolerancias["latencia_p95"],
+            tolerancias["latencia_minima_ms"],
+        )
+        verificar(
+            nome,
+            "consultas_por_requisicao",
+            antes["consultas_por_requisicao"],
+            resumo["consultas_por_requisicao"],
+            tolerancias["consultas"],
+            tolerancias["consultas_extras"],
+        )
+        verificar(
+            nome,
+            "memoria_pico_kb",
+            antes["memoria_pico_kb"],
+            resumo["memoria_pico_kb"],
+            tolerancias["memoria_pico"],
+        )
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--database-url", help="banco vazio a popular (padrão: SQLite temporário)"
+    )
+    parser.add_argument("--baseline", default=ARQUIVO_BASELINE)
+    parser.add_argument(
+        "--atualizar-baseline",
+        action="store_true",
+        help="grava os resultados como nova baseline em vez de comparar",
+    )
+    parser.add_argument(
+        "--passadas",
+        type=int,
+        default=3,
+        help="passadas por cenário; vale a de p95 mediano (padrão: 3)",
+    )
+    args = parser.parse_args()
+
+    preparar_banco(args.database_url)
+    resultados = asyncio.run(executar(args.passadas))
+
+    if args.atualizar_baseline:
+        tolerancias = TOLERANCIAS_PADRAO
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                tolerancias = json.load(f).get("tolerancias", tolerancias)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "commit": _commit_atual(),
+                    "massa": MASSA,
+                    "tolerancias": tolerancias,
+                    "cenarios": resultados,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+            f.write("\n")
+        print(f"✓ Baseline gravada em {args.baseline}")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    commit = baseline.get("commit") or "sem commit"
+    print(f"\nComparação com a baseline ({commit}):")
+    regressoes = avaliar(resultados, baseline)
+    if regressoes:
+        print(f"\n✗ {len(regressoes)} regressão(ões) de desempenho:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        sys.exit(1)
+    print("\n✓ Nenhuma regressão de desempenho")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,12 @@ from schemas import (
     CatalogoResponse,
     CatalogoUpdate,
 )
+from services.cache_consultas import listagem_em_cache
+from services.request_timing import TimedRoute
 
-catalog_router = APIRouter(prefix="/catalogo", tags=["catálogo"])
+catalog_router = APIRouter(
+    prefix="/catalogo", tags=["catálogo"], route_class=TimedRoute
+)
 
 
 # ========== CAT�LOGO UNIFICADO ==========
@@ -88,10 +92,21 @@ def listar_catalogo(
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_token),
 ):
-    query = db.query(ServicosCatalogo)
-    if tipo:
-        query = query.filter(ServicosCatalogo.tipo == tipo)
-    return query.offset(skip).limit(limit).all()
+    def consultar():
+        query = db.query(ServicosCatalogo)
+        if tipo:
+            query = query.filter(ServicosCatalogo.tipo == tipo)
+        return query.offset(skip).limit(limit).all()
+
+    # Em cache até a próxima escrita no catálogo
+    return listagem_em_cache(
+        db,
+        "catalogo",
+        ("servicos_catalogo",),
+        {"skip": skip, "limit": limit, "tipo": tipo},
+        consultar,
+        CatalogoResponse,
+    )
 
 
 @catalog_router.get("/{id}", response_model=CatalogoResponse)
@@ -0,0 +1,81 @@
+import time
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+
+from auth_routes import verificar_admin, verificar_token
+from database import SessionLocal, get_db
+from models import Usuario
+from schemas import AlteracoesResponse, JobResponse
+from services import change_feed
+from services.jobs import enfileirar
+from services.request_timing import TimedRoute
+
+change_router = APIRouter(prefix="/changes", tags=["changes"], route_class=TimedRoute)
+
+_ultima_compactacao = 0.0
+
+
+def _compactar_em_segundo_plano():
+    db = SessionLocal()
+    try:
+        change_feed.compactar_alteracoes(db)
+    except Exception:
+        change_feed.logger.exception("Erro ao compactar o change feed")
+        db.rollback()
+    finally:
+        db.close()
+
+
+@change_router.get("", response_model=AlteracoesResponse)
+def listar_alteracoes(
+    background_tasks: BackgroundTasks,
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_token),
+):
+    """
+    Change feed para sincronização incremental: o que mudou desde o cursor
+    `since`, como tuplas (entidade, id, operacao, versao).
+
+    - Sem `since`: só devolve o cursor atual. Carregue as listas e, a partir
+      daí, chame GET /changes?since=<cursor> e busque só o que mudou.
+    - `mais` = true: há outra página; chame de novo com o cursor retornado.
+    - 410: o cursor é anterior à retenção do log; recarregue tudo e
+      recomece sem `since`.
+    """
+    global _ultima_compactacao
+    agora = time.monotonic()
+    if agora - _ultima_compactacao >= change_feed.ALTERACOES_COMPACTAR_S:
+        _ultima_compactacao = agora
+        background_tasks.add_task(_compactar_em_segundo_plano)
+
+    if since is None:
+        return {"cursor": change_feed.cursor_atual(db), "mais": False, "alteracoes": []}
+
+    try:
+        cursor, alteracoes, mais = change_feed.listar_alteracoes(db, since, limit)
+    except change_feed.CursorExpirado:
+        raise HTTPException(
+            status_code=410,
+            detail="Cursor expirado: refaça a sincronização completa",
+        )
+    return {"cursor": cursor, "mais": mais, "alteracoes": alteracoes}
+
+
+@change_router.post("/compactar", response_model=JobResponse, status_code=202)
+def agendar_compactacao(
+    response: Response,
+    db: Session = Depends(get_db),
+    usuario_admin: Usuario = Depends(verificar_admin),
+):
+    """
+    Agenda a retenção e compactação do change feed em segundo plano.
+
+    Acompanhe em GET /jobs/{id} (também no header Location).
+    """
+    job = enfileirar(db, "compactar_alteracoes", usuario_id=usuario_admin.id)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
@@ -5,8 +5,10 @@ from auth_routes import verificar_admin, verificar_token
 from database import get_db
 from models import Cliente, Usuario
 from schemas import ClienteCreate, ClienteResponse
+from services.cache_consultas import listagem_em_cache
+from services.request_timing import TimedRoute
 
-client_router = APIRouter(prefix="/clientes", tags=["clientes"])
+client_router = APIRouter(prefix="/clientes", tags=["clientes"], route_class=TimedRoute)
 
 
 @client_router.post("/", response_model=ClienteResponse, status_code=201)
@@ -40,9 +42,17 @@ def listar_clientes(
     usuario_atual: Usuario = Depends(verificar_token),
 ):
     """
-    Lista todos os clientes com paginação.
+    Lista todos os clientes com paginação (resposta em cache até a próxima
+    escrita em clientes).
     """
-    return db.query(Cliente).offset(skip).limit(limit).all()
+    return listagem_em_cache(
+        db,
+        "clientes",
+        ("clientes",),
+        {"skip": skip, "limit": limit},
+        lambda: db.query(Cliente).offset(skip).limit(limit).all(),
+        ClienteResponse,
+    )
 
 
 @client_router.get("/{cliente_id}", response_model=ClienteResponse)
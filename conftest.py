@@ -0,0 +1,139 @@
+"""
+Fixtures compartilhadas dos testes em processo (sem servidor na porta 8000).
+
+Os testes usam um banco SQLite e um diretório de arquivo da auditoria
+temporários, a menos que DATABASE_URL/AUDITORIA_ARQUIVO_DIR já estejam
+definidas no ambiente.
+"""
+
+import os
+import tempfile
+import uuid
+
+import pytest
+
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'teste.db')}",
+)
+os.environ.setdefault("AUDITORIA_ARQUIVO_DIR", tempfile.mkdtemp())
+# Toda a suíte faz login e registro do mesmo cliente: limites de taxa
+# desligados (test_limite_taxa.py liga os que testa)
+for _variavel in (
+    "RATE_LIMIT_LOGIN_IP",
+    "RATE_LIMIT_LOGIN_USUARIO",
+    "RATE_LIMIT_REGISTRO_IP",
+):
+    os.environ.setdefault(_variavel, "0")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    resposta = client.post(
+        "/auth/login", json={"username": "admin", "password": "admin123"}
+    )
+    token = resposta.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def orcamento_rascunho(client, admin_headers):
+    """Cria cliente, contrato, projeto, catálogo e um orçamento com 3 itens."""
+    sufixo = uuid.uuid4().hex[:8]
+    h = admin_headers
+
+    cliente = client.post(
+        "/clientes/", json={"razao_social": "Cliente", "cnpj": sufixo}, headers=h
+    ).json()
+    contrato = client.post(
+        "/contratos/",
+        json={
+            "numero_contrato": sufixo,
+            "cliente_id": cliente["id"],
+            "valor_ust": "100.0000",
+        },
+        headers=h,
+    ).json()
+    projeto = client.post(
+        "/projetos/",
+        json={
+            "nome": "Projeto",
+            "codigo": sufixo,
+            "cliente_id": cliente["id"],
+            "contrato_id": contrato["id"],
+        },
+        headers=h,
+    ).json()
+    ciclo = client.post(
+        "/catalogo/", json={"nome": "Ciclo", "tipo": "CICLO"}, headers=h
+    ).json()
+    fase = client.post(
+        "/catalogo/",
+        json={"nome": "Fase", "tipo": "FASE", "parent_id": ciclo["id"]},
+        headers=h,
+    ).json()
+    atividades = [
+        client.post(
+            "/catalogo/",
+            json={
+                "nome": f"Atividade {i}",
+                "tipo": "ATIVIDADE",
+                "parent_id": fase["id"],
+                "complexidade_ust": "2.5000",
+            },
+            headers=h,
+        ).json()
+        for i in range(3)
+    ]
+    orcamento = client.post(
+        "/orcamentos/",
+        json={
+            "contrato_id": contrato["id"],
+            "projeto_id": projeto["id"],
+            "itens": [
+                {"atividade_id": a["id"], "horas_estimadas": "10"} for a in atividades
+            ],
+        },
+        headers=h,
+    ).json()
+    return orcamento
+
+
+@pytest.fixture
+def limite_consultas():
+    """
+    Garante um orçamento de consultas SQL por endpoint:
+
+        def test_x(client, limite_consultas):
+            with limite_consultas(8):
+                client.get("/orcamentos/1")
+
+    Falha se o bloco executar mais de `maximo` statements ou se o mesmo
+    formato de SQL repetir mais de `repeticoes` vezes (padrão N+1).
+    """
+    from contextlib import contextmanager
+
+    from services.query_detector import contar_consultas
+
+    @contextmanager
+    def _limite(maximo: int, repeticoes: int = 3):
+        with contar_consultas() as contador:
+            yield contador
+        assert contador.total <= maximo, (
+            f"{contador.total} consultas (limite {maximo}):\n"
+            + "\n".join(f"{n}x {sql}" for sql, n in contador.formatos.most_common())
+        )
+        repetidas = contador.repetidas(repeticoes)
+        assert not repetidas, f"Consultas repetidas (N+1): {repetidas}"
+
+    return _limite
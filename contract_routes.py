@@ -5,8 +5,12 @@ from auth_routes import verificar_admin, verificar_token
 from database import get_db
 from models import Cliente, Contrato, Usuario
 from schemas import ContratoCreate, ContratoResponse, ContratoUpdate
+from services.cache_consultas import listagem_em_cache
+from services.request_timing import TimedRoute
 
-contract_router = APIRouter(prefix="/contratos", tags=["contratos"])
+contract_router = APIRouter(
+    prefix="/contratos", tags=["contratos"], route_class=TimedRoute
+)
 
 
 @contract_router.post("/", response_model=ContratoResponse, status_code=201)
@@ -68,16 +72,29 @@ def listar_contratos(
     Filtros:
     - cliente_id: filtrar por cliente
     - status: filtrar por status (ativo/inativo)
+
+    A resposta fica em cache até a próxima escrita em contratos.
     """
-    query = db.query(Contrato)
 
-    if cliente_id:
-        query = query.filter(Contrato.cliente_id == cliente_id)
+    def consultar():
+        query = db.query(Contrato)
+
+        if cliente_id:
+            query = query.filter(Contrato.cliente_id == cliente_id)
 
-    if status:
-        query = query.filter(Contrato.status == status)
+        if status:
+            query = query.filter(Contrato.status == status)
 
-    return query.offset(skip).limit(limit).all()
+        return query.offset(skip).limit(limit).all()
+
+    return listagem_em_cache(
+        db,
+        "contratos",
+        ("contratos",),
+        {"skip": skip, "limit": limit, "cliente_id": cliente_id, "status": status},
+        consultar,
+        ContratoResponse,
+    )
 
 
 @contract_router.get("/{contrato_id}", response_model=ContratoResponse)
@@ -0,0 +1,36 @@
+"""
+Script de build que gera o schema OpenAPI uma única vez.
+O arquivo gerado é servido pela aplicação em /openapi.json e /docs,
+evitando gerar o schema no primeiro acesso de cada worker.
+
+Não importa o main.py: o schema sai só dos roteadores (rotas.py), sem
+criar tabelas nem o admin padrão no banco do ambiente de build.
+
+Execute no build (antes de subir os workers):
+    python gerar_openapi.py
+"""
+
+import json
+import os
+
+from fastapi import FastAPI
+
+from rotas import DESCRICAO, OPENAPI_JSON_PATH, ROTEADORES, TITULO, VERSAO
+
+
+def gerar_openapi(caminho: str = OPENAPI_JSON_PATH):
+    """Gera o schema OpenAPI a partir das rotas e grava em `caminho`."""
+    app = FastAPI(title=TITULO, description=DESCRICAO, version=VERSAO)
+    for roteador in ROTEADORES:
+        app.include_router(roteador)
+    schema = app.openapi()
+
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False)
+
+    print(f"✓ Schema OpenAPI gerado em {os.path.abspath(caminho)}")
+    print(f"  └─ {len(schema.get('paths', {}))} rotas documentadas")
+
+
+if __name__ == "__main__":
+    gerar_openapi()
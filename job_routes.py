@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from auth_routes import verificar_token
+from database import get_db
+from models import Job, Usuario
+from schemas import JobResponse
+from services.request_timing import TimedRoute
+
+job_router = APIRouter(prefix="/jobs", tags=["jobs"], route_class=TimedRoute)
+
+
+@job_router.get("/{job_id}", response_model=JobResponse)
+def obter_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_token),
+):
+    """
+    Status de um job em segundo plano: pendente, executando, concluido ou
+    falhou, com progresso (0-100), tentativas e resultado.
+
+    Usuários comuns só enxergam os próprios jobs.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job or (not usuario_atual.admin and job.usuario_id != usuario_atual.id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
@@ -1,18 +1,118 @@
+import json
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.openapi.utils import get_openapi
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.orm.exc import StaleDataError
 
-from database import SessionLocal, create_tables
+from auth_routes import id_do_usuario, nivel_de_acesso
+from database import SessionLocal, create_tables, engine
 from models import Usuario
+from order_routes import conflito_de_versao
+from rotas import DESCRICAO, OPENAPI_JSON_PATH, ROTEADORES, TITULO, VERSAO
+from services.admissao import AdmissionControlMiddleware, coletor_admissao
+from services.cache_autenticacao import cache_autenticacao
+from services.cache_consultas import (
+    ativar_cache_consultas,
+    cache_consultas,
+    coletor_cache_consultas,
+)
+from services.catalogo_cache import catalogo_cache
+from services.change_feed import ativar_change_feed
+from services.coalescencia import SingleFlightMiddleware
+from services.eventos import ativar_eventos, coletor_eventos, distribuidor
+from services.idempotencia import IdempotencyMiddleware
+from services.jobs import fila_jobs
+from services.limite_taxa import RateLimitMiddleware
+from services.metrics import (
+    MetricsMiddleware,
+    coletor_cache,
+    coletor_pool,
+    metricas,
+)
+from services.query_detector import ativar_detector
+from services.request_timing import TimingMiddleware, instrumentar_engine
+from services.senhas import coletor_senhas
+from services.slow_query_log import ativar_slow_query_log
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
 
 # Criar tabelas ao iniciar
 create_tables()
 
+# Cronometra cada statement SQL (Server-Timing e logs por requisição)
+instrumentar_engine(engine)
+
+# Detector de N+1 em desenvolvimento/testes (NPLUSONE_MODE=warn|raise)
+ativar_detector()
+
+# Change feed: toda escrita de entidades publicadas grava em `alteracoes`
+ativar_change_feed(SessionLocal)
+
+# Versões das tabelas cacheadas incrementadas a cada commit que as altera
+# (invalidam as listagens em cache de todos os workers)
+ativar_cache_consultas(SessionLocal)
+
+# Eventos de orçamento (SSE) publicados a cada commit
+ativar_eventos(SessionLocal)
+
+# Log de consultas lentas com captura de EXPLAIN (SLOW_QUERY_MS)
+ativar_slow_query_log()
+
+# Gauges calculados no momento da coleta (/metrics)
+metricas.registrar_coletor(coletor_pool(engine))
+metricas.registrar_coletor(coletor_cache("catalogo", catalogo_cache))
+metricas.registrar_coletor(coletor_cache("autenticacao", cache_autenticacao))
+metricas.registrar_coletor(coletor_cache("consultas", cache_consultas))
+metricas.registrar_coletor(coletor_cache_consultas)
+metricas.registrar_coletor(coletor_eventos)
+metricas.registrar_coletor(coletor_senhas)
+metricas.registrar_coletor(coletor_admissao)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    aquecer_aplicacao()
+    fila_jobs.iniciar()
+    distribuidor.iniciar()
+    yield
+    distribuidor.parar()
+    fila_jobs.parar()
+
+
 app = FastAPI(
-    title="API de Gestão de Orçamentos com UST",
-    description="Sistema robusto de orçamentos corporativos baseado em Unidade de Serviço Técnico",
-    version="1.0.0",
+    title=TITULO,
+    description=DESCRICAO,
+    version=VERSAO,
+    lifespan=lifespan,
+)
+
+# Idempotency-Key nas mutações de orçamentos (retentativas do frontend)
+app.add_middleware(
+    IdempotencyMiddleware,
+    prefixos=("/orcamentos",),
+    identificar_usuario=id_do_usuario,
+)
+
+# Limite de taxa (token bucket) em login e registro: 429 com Retry-After.
+# Fica dentro do CORS para o navegador conseguir ler a resposta.
+app.add_middleware(RateLimitMiddleware)
+
+# Controle de admissão: vagas por classe de rota (leituras, listagens,
+# escritas, exportações) com fila limitada; sobrecarga vira 503 rápido
+app.add_middleware(AdmissionControlMiddleware)
+
+# GETs idênticos simultâneos nas listagens de cadastro executam uma vez só;
+# fica fora do controle de admissão: quem espera a líder não ocupa vaga
+app.add_middleware(
+    SingleFlightMiddleware,
+    prefixos=("/catalogo", "/clientes", "/contratos", "/projetos"),
+    nivel_acesso=nivel_de_acesso,
 )
 
 # CORS middleware
@@ -26,8 +126,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Idempotent-Replayed", "ETag", "Retry-After"],
 )
 
+# Mede tempo total, SQL e serialização por requisição
+app.add_middleware(TimingMiddleware)
+
+# Histogramas de latência por rota e requisições em andamento (/metrics)
+app.add_middleware(MetricsMiddleware)
+
 
 def criar_admin_automatico():
     """
@@ -68,35 +175,71 @@ def criar_admin_automatico():
 criar_admin_automatico()
 
 
-from audit_routes import audit_router
-from auth_routes import auth_router
-from catalog_routes import catalog_router
-from client_routes import client_router
-from contract_routes import contract_router
-from order_routes import order_router
-from project_routes import project_router
-
-app.include_router(auth_router)
-app.include_router(client_router)
-app.include_router(contract_router)
-app.include_router(catalog_router)
-app.include_router(project_router)
-app.include_router(order_router)
-app.include_router(audit_router)
-
-
-@app.get("/")
-def read_root():
-    return {
-        "message": "API de Gestão de Orçamentos com UST",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "endpoints": {
-            "clientes": "/clientes",
-            "contratos": "/contratos",
-            "catálogo": "/catalogo",
-            "projetos": "/projetos",
-            "orçamentos": "/orcamentos",
-            "autenticação": "/auth",
-        },
-    }
+for roteador in ROTEADORES:
+    app.include_router(roteador)
+app.add_exception_handler(StaleDataError, conflito_de_versao)
+
+
+def openapi_estatico():
+    """
+    Retorna o schema OpenAPI, lendo o arquivo pré-gerado no build quando ele
+    existir. Sem o arquivo, gera o schema normalmente (e guarda em memória).
+    """
+    if app.openapi_schema:
+        return app.openapi_schema
+
+    if os.path.exists(OPENAPI_JSON_PATH):
+        with open(OPENAPI_JSON_PATH, encoding="utf-8") as f:
+            app.openapi_schema = json.load(f)
+    else:
+        app.openapi_schema = get_openapi(
+            title=app.title,
+            version=app.version,
+            openapi_version=app.openapi_version,
+            description=app.description,
+            routes=app.routes,
+        )
+    return app.openapi_schema
+
+
+app.openapi = openapi_estatico
+
+
+def aquecer_aplicacao():
+    """
+    Pré-aquece o worker antes de ele aceitar requisições: schema OpenAPI,
+    mappers do SQLAlchemy, validadores de resposta, cache do catálogo e
+    conexões do pool do banco.
+    """
+    inicio = time.perf_counter()
+
+    app.openapi()
+    configure_mappers()
+
+    # Força a construção dos validadores/serializadores de resposta
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.response_field is not None:
+            route.response_field.validate(None, {}, loc=("response",))
+
+    db = SessionLocal()
+    try:
+        catalogo_cache.complexidades(db)
+    except Exception as e:
+        print(f"✗ Erro ao aquecer cache do catálogo: {e}")
+    finally:
+        db.close()
+
+    # Abre as conexões do pool de uma vez, em vez de na primeira requisição
+    tamanho_pool = getattr(engine.pool, "size", lambda: 1)()
+    conexoes = []
+    try:
+        for _ in range(tamanho_pool):
+            conexoes.append(engine.connect())
+    except Exception as e:
+        print(f"✗ Erro ao aquecer pool do banco: {e}")
+    finally:
+        for conexao in conexoes:
+            conexao.close()
+
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    print(f"✓ Aquecimento concluído em {duracao_ms:.0f} ms")
@@ -0,0 +1,27 @@
+import os
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import metricas
+
+# Se definido, /metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+metrics_router = APIRouter(tags=["métricas"])
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def exportar_metricas(authorization: str = Header(None)):
+    """
+    Métricas no formato texto do Prometheus: latência por rota e status,
+    requisições em andamento, pool do banco, caches e contadores de negócio.
+    """
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido"
+        )
+
+    return PlainTextResponse(
+        metricas.exportar(), media_type="text/plain; version=0.0.4"
+    )
@@ -1,9 +1,35 @@
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Date
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Date, DateTime, Text, Index, LargeBinary, UniqueConstraint, Float
+from sqlalchemy.types import TypeDecorator
+from datetime import timezone
 from decimal import Decimal, ROUND_HALF_UP
 
 Base = declarative_base()
 
+
+class DataHoraUTC(TypeDecorator):
+    """
+    timestamp com fuso (timestamptz no PostgreSQL), sempre em UTC.
+
+    O SQLite não guarda o fuso: os valores são normalizados para UTC antes de
+    gravar e comparar, e voltam com tzinfo=UTC. Valores sem fuso são UTC.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
 #USUARIOS PARA AUTENTICAÇÃO
 class Usuario(Base):
     __tablename__ = "usuarios"
@@ -13,6 +39,12 @@ class Usuario(Base):
     password_hash = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=True)
     admin = Column(Integer, default=0)  # 0 para usuário comum, 1 para admin
+    # Incrementada ao mudar privilégios: tokens emitidos antes deixam de valer
+    versao_token = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Ids não são reaproveitados no SQLite: tokens de usuários removidos
+    # nunca passam a valer para um usuário novo
+    __table_args__ = {"sqlite_autoincrement": True}
 
     def __init__(self, username, password_hash, email=None, admin=0):
         self.username = username
@@ -134,11 +166,15 @@ class Orcamento(Base):
     desconto_percentual = Column(Numeric(18, 4), default=Decimal("0.0000"))
     valor_total_liquido = Column(Numeric(18, 4), default=Decimal("0.0000"))
     observacoes = Column(String, nullable=True)  # Observações gerais do orçamento
+    # Controle de concorrência otimista: todo UPDATE/DELETE confere e incrementa
+    row_version = Column(Integer, nullable=False, default=1, server_default="1")
 
     projeto = relationship("Projeto", back_populates="orcamentos")
     contrato = relationship("Contrato", back_populates="orcamentos")
     itens = relationship("ItemOrcamento", back_populates="orcamento", cascade="all, delete-orphan")
 
+    __mapper_args__ = {"version_id_col": row_version}
+
 
 # ITEM ORÇAMENTO
 
@@ -186,6 +222,12 @@ class ItemOrcamento(Base):
 
 class HistoricoAuditoria(Base):
     __tablename__ = "historico_auditoria"
+    __table_args__ = (
+        Index("ix_historico_auditoria_orcamento_data", "orcamento_id", "data_alteracao"),
+        Index("ix_historico_auditoria_usuario_data", "usuario_id", "data_alteracao"),
+        # No SQLite, sem AUTOINCREMENT o id do maior registro arquivado seria reusado
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     tipo_alteracao = Column(String, nullable=False)  # "HORAS_ITEM" ou "DESCONTO_ORCAMENTO"
@@ -194,7 +236,7 @@ class HistoricoAuditoria(Base):
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
     valor_anterior = Column(Numeric(18, 4), nullable=False)
     valor_novo = Column(Numeric(18, 4), nullable=False)
-    data_alteracao = Column(String, nullable=False)  # ISO format datetime
+    data_alteracao = Column(DataHoraUTC, nullable=False)
     motivo = Column(String, nullable=True)
 
     def __init__(
@@ -218,6 +260,144 @@ class HistoricoAuditoria(Base):
         self.motivo = motivo
 
 
+# CHECKPOINTS DA AUDITORIA (reconstrução do orçamento no tempo)
+
+class CheckpointOrcamento(Base):
+    __tablename__ = "checkpoints_orcamento"
+    __table_args__ = (
+        Index("ix_checkpoints_orcamento_evento", "orcamento_id", "ultimo_evento_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    orcamento_id = Column(Integer, ForeignKey("orcamentos.id"), nullable=False)
+    ultimo_evento_id = Column(Integer, nullable=False)  # historico_auditoria.id já contido
+    data_referencia = Column(DataHoraUTC, nullable=False)  # data_alteracao desse evento
+    desconto_percentual = Column(Numeric(18, 4), nullable=False)
+    horas = Column(Text, nullable=False)  # JSON [[item_orcamento_id, "horas"], ...]
+    criado_em = Column(DateTime, nullable=False)
+
+
+# ARQUIVO DA AUDITORIA (segmentos gzip NDJSON com os eventos antigos)
+
+class SegmentoAuditoria(Base):
+    __tablename__ = "segmentos_auditoria"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    arquivo = Column(String, unique=True, nullable=False)  # relativo a AUDITORIA_ARQUIVO_DIR
+    primeiro_evento_id = Column(Integer, nullable=False)
+    ultimo_evento_id = Column(Integer, nullable=False, index=True)
+    data_inicio = Column(DataHoraUTC, nullable=False)
+    data_fim = Column(DataHoraUTC, nullable=False, index=True)
+    registros = Column(Integer, nullable=False)
+    bytes = Column(Integer, nullable=False)
+    criado_em = Column(DateTime, nullable=False)
+
+
+class IndiceSegmentoAuditoria(Base):
+    """Em quais segmentos estão os eventos de cada orçamento, e de quando."""
+
+    __tablename__ = "indice_segmentos_auditoria"
+    __table_args__ = (
+        Index("ix_indice_segmentos_auditoria_orcamento", "orcamento_id", "data_fim"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    segmento_id = Column(Integer, ForeignKey("segmentos_auditoria.id"), nullable=False)
+    orcamento_id = Column(Integer, nullable=False)  # sem FK: o orçamento pode ser excluído
+    data_inicio = Column(DataHoraUTC, nullable=False)
+    data_fim = Column(DataHoraUTC, nullable=False)
+    registros = Column(Integer, nullable=False)
+
+
+# JOBS (fila de tarefas em segundo plano)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_disponivel_em", "status", "disponivel_em"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tipo = Column(String, nullable=False)  # nome da tarefa registrada
+    status = Column(String, nullable=False, default="pendente")  # pendente / executando / concluido / falhou
+    parametros = Column(Text, nullable=True)  # JSON
+    resultado = Column(Text, nullable=True)  # JSON
+    erro = Column(Text, nullable=True)
+    progresso = Column(Integer, default=0)  # 0 a 100
+    tentativas = Column(Integer, default=0)
+    max_tentativas = Column(Integer, default=3)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
+    worker = Column(String, nullable=True)
+    criado_em = Column(DateTime, nullable=False)
+    disponivel_em = Column(DateTime, nullable=False)  # retentativas esperam até aqui
+    iniciado_em = Column(DateTime, nullable=True)
+    atualizado_em = Column(DateTime, nullable=True)  # heartbeat do worker
+    finalizado_em = Column(DateTime, nullable=True)
+
+
+# RESPOSTAS IDEMPOTENTES (header Idempotency-Key)
+
+class RespostaIdempotente(Base):
+    __tablename__ = "respostas_idempotentes"
+    __table_args__ = (UniqueConstraint("chave", "dono", name="uq_respostas_idempotentes_chave_dono"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chave = Column(String(255), nullable=False)  # valor do Idempotency-Key
+    dono = Column(String(64), nullable=False)  # usuario:<id> (sem token válido: hash do Authorization)
+    impressao = Column(String(64), nullable=False)  # hash de método + caminho + corpo
+    status = Column(String, nullable=False)  # processando / concluido
+    status_code = Column(Integer, nullable=True)
+    headers = Column(Text, nullable=True)  # JSON [[nome, valor], ...]
+    corpo = Column(LargeBinary, nullable=True)
+    criado_em = Column(DateTime, nullable=False)
+    expira_em = Column(DateTime, nullable=False, index=True)  # concluído: fim do TTL; processando: fim da reserva
+
+
+# CHANGE FEED (sincronização incremental dos clientes)
+
+class Alteracao(Base):
+    __tablename__ = "alteracoes"
+    __table_args__ = (
+        Index("ix_alteracoes_entidade", "entidade", "entidade_id"),
+        # No SQLite, sem AUTOINCREMENT um expurgo completo faria os ids
+        # recomeçarem abaixo do corte, invisíveis para quem lê a partir dele
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # cursor do feed
+    entidade = Column(String, nullable=False)  # nome da tabela: clientes, orcamentos...
+    entidade_id = Column(Integer, nullable=False)
+    operacao = Column(String, nullable=False)  # insert / update / delete
+    versao = Column(Integer, nullable=True)  # row_version, quando a entidade tiver
+    criado_em = Column(DateTime, nullable=False, index=True)
+
+
+class CorteAlteracoes(Base):
+    __tablename__ = "alteracoes_corte"
+
+    id = Column(Integer, primary_key=True)  # linha única (id = 1)
+    ate_id = Column(Integer, nullable=False)  # alterações até aqui foram expurgadas
+    atualizado_em = Column(DateTime, nullable=False)
+
+
+# LIMITE DE TAXA (baldes compartilhados entre workers, RATE_LIMIT_BACKEND=banco)
+
+class BaldeLimiteTaxa(Base):
+    __tablename__ = "baldes_limite_taxa"
+
+    chave = Column(String(128), primary_key=True)  # grupo:ip:... / grupo:usuario:...
+    fichas = Column(Float, nullable=False)
+    atualizado_em = Column(Float, nullable=False, index=True)  # epoch (s)
+
+
+# CACHE DE CONSULTAS (versão de cada tabela cacheada, incrementada a cada commit
+# que a altera; faz parte da chave das listagens em cache)
+
+class VersaoTabela(Base):
+    __tablename__ = "versoes_tabelas"
+
+    tabela = Column(String(64), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+
+
 # REGRA DE NEGÓCIO
 
 def calcular_item_orcamento(horas_estimadas, complexidade_ust, valor_ust):
@@ -239,4 +419,21 @@ def calcular_item_orcamento(horas_estimadas, complexidade_ust, valor_ust):
     ust_item = (complexidade * horas).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
     valor_item_bruto = (ust_item * valor_ust).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
 
-    return ust_item, valor_item_bruto
\ No newline at end of file
+    return ust_item, valor_item_bruto
+
+
+def calcular_valor_liquido(total_bruto, desconto_percentual):
+    """
+    Aplica o desconto percentual do orçamento ao total bruto.
+
+    Args:
+        total_bruto: Soma dos subtotais brutos dos itens (Decimal)
+        desconto_percentual: Desconto em % (Decimal, None = sem desconto)
+
+    Returns:
+        Valor líquido (Decimal)
+    """
+    total = Decimal(total_bruto)
+    desconto = total * (Decimal(desconto_percentual or 0) / Decimal("100"))
+    # Mesma escala da coluna: sem isso, cada recálculo "altera" o valor gravado
+    return (total - desconto).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
@@ -1,8 +1,13 @@
 from datetime import date
 from decimal import Decimal
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import flag_modified
+from starlette.concurrency import run_in_threadpool
 
 from audit_routes import registrar_auditoria
 from auth_routes import verificar_admin, verificar_token
@@ -14,6 +19,7 @@ from models import (
     Projeto,
     Usuario,
     calcular_item_orcamento,
+    calcular_valor_liquido,
 )
 from models import (
     ServicosCatalogo as Atividade,
@@ -22,13 +28,20 @@ from schemas import (
     AtualizarDescontoOrcamento,
     AtualizarHorasItem,
     ItemOrcamentoCreate,
+    JobResponse,
     OrcamentoCreate,
     OrcamentoDetailResponse,
     OrcamentoResponse,
 )
-from services.orcamento_service import recalculate_orcamento
-
-order_router = APIRouter(prefix="/orcamentos", tags=["orcamentos"])
+from services import eventos
+from services.jobs import enfileirar
+from services.metrics import metricas
+from services.orcamento_service import recalcular_rascunhos, recalculate_orcamento
+from services.request_timing import TimedRoute
+
+order_router = APIRouter(
+    prefix="/orcamentos", tags=["orcamentos"], route_class=TimedRoute
+)
 
 
 def gerar_numero_orcamento(db: Session, contrato_id: int):
@@ -38,9 +51,60 @@ def gerar_numero_orcamento(db: Session, contrato_id: int):
     return f"ORC/{ano}/{contrato_id}/{str(count).zfill(6)}"
 
 
+# ========== CONCORRÊNCIA OTIMISTA ==========
+
+MENSAGEM_CONFLITO = (
+    "Orçamento alterado por outra requisição. Recarregue e tente de novo"
+)
+
+
+def etag_orcamento(orcamento) -> str:
+    return f'"{orcamento.row_version}"'
+
+
+def verificar_if_match(orcamento, if_match: Optional[str]):
+    """412 se o header If-Match não corresponder à versão atual do orçamento."""
+    if if_match is None:
+        return
+    etags = {etag.strip().removeprefix("W/") for etag in if_match.split(",")}
+    if "*" not in etags and etag_orcamento(orcamento) not in etags:
+        raise HTTPException(status_code=412, detail=MENSAGEM_CONFLITO)
+
+
+async def conflito_de_versao(request: Request, exc):
+    """
+    Handler de StaleDataError: o UPDATE não encontrou a row_version lida,
+    porque outra requisição alterou o orçamento no meio do caminho.
+    """
+    return JSONResponse(
+        status_code=412 if request.headers.get("if-match") else 409,
+        content={"detail": MENSAGEM_CONFLITO},
+    )
+
+
+def atualizar_totais(db: Session, orcamento):
+    """
+    Recalcula os totais do orçamento a partir dos subtotais gravados dos
+    itens (e não somando diferenças a valores possivelmente desatualizados).
+    """
+    db.flush()
+    total_bruto = (
+        db.query(func.coalesce(func.sum(ItemOrcamento.subtotal_bruto), 0))
+        .filter(ItemOrcamento.orcamento_id == orcamento.id)
+        .scalar()
+    )
+    orcamento.valor_total_bruto = Decimal(total_bruto)
+    orcamento.valor_total_liquido = calcular_valor_liquido(
+        total_bruto, orcamento.desconto_percentual
+    )
+    # Força o UPDATE (e o incremento da row_version) mesmo sem mudança de valor
+    flag_modified(orcamento, "valor_total_bruto")
+
+
 @order_router.post("/", response_model=OrcamentoResponse, status_code=201)
 def criar_orcamento(
     dados: OrcamentoCreate,
+    response: Response,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_token),
 ):
@@ -137,9 +201,7 @@ def criar_orcamento(
             status_code=400, detail="Pelo menos 1 item deve ter horas_estimadas > 0"
         )
 
-    desconto = total_bruto * (dados.desconto_percentual / Decimal("100"))
-
-    valor_liquido = total_bruto - desconto
+    valor_liquido = calcular_valor_liquido(total_bruto, dados.desconto_percentual)
 
     novo_orcamento.valor_total_bruto = total_bruto
     novo_orcamento.desconto_percentual = dados.desconto_percentual
@@ -148,6 +210,8 @@ def criar_orcamento(
 
     db.commit()
     db.refresh(novo_orcamento)
+    metricas.incrementar("orcamentos_criados_total")
+    response.headers["ETag"] = etag_orcamento(novo_orcamento)
 
     return novo_orcamento
 
@@ -155,6 +219,7 @@ def criar_orcamento(
 @order_router.get("/{orcamento_id}", response_model=OrcamentoDetailResponse)
 def obter_orcamento(
     orcamento_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_token),
 ):
@@ -168,10 +233,56 @@ def obter_orcamento(
 
     # Se estiver em rascunho, recalcula usando complexidade atual das atividades
     recalculate_orcamento(db, orcamento, persist=True)
+    response.headers["ETag"] = etag_orcamento(orcamento)
 
     return orcamento
 
 
+@order_router.get("/{orcamento_id}/eventos", response_class=StreamingResponse)
+async def eventos_orcamento(
+    orcamento_id: int,
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_token),
+):
+    """
+    Stream SSE (text/event-stream) com as alterações do orçamento, em vez
+    de fazer polling em GET /orcamentos/{id}:
+
+    - snapshot: totais e todos os itens, ao conectar (não recalcula);
+    - alteracao: totais e itens alterados/removidos a cada commit;
+    - recarregar: busque o orçamento de novo (cliente atrasado ou
+      alteração em massa dos itens);
+    - removido: o orçamento foi excluído; o stream termina.
+
+    O id de cada evento é a row_version (o mesmo valor do ETag).
+    """
+
+    def verificar():
+        try:
+            return (
+                db.query(Orcamento.id).filter(Orcamento.id == orcamento_id).first()
+            )
+        finally:
+            # Não segura uma conexão do pool enquanto o stream estiver aberto
+            db.close()
+
+    if not await run_in_threadpool(verificar):
+        raise HTTPException(status_code=404, detail="Orçamento não encontrado")
+
+    if eventos.barramento.lotado():
+        raise HTTPException(
+            status_code=503,
+            detail="Limite de conexões de eventos atingido",
+            headers={"Retry-After": "5"},
+        )
+
+    return StreamingResponse(
+        eventos.transmitir(orcamento_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @order_router.get("/", response_model=list[OrcamentoResponse])
 def listar_orcamentos(
     skip: int = Query(0, ge=0),
@@ -191,7 +302,7 @@ def listar_orcamentos(
     - projeto_id: filtrar por projeto
     - status: filtrar por status (Rascunho/Aprovado)
     """
-    query = db.query(Orcamento)
+    query = db.query(Orcamento).options(selectinload(Orcamento.itens))
 
     if contrato_id:
         query = query.filter(Orcamento.contrato_id == contrato_id)
@@ -205,21 +316,45 @@ def listar_orcamentos(
     resultados = query.offset(skip).limit(limit).all()
 
     # Recalcular automaticamente orçamentos em rascunho antes de retornar
-    for o in resultados:
-        if getattr(o, "status", None) == "Rascunho":
-            try:
-                recalculate_orcamento(db, o, persist=True)
-            except Exception:
-                # não falhar listagem inteira por conta de um recálculo
-                pass
+    try:
+        recalcular_rascunhos(db, resultados)
+    except Exception:
+        # não falhar a listagem inteira por conta do recálculo
+        db.rollback()
 
     return resultados
 
 
+@order_router.post("/recalcular", response_model=JobResponse, status_code=202)
+def agendar_recalculo_orcamentos(
+    response: Response,
+    contrato_id: int = Query(None),
+    projeto_id: int = Query(None),
+    db: Session = Depends(get_db),
+    usuario_atual: Usuario = Depends(verificar_admin),
+):
+    """
+    Agenda o recálculo dos orçamentos em rascunho (todos, ou filtrados por
+    contrato/projeto) em segundo plano e retorna 202 com o job.
+
+    Acompanhe em GET /jobs/{id} (também no header Location).
+    """
+    job = enfileirar(
+        db,
+        "recalcular_orcamentos",
+        {"contrato_id": contrato_id, "projeto_id": projeto_id},
+        usuario_id=usuario_atual.id,
+    )
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+
 @order_router.put("/{orcamento_id}", response_model=OrcamentoResponse)
 def atualizar_orcamento(
     orcamento_id: int,
     dados: OrcamentoCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_token),
 ):
@@ -232,6 +367,8 @@ def atualizar_orcamento(
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado")
 
+    verificar_if_match(orcamento, if_match)
+
     if orcamento.status == "Aprovado":
         raise HTTPException(
             status_code=400, detail="Não é possível alterar orçamento aprovado"
@@ -335,8 +472,7 @@ def atualizar_orcamento(
             status_code=400, detail="Pelo menos 1 item deve ter horas_estimadas > 0"
         )
 
-    desconto = total_bruto * (dados.desconto_percentual / Decimal("100"))
-    valor_liquido = total_bruto - desconto
+    valor_liquido = calcular_valor_liquido(total_bruto, dados.desconto_percentual)
 
     orcamento.contrato_id = dados.contrato_id
     orcamento.projeto_id = dados.projeto_id
@@ -348,6 +484,7 @@ def atualizar_orcamento(
 
     db.commit()
     db.refresh(orcamento)
+    response.headers["ETag"] = etag_orcamento(orcamento)
 
     return orcamento
 
@@ -355,6 +492,8 @@ def atualizar_orcamento(
 @order_router.patch("/{orcamento_id}/aprovar", response_model=OrcamentoResponse)
 def aprovar_orcamento(
     orcamento_id: int,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     usuario_admin: Usuario = Depends(verificar_admin),
 ):
@@ -366,12 +505,17 @@ def aprovar_orcamento(
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado")
 
+    verificar_if_match(orcamento, if_match)
+
     if orcamento.status == "Aprovado":
         raise HTTPException(status_code=400, detail="Orçamento já está aprovado")
 
     orcamento.status = "Aprovado"
     db.commit()
     db.refresh(orcamento)
+    metricas.incrementar("orcamentos_aprovados_total")
+
+    response.headers["ETag"] = etag_orcamento(orcamento)
 
     return orcamento
 
@@ -380,6 +524,8 @@ def aprovar_orcamento(
 def atualizar_desconto(
     orcamento_id: int,
     dados: AtualizarDescontoOrcamento,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_admin),
 ):
@@ -397,6 +543,8 @@ def atualizar_desconto(
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado")
 
+    verificar_if_match(orcamento, if_match)
+
     if orcamento.status == "Aprovado":
         raise HTTPException(
             status_code=400, detail="Não é possível alterar orçamento aprovado"
@@ -405,10 +553,9 @@ def atualizar_desconto(
     desconto_anterior = orcamento.desconto_percentual
 
     # Calcular novo valor líquido
-    desconto = orcamento.valor_total_bruto * (
-        dados.desconto_percentual / Decimal("100")
+    valor_liquido = calcular_valor_liquido(
+        orcamento.valor_total_bruto, dados.desconto_percentual
     )
-    valor_liquido = orcamento.valor_total_bruto - desconto
 
     # Atualizar orçamento
     orcamento.desconto_percentual = dados.desconto_percentual
@@ -428,6 +575,7 @@ def atualizar_desconto(
 
     db.commit()
     db.refresh(orcamento)
+    response.headers["ETag"] = etag_orcamento(orcamento)
 
     return orcamento
 
@@ -439,6 +587,8 @@ def atualizar_horas_item(
     orcamento_id: int,
     item_orcamento_id: int,
     dados: AtualizarHorasItem,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_token),
 ):
@@ -473,6 +623,8 @@ def atualizar_horas_item(
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado")
 
+    verificar_if_match(orcamento, if_match)
+
     if orcamento.status == "Aprovado":
         raise HTTPException(
             status_code=400, detail="Não é possível alterar orçamento aprovado"
@@ -496,21 +648,13 @@ def atualizar_horas_item(
         contrato.valor_ust,
     )
 
-    # Calcular diferença de valores
-    diferenca_bruto = valor_item_bruto - item.subtotal_bruto
-
     # Atualizar item
     item.horas_estimadas = dados.horas_estimadas
     item.subtotal_ust = ust_item
     item.subtotal_bruto = valor_item_bruto
 
     # Atualizar totais no orçamento
-    novo_total_bruto = orcamento.valor_total_bruto + diferenca_bruto
-    desconto = novo_total_bruto * (orcamento.desconto_percentual / Decimal("100"))
-    novo_valor_liquido = novo_total_bruto - desconto
-
-    orcamento.valor_total_bruto = novo_total_bruto
-    orcamento.valor_total_liquido = novo_valor_liquido
+    atualizar_totais(db, orcamento)
 
     # Registrar auditoria
     registrar_auditoria(
@@ -527,6 +671,7 @@ def atualizar_horas_item(
 
     db.commit()
     db.refresh(orcamento)
+    response.headers["ETag"] = etag_orcamento(orcamento)
 
     return orcamento
 
@@ -534,6 +679,7 @@ def atualizar_horas_item(
 @order_router.delete("/{orcamento_id}", status_code=204)
 def deletar_orcamento(
     orcamento_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     usuario_admin: Usuario = Depends(verificar_admin),
 ):
@@ -545,6 +691,8 @@ def deletar_orcamento(
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado")
 
+    verificar_if_match(orcamento, if_match)
+
     if orcamento.status == "Aprovado":
         raise HTTPException(
             status_code=400, detail="Não é possível deletar orçamento aprovado"
@@ -558,6 +706,8 @@ def deletar_orcamento(
 def adicionar_item_orcamento(
     orcamento_id: int,
     item_data: ItemOrcamentoCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_token),
 ):
@@ -569,6 +719,8 @@ def adicionar_item_orcamento(
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado")
 
+    verificar_if_match(orcamento, if_match)
+
     if orcamento.status == "Aprovado":
         raise HTTPException(
             status_code=400, detail="Não é possível alterar orçamento aprovado"
@@ -619,15 +771,11 @@ def adicionar_item_orcamento(
     db.add(novo_item)
 
     # Atualizar totais do orçamento
-    novo_total_bruto = orcamento.valor_total_bruto + valor_item_bruto
-    desconto = novo_total_bruto * (orcamento.desconto_percentual / Decimal("100"))
-    novo_valor_liquido = novo_total_bruto - desconto
-
-    orcamento.valor_total_bruto = novo_total_bruto
-    orcamento.valor_total_liquido = novo_valor_liquido
+    atualizar_totais(db, orcamento)
 
     db.commit()
     db.refresh(orcamento)
+    response.headers["ETag"] = etag_orcamento(orcamento)
 
     return orcamento
 
@@ -638,6 +786,8 @@ def adicionar_item_orcamento(
 def remover_item_orcamento(
     orcamento_id: int,
     item_orcamento_id: int,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     usuario_atual: Usuario = Depends(verificar_token),
 ):
@@ -649,6 +799,8 @@ def remover_item_orcamento(
     if not orcamento:
         raise HTTPException(status_code=404, detail="Orçamento não encontrado")
 
+    verificar_if_match(orcamento, if_match)
+
     if orcamento.status == "Aprovado":
         raise HTTPException(
             status_code=400, detail="Não é possível alterar orçamento aprovado"
@@ -668,14 +820,6 @@ def remover_item_orcamento(
             status_code=404, detail="Item não encontrado neste orçamento"
         )
 
-    # Subtrair valor do item dos totais
-    novo_total_bruto = orcamento.valor_total_bruto - item.subtotal_bruto
-    desconto = novo_total_bruto * (orcamento.desconto_percentual / Decimal("100"))
-    novo_valor_liquido = novo_total_bruto - desconto
-
-    orcamento.valor_total_bruto = novo_total_bruto
-    orcamento.valor_total_liquido = novo_valor_liquido
-
     # Se era o único item, marcar que orçamento ficou vazio
     if len(orcamento.itens) == 1:
         raise HTTPException(
@@ -683,7 +827,12 @@ def remover_item_orcamento(
         )
 
     db.delete(item)
+
+    # Atualizar totais do orçamento sem o item
+    atualizar_totais(db, orcamento)
+
     db.commit()
     db.refresh(orcamento)
+    response.headers["ETag"] = etag_orcamento(orcamento)
 
     return orcamento
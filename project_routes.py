@@ -5,8 +5,12 @@ from auth_routes import verificar_admin, verificar_token
 from database import get_db
 from models import Cliente, Contrato, Projeto, Usuario
 from schemas import ProjetoCreate, ProjetoResponse, ProjetoUpdate
+from services.cache_consultas import listagem_em_cache
+from services.request_timing import TimedRoute
 
-project_router = APIRouter(prefix="/projetos", tags=["projetos"])
+project_router = APIRouter(
+    prefix="/projetos", tags=["projetos"], route_class=TimedRoute
+)
 
 
 @project_router.post("/", response_model=ProjetoResponse, status_code=201)
@@ -71,19 +75,38 @@ def listar_projetos(
     - cliente_id: filtrar por cliente
     - contrato_id: filtrar por contrato
     - status: filtrar por status (ativo/inativo)
-    """
-    query = db.query(Projeto)
-
-    if cliente_id:
-        query = query.filter(Projeto.cliente_id == cliente_id)
-
-    if contrato_id:
-        query = query.filter(Projeto.contrato_id == contrato_id)
 
-    if status:
-        query = query.filter(Projeto.status == status)
+    A resposta fica em cache até a próxima escrita em projetos.
+    """
 
-    return query.offset(skip).limit(limit).all()
+    def consultar():
+        query = db.query(Projeto)
+
+        if cliente_id:
+            query = query.filter(Projeto.cliente_id == cliente_id)
+
+        if contrato_id:
+            query = query.filter(Projeto.contrato_id == contrato_id)
+
+        if status:
+            query = query.filter(Projeto.status == status)
+
+        return query.offset(skip).limit(limit).all()
+
+    return listagem_em_cache(
+        db,
+        "projetos",
+        ("projetos",),
+        {
+            "skip": skip,
+            "limit": limit,
+            "cliente_id": cliente_id,
+            "contrato_id": contrato_id,
+            "status": status,
+        },
+        consultar,
+        ProjetoResponse,
+    )
 
 
 @project_router.get("/{projeto_id}", response_model=ProjetoResponse)
@@ -0,0 +1,70 @@
+"""
+Identificação da API e roteadores, sem efeitos colaterais na importação.
+
+O main.py monta a aplicação a partir daqui (e aí sim cria tabelas, o admin
+padrão, middlewares e tarefas de fundo). O gerar_openapi.py usa só este
+módulo: o build gera o schema sem conectar ao banco de produção.
+"""
+
+import os
+
+from fastapi import APIRouter
+
+from audit_routes import audit_router
+from auth_routes import auth_router
+from catalog_routes import catalog_router
+from change_routes import change_router
+from client_routes import client_router
+from contract_routes import contract_router
+from job_routes import job_router
+from metrics_routes import metrics_router
+from order_routes import order_router
+from project_routes import project_router
+
+TITULO = "API de Gestão de Orçamentos com UST"
+DESCRICAO = (
+    "Sistema robusto de orçamentos corporativos baseado em Unidade de Serviço Técnico"
+)
+VERSAO = "1.0.0"
+
+# Schema OpenAPI pré-gerado no build (python gerar_openapi.py)
+OPENAPI_JSON_PATH = os.environ.get(
+    "OPENAPI_JSON_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "openapi.json"),
+)
+
+root_router = APIRouter()
+
+
+@root_router.get("/")
+def read_root():
+    return {
+        "message": TITULO,
+        "version": VERSAO,
+        "docs": "/docs",
+        "endpoints": {
+            "clientes": "/clientes",
+            "contratos": "/contratos",
+            "catálogo": "/catalogo",
+            "projetos": "/projetos",
+            "orçamentos": "/orcamentos",
+            "autenticação": "/auth",
+            "alterações": "/changes",
+        },
+    }
+
+
+# Na ordem em que são incluídos na aplicação (e aparecem no schema)
+ROTEADORES = (
+    auth_router,
+    client_router,
+    contract_router,
+    catalog_router,
+    project_router,
+    order_router,
+    audit_router,
+    job_router,
+    change_router,
+    metrics_router,
+    root_router,
+)
@@ -1,8 +1,9 @@
-from datetime import date
+import json
+from datetime import date, datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 # ========== USUÁRIO ==========
@@ -193,6 +194,7 @@ class OrcamentoResponse(BaseModel):
     desconto_percentual: Decimal
     valor_total_liquido: Decimal
     observacoes: Optional[str] = None
+    row_version: int
     itens: List[ItemOrcamentoResponse]
 
     class Config:
@@ -212,13 +214,33 @@ class HistoricoAuditoriaResponse(BaseModel):
     usuario_id: Optional[int] = None
     valor_anterior: Decimal
     valor_novo: Decimal
-    data_alteracao: str
+    data_alteracao: datetime
     motivo: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class AuditoriaPaginaResponse(BaseModel):
+    itens: List[HistoricoAuditoriaResponse]
+    proximo: Optional[str] = None  # use como ?cursor= na próxima página
+
+
+class HorasItemEstado(BaseModel):
+    item_orcamento_id: int
+    horas_estimadas: Decimal
+
+
+class EstadoOrcamentoResponse(BaseModel):
+    orcamento_id: int
+    em: datetime
+    desconto_percentual: Decimal
+    itens: List[HorasItemEstado]
+    ultimo_evento_id: Optional[int] = None  # último evento de auditoria contido
+    checkpoint_id: Optional[int] = None  # ponto de partida (None = estado atual)
+    eventos_aplicados: int
+
+
 # ========== ATUALIZAÇÃO DE HORAS E DESCONTO ==========
 class AtualizarHorasItem(BaseModel):
     horas_estimadas: Decimal = Field(..., ge=0, decimal_places=4)
@@ -230,6 +252,72 @@ class AtualizarDescontoOrcamento(BaseModel):
     motivo: Optional[str] = None
 
 
+# ========== CONSULTAS LENTAS ==========
+class ConsultaLentaResponse(BaseModel):
+    sql: str
+    parametros: Optional[Union[List[str], Dict[str, str], str]] = None
+    rota: Optional[str] = None
+    ocorrencias: int
+    total_ms: float
+    max_ms: float
+    media_ms: float
+    ultima_ocorrencia: Optional[str] = None
+    plano: Optional[List[str]] = None
+
+
+# ========== PERFILAMENTO ==========
+class PerfilamentoCreate(BaseModel):
+    rota: str = Field(
+        ..., min_length=1, description="Ex: PUT /orcamentos/{id} (aceita * e ?)"
+    )
+    requisicoes: int = Field(10, ge=1, le=1000)
+    intervalo_ms: float = Field(5, ge=1, le=1000)
+
+
+class PerfilamentoResponse(BaseModel):
+    ativo: bool
+    padrao: Optional[str] = None
+    requisicoes_restantes: int
+    requisicoes_capturadas: int
+    intervalo_ms: float
+    amostras: int
+    pilhas_distintas: int
+    iniciado_em: Optional[str] = None
+    finalizado_em: Optional[str] = None
+
+
+# ========== JOBS ==========
+class JobResponse(BaseModel):
+    id: int
+    tipo: str
+    status: str
+    progresso: int
+    tentativas: int
+    max_tentativas: int
+    parametros: Optional[dict] = None
+    resultado: Optional[Union[dict, list]] = None
+    erro: Optional[str] = None
+    criado_em: datetime
+    iniciado_em: Optional[datetime] = None
+    finalizado_em: Optional[datetime] = None
+
+    # parametros e resultado são gravados como JSON na tabela jobs
+    @field_validator("parametros", "resultado", mode="before")
+    @classmethod
+    def _carregar_json(cls, valor):
+        return json.loads(valor) if isinstance(valor, str) else valor
+
+    class Config:
+        from_attributes = True
+
+
+# ========== CHANGE FEED ==========
+class AlteracoesResponse(BaseModel):
+    cursor: int  # use como ?since= na próxima chamada
+    mais: bool  # há mais alterações depois desta página
+    alteracoes: List[Tuple[str, int, str, int]]  # (entidade, id, operacao, versao)
+
+
 # ========== TOKEN ==========
 class Token(BaseModel):
     access_token: str
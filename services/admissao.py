@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import deque
+
+from services.metrics import metricas
+
+# Limites por classe de rota, no formato "concorrencia/fila": até
+# `concorrencia` requisições da classe executando ao mesmo tempo, por
+# worker, e até `fila` esperando vaga. Além disso, 503 na hora. "0" desliga.
+ADMISSAO_LEITURAS = os.environ.get("ADMISSAO_LEITURAS", "32/64")
+ADMISSAO_LISTAGENS = os.environ.get("ADMISSAO_LISTAGENS", "4/16")
+ADMISSAO_ESCRITAS = os.environ.get("ADMISSAO_ESCRITAS", "8/32")
+ADMISSAO_EXPORTACOES = os.environ.get("ADMISSAO_EXPORTACOES", "2/2")
+# Espera máxima (s) por uma vaga. Menor que o timeout do proxy: quem não
+# vai ser atendido a tempo recebe 503 antes de o trabalho ser feito.
+ADMISSAO_ESPERA_S = float(os.environ.get("ADMISSAO_ESPERA_S", "2"))
+
+# Classes por método e caminho; a primeira regra que casar vale. Caminhos
+# sem regra são leituras (GET) ou escritas (demais métodos).
+ISENTA = "isenta"
+REGRAS = (
+    # Conexões longas (SSE) e observabilidade não disputam vagas
+    ("GET", re.compile(r"^/orcamentos/\d+/eventos$"), ISENTA),
+    ("GET", re.compile(r"^/(metrics|docs|redoc|openapi\.json)?$"), ISENTA),
+    # Login e registro já têm executor do KDF e limite de taxa próprios
+    ("POST", re.compile(r"^/auth/(login|registro)$"), ISENTA),
+    ("GET", re.compile(r"^/auditoria/exportar$"), "exportacoes"),
+    (
+        "GET",
+        re.compile(r"^/(orcamentos|clientes|contratos|projetos|catalogo)/?$"),
+        "listagens",
+    ),
+    ("GET", re.compile(r"^/(auditoria|changes)(/|$)"), "listagens"),
+)
+
+metricas.descrever(
+    "admissao_rejeitadas_total",
+    "counter",
+    "Requisições recusadas com 503 por classe e motivo (fila_cheia/espera)",
+)
+metricas.descrever(
+    "admissao_espera_segundos",
+    "histogram",
+    "Tempo na fila de admissão das requisições que conseguiram vaga",
+)
+
+
+class Compartimento:
+    """
+    Vagas de uma classe de rota, com fila de espera limitada.
+
+    Roda no event loop (sem threads): `entrar` devolve False em vez de
+    esperar quando a fila está cheia ou quando a vaga não sai em `espera_s`.
+    """
+
+    def __init__(self, nome: str, concorrencia: int, fila: int):
+        self.nome = nome
+        self.concorrencia = concorrencia
+        self.fila = fila
+        self.ativas = 0
+        self._esperando = deque()
+
+    @classmethod
+    def de_texto(cls, nome: str, texto: str):
+        """'4/16' → Compartimento(nome, 4, 16); '0' ou vazio → None."""
+        if not texto or texto.strip() == "0":
+            return None
+        concorrencia, fila = texto.split("/")
+        return cls(nome, int(concorrencia), int(fila))
+
+    def esperando(self) -> int:
+        return len(self._esperando)
+
+    async def entrar(self, espera_s: float) -> bool:
+        if self.ativas < self.concorrencia and not self._esperando:
+            self.ativas += 1
+            return True
+        if len(self._esperando) >= self.fila:
+            metricas.incrementar(
+                "admissao_rejeitadas_total", classe=self.nome, motivo="fila_cheia"
+            )
+            return False
+
+        inicio = time.perf_counter()
+        vaga = asyncio.get_running_loop().create_future()
+        self._esperando.append(vaga)
+        try:
+            await asyncio.wait_for(asyncio.shield(vaga), espera_s)
+        except asyncio.TimeoutError:
+            if vaga.done():  # a vaga chegou junto com o prazo
+                return True
+            self._esperando.remove(vaga)
+            metricas.incrementar(
+                "admissao_rejeitadas_total", classe=self.nome, motivo="espera"
+            )
+            return False
+        except asyncio.CancelledError:
+            # Cliente desconectou esperando: devolve a vaga, se já recebeu
+            if vaga.done():
+                self.sair()
+            else:
+                self._esperando.remove(vaga)
+            raise
+        metricas.observar(
+            "admissao_espera_segundos", time.perf_counter() - inicio, classe=self.nome
+        )
+        return True
+
+    def sair(self):
+        """Libera a vaga, passando-a direto ao primeiro da fila."""
+        if self._esperando:
+            self._esperando.popleft().set_result(None)
+        else:
+            self.ativas -= 1
+
+
+def criar_compartimentos():
+    compartimentos = {
+        "leituras": Compartimento.de_texto("leituras", ADMISSAO_LEITURAS),
+        "listagens": Compartimento.de_texto("listagens", ADMISSAO_LISTAGENS),
+        "escritas": Compartimento.de_texto("escritas", ADMISSAO_ESCRITAS),
+        "exportacoes": Compartimento.de_texto("exportacoes", ADMISSAO_EXPORTACOES),
+    }
+    return {nome: c for nome, c in compartimentos.items() if c is not None}
+
+
+compartimentos = criar_compartimentos()
+
+
+def classificar(metodo: str, caminho: str) -> str:
+    for metodo_regra, padrao, classe in REGRAS:
+        if metodo == metodo_regra and padrao.match(caminho):
+            return classe
+    return "leituras" if metodo in ("GET", "HEAD") else "escritas"
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI de controle de admissão por classe de rota.
+
+    Cada classe (leituras, listagens, escritas, exportações) tem vagas
+    próprias: uma rajada de listagens pesadas espera ou recebe 503 sem
+    tirar vaga das leituras baratas, como /auth/me. A vaga é mantida até o
+    fim do envio da resposta, então exportações em streaming contam
+    enquanto transmitem.
+    """
+
+    def __init__(self, app, classes=None, espera_s: float = ADMISSAO_ESPERA_S):
+        self.app = app
+        self.compartimentos = classes if classes is not None else compartimentos
+        self.espera_s = espera_s
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        compartimento = self.compartimentos.get(
+            classificar(scope["method"], scope["path"])
+        )
+        if compartimento is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await compartimento.entrar(self.espera_s):
+            await _responder_503(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            compartimento.sair()
+
+
+async def _responder_503(send):
+    corpo = json.dumps({"detail": "Servidor sobrecarregado, tente novamente"}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": corpo})
+
+
+def coletor_admissao():
+    amostras = []
+    for nome, compartimento in compartimentos.items():
+        labels = {"classe": nome}
+        amostras.append(
+            (
+                "admissao_ativas",
+                "gauge",
+                "Requisições executando, por classe de rota",
+                labels,
+                compartimento.ativas,
+            )
+        )
+        amostras.append(
+            (
+                "admissao_fila",
+                "gauge",
+                "Requisições esperando vaga, por classe de rota",
+                labels,
+                compartimento.esperando(),
+            )
+        )
+    return amostras
@@ -0,0 +1,303 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import HistoricoAuditoria, IndiceSegmentoAuditoria, SegmentoAuditoria
+from services.jobs import tarefa
+from services.metrics import metricas
+
+logger = logging.getLogger("api.arquivo_auditoria")
+
+# Eventos de auditoria mais antigos que isso (dias) saem da tabela e vão
+# para segmentos comprimidos; as leituras continuam vendo os dois
+AUDITORIA_RETENCAO_DIAS = float(os.environ.get("AUDITORIA_RETENCAO_DIAS", "90"))
+# Diretório dos segmentos (gzip NDJSON, gravados uma vez e nunca alterados)
+AUDITORIA_ARQUIVO_DIR = os.environ.get("AUDITORIA_ARQUIVO_DIR", "arquivo_auditoria")
+# Eventos por segmento
+AUDITORIA_SEGMENTO_EVENTOS = int(os.environ.get("AUDITORIA_SEGMENTO_EVENTOS", "50000"))
+
+CAMPOS = (
+    "id",
+    "tipo_alteracao",
+    "orcamento_id",
+    "item_orcamento_id",
+    "usuario_id",
+    "valor_anterior",
+    "valor_novo",
+    "data_alteracao",
+    "motivo",
+)
+
+metricas.descrever(
+    "auditoria_eventos_arquivados_total",
+    "counter",
+    "Eventos de auditoria movidos para segmentos comprimidos",
+)
+metricas.descrever(
+    "auditoria_segmentos_lidos_total",
+    "counter",
+    "Segmentos do arquivo da auditoria lidos para responder consultas",
+)
+
+
+# ========== FORMATO ==========
+
+
+def _serializar(evento) -> bytes:
+    linha = {campo: getattr(evento, campo) for campo in CAMPOS}
+    linha["valor_anterior"] = str(linha["valor_anterior"])
+    linha["valor_novo"] = str(linha["valor_novo"])
+    linha["data_alteracao"] = linha["data_alteracao"].isoformat()
+    return json.dumps(linha, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def _desserializar(linha: bytes) -> HistoricoAuditoria:
+    """Evento arquivado como HistoricoAuditoria transiente (fora da sessão)."""
+    dados = json.loads(linha)
+    evento = HistoricoAuditoria(
+        tipo_alteracao=dados["tipo_alteracao"],
+        orcamento_id=dados["orcamento_id"],
+        item_orcamento_id=dados["item_orcamento_id"],
+        usuario_id=dados["usuario_id"],
+        valor_anterior=Decimal(dados["valor_anterior"]),
+        valor_novo=Decimal(dados["valor_novo"]),
+        data_alteracao=datetime.fromisoformat(dados["data_alteracao"]),
+        motivo=dados["motivo"],
+    )
+    evento.id = dados["id"]
+    return evento
+
+
+def utc(valor):
+    """Datas sem fuso são UTC, como em DataHoraUTC."""
+    if valor is not None and valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+def _caminho(arquivo: str) -> str:
+    return os.path.join(AUDITORIA_ARQUIVO_DIR, arquivo)
+
+
+def ler_segmento(segmento: SegmentoAuditoria):
+    """Eventos do segmento, em ordem de id."""
+    metricas.incrementar("auditoria_segmentos_lidos_total")
+    with gzip.open(_caminho(segmento.arquivo), "rb") as entrada:
+        for linha in entrada:
+            yield _desserializar(linha)
+
+
+# ========== ARQUIVAMENTO ==========
+
+
+def _gravar_segmento(eventos) -> tuple:
+    """
+    Grava o segmento num arquivo temporário e renomeia no fim: um segmento
+    visível está sempre completo. Refazer o mesmo lote sobrescreve o arquivo
+    órfão de uma execução interrompida antes do commit.
+    """
+    os.makedirs(AUDITORIA_ARQUIVO_DIR, exist_ok=True)
+    arquivo = f"auditoria_{eventos[0].id:012d}_{eventos[-1].id:012d}.ndjson.gz"
+    temporario = _caminho(arquivo) + ".tmp"
+    with open(temporario, "wb") as saida:
+        with gzip.GzipFile(fileobj=saida, mode="wb", mtime=0) as comprimido:
+            for evento in eventos:
+                comprimido.write(_serializar(evento))
+        saida.flush()
+        os.fsync(saida.fileno())
+        tamanho = saida.tell()
+    os.replace(temporario, _caminho(arquivo))
+    return arquivo, tamanho
+
+
+def arquivar_lote(db: Session, corte: datetime):
+    """
+    Move para um segmento até AUDITORIA_SEGMENTO_EVENTOS eventos anteriores
+    a `corte`, em ordem de id. Retorna o segmento criado ou None.
+    """
+    eventos = (
+        db.query(HistoricoAuditoria)
+        .filter(HistoricoAuditoria.data_alteracao < corte)
+        .order_by(HistoricoAuditoria.id)
+        .limit(AUDITORIA_SEGMENTO_EVENTOS)
+        .all()
+    )
+    if not eventos:
+        return None
+
+    arquivo, tamanho = _gravar_segmento(eventos)
+    datas = [evento.data_alteracao for evento in eventos]
+    segmento = SegmentoAuditoria(
+        arquivo=arquivo,
+        primeiro_evento_id=eventos[0].id,
+        ultimo_evento_id=eventos[-1].id,
+        data_inicio=min(datas),
+        data_fim=max(datas),
+        registros=len(eventos),
+        bytes=tamanho,
+        criado_em=datetime.now(),
+    )
+    db.add(segmento)
+    db.flush()
+
+    por_orcamento = {}
+    for evento in eventos:
+        indice = por_orcamento.get(evento.orcamento_id)
+        if indice is None:
+            por_orcamento[evento.orcamento_id] = IndiceSegmentoAuditoria(
+                segmento_id=segmento.id,
+                orcamento_id=evento.orcamento_id,
+                data_inicio=evento.data_alteracao,
+                data_fim=evento.data_alteracao,
+                registros=1,
+            )
+        else:
+            indice.data_inicio = min(indice.data_inicio, evento.data_alteracao)
+            indice.data_fim = max(indice.data_fim, evento.data_alteracao)
+            indice.registros += 1
+    db.add_all(por_orcamento.values())
+
+    # Mesmo critério do SELECT: eventos recentes no meio do intervalo ficam
+    db.query(HistoricoAuditoria).filter(
+        HistoricoAuditoria.id.between(eventos[0].id, eventos[-1].id),
+        HistoricoAuditoria.data_alteracao < corte,
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    metricas.incrementar("auditoria_eventos_arquivados_total", len(eventos))
+    return segmento
+
+
+@tarefa("arquivar_auditoria")
+def arquivar_auditoria(db: Session, parametros: dict, progresso):
+    """
+    Tarefa da fila: move os eventos com mais de `dias` (padrão
+    AUDITORIA_RETENCAO_DIAS) para segmentos comprimidos, um commit por
+    segmento.
+    """
+    dias = parametros.get("dias")
+    if dias is None:
+        dias = AUDITORIA_RETENCAO_DIAS
+    corte = datetime.now(timezone.utc) - timedelta(days=dias)
+    total = (
+        db.query(func.count(HistoricoAuditoria.id))
+        .filter(HistoricoAuditoria.data_alteracao < corte)
+        .scalar()
+    )
+
+    segmentos = eventos = 0
+    while (segmento := arquivar_lote(db, corte)) is not None:
+        segmentos += 1
+        eventos += segmento.registros
+        progresso(min(eventos * 100 // max(total, 1), 100))
+
+    if segmentos:
+        logger.info(
+            "Auditoria: %s eventos arquivados em %s segmentos", eventos, segmentos
+        )
+    return {"segmentos": segmentos, "eventos": eventos}
+
+
+# ========== LEITURA ==========
+
+
+def segmentos_candidatos(db: Session, orcamento_id=None, de=None, ate=None):
+    """
+    (segmento, data_fim) dos segmentos que podem ter eventos do orçamento
+    entre `de` (inclusivo) e `ate` (exclusivo), em ordem de id. Com
+    `orcamento_id`, data_fim é a do último evento do orçamento no segmento.
+    """
+    de, ate = utc(de), utc(ate)
+    if orcamento_id is not None:
+        query = (
+            db.query(SegmentoAuditoria, IndiceSegmentoAuditoria.data_fim)
+            .join(
+                IndiceSegmentoAuditoria,
+                IndiceSegmentoAuditoria.segmento_id == SegmentoAuditoria.id,
+            )
+            .filter(IndiceSegmentoAuditoria.orcamento_id == orcamento_id)
+        )
+        inicio, fim = IndiceSegmentoAuditoria.data_inicio, IndiceSegmentoAuditoria.data_fim
+    else:
+        query = db.query(SegmentoAuditoria, SegmentoAuditoria.data_fim)
+        inicio, fim = SegmentoAuditoria.data_inicio, SegmentoAuditoria.data_fim
+    if de is not None:
+        query = query.filter(fim >= de)
+    if ate is not None:
+        query = query.filter(inicio < ate)
+    return query.order_by(SegmentoAuditoria.ultimo_evento_id).all()
+
+
+def buscar(
+    db: Session,
+    quantidade=None,
+    *,
+    orcamento_id=None,
+    de=None,
+    ate=None,
+    filtro=None,
+    por_data=False,
+    antes=None,
+):
+    """
+    Eventos arquivados, do mais recente para o mais antigo.
+
+    A ordem é por id, ou por (data_alteracao, id) com `por_data`; `antes`
+    é uma chave nessa ordem (exclusiva), para paginação por cursor. `de`
+    (inclusivo) e `ate` (exclusivo) filtram data_alteracao e, com
+    `orcamento_id`, escolhem os segmentos pelo índice; `filtro` é aplicado
+    a cada evento. Com `quantidade`, a leitura para assim que nenhum
+    segmento restante pode ter eventos melhores que os já encontrados.
+    """
+    de, ate = utc(de), utc(ate)
+
+    def chave(evento):
+        if por_data:
+            return (evento.data_alteracao, evento.id)
+        return (evento.id,)
+
+    def teto(segmento, data_fim):
+        """Maior chave possível dentro do segmento."""
+        if por_data:
+            return (data_fim, segmento.ultimo_evento_id)
+        return (segmento.ultimo_evento_id,)
+
+    segmentos = sorted(
+        (
+            (teto(segmento, data_fim), segmento)
+            for segmento, data_fim in segmentos_candidatos(db, orcamento_id, de, ate)
+        ),
+        key=lambda par: par[0],
+        reverse=True,
+    )
+
+    encontrados = []
+    for maximo, segmento in segmentos:
+        if (
+            quantidade is not None
+            and len(encontrados) >= quantidade
+            and maximo < chave(encontrados[quantidade - 1])
+        ):
+            break
+        for evento in ler_segmento(segmento):
+            if orcamento_id is not None and evento.orcamento_id != orcamento_id:
+                continue
+            if de is not None and evento.data_alteracao < de:
+                continue
+            if ate is not None and evento.data_alteracao >= ate:
+                continue
+            if antes is not None and chave(evento) >= antes:
+                continue
+            if filtro is not None and not filtro(evento):
+                continue
+            encontrados.append(evento)
+        encontrados.sort(key=chave, reverse=True)
+        if quantidade is not None:
+            del encontrados[quantidade:]
+    return encontrados
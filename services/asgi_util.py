@@ -0,0 +1,25 @@
+async def ler_corpo(receive) -> bytes:
+    """Lê o corpo inteiro da requisição a partir do `receive` do ASGI."""
+    partes = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        partes.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(partes)
+
+
+def reenviar_corpo(corpo: bytes, receive):
+    """`receive` que entrega o corpo já lido e depois delega ao original."""
+    entregue = False
+
+    async def receive_com_corpo():
+        nonlocal entregue
+        if not entregue:
+            entregue = True
+            return {"type": "http.request", "body": corpo, "more_body": False}
+        return await receive()
+
+    return receive_com_corpo
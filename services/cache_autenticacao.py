@@ -0,0 +1,66 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Tokens verificados mantidos em memória por worker (LRU). Cada entrada
+# guarda só o digest do token e as claims (~250 bytes).
+AUTH_CACHE_MAX = int(os.environ.get("AUTH_CACHE_MAX", "10000"))
+
+
+def digest_token(token: str) -> bytes:
+    """Chave do cache: o token em si não fica guardado."""
+    return hashlib.sha256(token.encode()).digest()
+
+
+class CacheAutenticacao:
+    """
+    Cache em memória de tokens JWT já verificados.
+
+    Uma sessão reaproveita o mesmo token em centenas de requisições; com o
+    cache, só a primeira paga a verificação da assinatura. As seguintes
+    leem as claims daqui até o `exp` do token vencer. A revogação não passa
+    por aqui: é conferida a cada requisição em services/versoes_token.py.
+    """
+
+    def __init__(self, maximo: int = AUTH_CACHE_MAX):
+        self.maximo = maximo
+        self._entradas = OrderedDict()  # digest -> (claims, exp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obter(self, digest: bytes):
+        """Claims do token, ou None se ele não está no cache ou expirou."""
+        agora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(digest)
+            if entrada is None:
+                self.misses += 1
+                return None
+            claims, exp = entrada
+            if exp is not None and agora >= exp:
+                del self._entradas[digest]
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(digest)
+            self.hits += 1
+            return claims
+
+    def guardar(self, digest: bytes, claims: dict):
+        with self._lock:
+            self._entradas[digest] = (claims, claims.get("exp"))
+            self._entradas.move_to_end(digest)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_autenticacao = CacheAutenticacao()
@@ -0,0 +1,198 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import Cliente, Contrato, Projeto, ServicosCatalogo, VersaoTabela
+
+if engine.dialect.name == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert
+else:
+    from sqlalchemy.dialects.sqlite import insert
+
+# Orçamento (bytes) das listagens em cache por worker: o JSON já serializado
+# de cada resposta. Com 0, nada é guardado.
+CACHE_CONSULTAS_BYTES = int(
+    os.environ.get("CACHE_CONSULTAS_BYTES", str(32 * 1024 * 1024))
+)
+
+# Tabelas cujas listagens ficam em cache; cada commit que as altera
+# incrementa a versão delas em `versoes_tabelas`
+TABELAS_VERSIONADAS = frozenset(
+    modelo.__tablename__ for modelo in (Cliente, Contrato, Projeto, ServicosCatalogo)
+)
+
+
+class CacheConsultas:
+    """
+    Cache em memória (LRU, limitado em bytes) de listagens já serializadas.
+
+    A chave inclui as versões das tabelas lidas pela listagem: uma escrita
+    em qualquer worker incrementa a versão no banco, e a próxima leitura
+    monta outra chave. As entradas antigas não são mais pedidas e saem pelo
+    LRU.
+    """
+
+    def __init__(self, maximo_bytes: int = CACHE_CONSULTAS_BYTES):
+        self.maximo_bytes = maximo_bytes
+        self._entradas = OrderedDict()  # chave -> corpo (bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obter(self, chave):
+        with self._lock:
+            corpo = self._entradas.get(chave)
+            if corpo is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.hits += 1
+            return corpo
+
+    def guardar(self, chave, corpo: bytes):
+        if len(corpo) > self.maximo_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._entradas[chave] = corpo
+            self.bytes += len(corpo)
+            while self.bytes > self.maximo_bytes:
+                _, removido = self._entradas.popitem(last=False)
+                self.bytes -= len(removido)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+
+cache_consultas = CacheConsultas()
+
+
+def coletor_cache_consultas():
+    labels = {"cache": "consultas"}
+    return [
+        (
+            "cache_bytes",
+            "gauge",
+            "Bytes ocupados pelas entradas do cache",
+            labels,
+            cache_consultas.bytes,
+        ),
+        (
+            "cache_entradas",
+            "gauge",
+            "Entradas guardadas no cache",
+            labels,
+            len(cache_consultas),
+        ),
+    ]
+
+
+# ========== VERSÕES DAS TABELAS ==========
+
+
+def versoes(db: Session, tabelas) -> tuple:
+    """Versão atual de cada tabela, na ordem pedida (0 se nunca alterada)."""
+    linhas = dict(
+        db.query(VersaoTabela.tabela, VersaoTabela.versao).filter(
+            VersaoTabela.tabela.in_(tabelas)
+        )
+    )
+    return tuple(linhas.get(tabela, 0) for tabela in tabelas)
+
+
+_TOCADAS = "cache_consultas_tabelas"
+
+
+def _anotar_flush(session: Session, flush_context):
+    """after_flush: anota as tabelas versionadas que o flush alterou."""
+    tocadas = session.info.setdefault(_TOCADAS, set())
+    alterados = [
+        objeto
+        for objeto in session.dirty
+        if session.is_modified(objeto, include_collections=False)
+    ]
+    for objetos in (session.new, alterados, session.deleted):
+        for objeto in objetos:
+            tabela = getattr(objeto, "__tablename__", None)
+            if tabela in TABELAS_VERSIONADAS:
+                tocadas.add(tabela)
+
+
+def _incrementar_versoes(session: Session):
+    """before_commit: incrementa as versões na mesma transação do commit."""
+    session.flush()
+    tocadas = session.info.pop(_TOCADAS, None)
+    if not tocadas:
+        return
+
+    # Upsert: a primeira escrita numa tabela cria a linha, sem corrida
+    # entre workers. Ordem fixa, para transações concorrentes não se travarem.
+    comando = insert(VersaoTabela).values(
+        [{"tabela": tabela, "versao": 1} for tabela in sorted(tocadas)]
+    )
+    session.connection().execute(
+        comando.on_conflict_do_update(
+            index_elements=[VersaoTabela.tabela],
+            set_={"versao": VersaoTabela.versao + 1},
+        )
+    )
+
+
+def _descartar_tocadas(session: Session):
+    session.info.pop(_TOCADAS, None)
+
+
+def ativar_cache_consultas(fabrica):
+    """Registra o versionamento nas sessões criadas por `fabrica` (sessionmaker)."""
+    for nome, funcao in (
+        ("after_flush", _anotar_flush),
+        ("before_commit", _incrementar_versoes),
+        ("after_rollback", _descartar_tocadas),
+    ):
+        if not event.contains(fabrica, nome, funcao):
+            event.listen(fabrica, nome, funcao)
+
+
+# ========== LISTAGENS ==========
+
+
+@lru_cache
+def _adaptador(esquema):
+    return TypeAdapter(list[esquema])
+
+
+def listagem_em_cache(
+    db: Session, nome: str, tabelas: tuple, parametros: dict, consultar, esquema
+) -> Response:
+    """
+    Resposta JSON de uma listagem, do cache ou de `consultar()`.
+
+    `parametros` são os filtros e a paginação já validados pela rota, e
+    `esquema` é o schema de cada item (o mesmo do response_model).
+    """
+    # As versões são lidas antes da consulta: se uma escrita acontecer no
+    # meio, a resposta nova fica guardada sob as versões antigas, e ninguém
+    # que leia depois do commit a recebe
+    chave = (nome, tuple(sorted(parametros.items())), versoes(db, tabelas))
+    corpo = cache_consultas.obter(chave)
+    if corpo is None:
+        adaptador = _adaptador(esquema)
+        itens = adaptador.validate_python(consultar(), from_attributes=True)
+        corpo = adaptador.dump_json(itens, by_alias=True)
+        cache_consultas.guardar(chave, corpo)
+    return Response(corpo, media_type="application/json")
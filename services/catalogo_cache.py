@@ -0,0 +1,62 @@
+import threading
+
+from sqlalchemy.orm import Session
+
+from models import ServicosCatalogo
+from services.cache_consultas import versoes
+
+TABELA = ServicosCatalogo.__tablename__
+# Versão do catálogo lida por esta sessão (uma por requisição ou job)
+_VERSAO_NA_SESSAO = "catalogo_cache_versao"
+
+
+class CatalogoCache:
+    """
+    Cache em memória das complexidades UST dos itens do catálogo.
+
+    O recálculo de orçamentos em rascunho consulta a complexidade de cada
+    atividade; com o cache, o catálogo inteiro é carregado em uma única
+    consulta e reaproveitado enquanto a versão da tabela servicos_catalogo
+    (services/cache_consultas.py) não muda. Uma escrita no catálogo em
+    qualquer worker incrementa a versão no mesmo commit, e a próxima
+    requisição em todos os workers já usa os preços novos: as rotas do
+    catálogo não precisam invalidar nada. A versão é lida uma vez por
+    sessão: a listagem de rascunhos recalcula centenas de orçamentos com
+    uma leitura.
+    """
+
+    def __init__(self):
+        self._carregado = None  # (versao, {id: complexidade_ust})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def complexidades(self, db: Session) -> dict:
+        """Retorna {id: complexidade_ust}, recarregando se o catálogo mudou."""
+        versao = db.info.get(_VERSAO_NA_SESSAO)
+        if versao is None:
+            (versao,) = versoes(db, (TABELA,))
+            db.info[_VERSAO_NA_SESSAO] = versao
+        carregado = self._carregado
+        if carregado is not None and carregado[0] == versao:
+            self.hits += 1
+            return carregado[1]
+
+        with self._lock:
+            carregado = self._carregado
+            if carregado is not None and carregado[0] == versao:
+                self.hits += 1
+                return carregado[1]
+
+            self.misses += 1
+            # A versão foi lida antes: se o catálogo mudar no meio, a próxima
+            # chamada vê a versão nova e recarrega
+            linhas = db.query(
+                ServicosCatalogo.id, ServicosCatalogo.complexidade_ust
+            ).all()
+            complexidades = dict(linhas)
+            self._carregado = (versao, complexidades)
+            return complexidades
+
+
+catalogo_cache = CatalogoCache()
@@ -0,0 +1,262 @@
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import (
+    Alteracao,
+    Cliente,
+    Contrato,
+    CorteAlteracoes,
+    ItemOrcamento,
+    Orcamento,
+    Projeto,
+    ServicosCatalogo,
+)
+from services.jobs import tarefa
+from services.metrics import metricas
+
+logger = logging.getLogger("api.change_feed")
+
+# Alterações mais antigas que isso (s) são expurgadas do feed; clientes com
+# cursor anterior ao expurgo recebem 410 e refazem a sincronização completa
+ALTERACOES_RETENCAO_S = float(os.environ.get("ALTERACOES_RETENCAO_S", "604800"))
+# Intervalo mínimo (s) entre compactações automáticas, por processo
+ALTERACOES_COMPACTAR_S = float(os.environ.get("ALTERACOES_COMPACTAR_S", "300"))
+# No PostgreSQL, ids são atribuídos no INSERT mas ficam visíveis no COMMIT,
+# fora de ordem entre transações concorrentes. O feed só entrega alterações
+# gravadas há mais que isso (s), para o cursor não pular uma transação lenta.
+ALTERACOES_ATRASO_S = float(
+    os.environ.get(
+        "ALTERACOES_ATRASO_S", "2" if engine.dialect.name == "postgresql" else "0"
+    )
+)
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+# Entidades publicadas no feed, pelo nome da tabela
+ENTIDADES = {
+    Cliente: "clientes",
+    Contrato: "contratos",
+    Projeto: "projetos",
+    ServicosCatalogo: "servicos_catalogo",
+    Orcamento: "orcamentos",
+}
+
+metricas.descrever(
+    "alteracoes_registradas_total",
+    "counter",
+    "Alterações gravadas no change feed por entidade e operação",
+)
+
+
+# ========== REGISTRO (eventos da Session) ==========
+
+_PENDENTES = "change_feed_pendentes"
+
+
+def _anotar_flush(session: Session, flush_context):
+    """
+    after_flush: anota as entidades publicadas inseridas, alteradas ou
+    removidas. Alterações de itens contam como update do orçamento dono.
+
+    Uma transação pode ter vários flushes; as anotações se acumulam em
+    session.info e são gravadas uma vez só, no commit.
+    """
+    pendentes = session.info.setdefault(_PENDENTES, {})
+
+    def anotar(chave, operacao, objeto):
+        anterior = pendentes.get(chave)
+        # insert/delete prevalecem sobre update; delete prevalece sobre tudo
+        if anterior is None or operacao == DELETE or anterior[0] == UPDATE:
+            pendentes[chave] = (operacao, objeto)
+
+    alterados = [
+        objeto
+        for objeto in session.dirty
+        if session.is_modified(objeto, include_collections=False)
+    ]
+    for operacao, objetos in (
+        (INSERT, session.new),
+        (UPDATE, alterados),
+        (DELETE, session.deleted),
+    ):
+        for objeto in objetos:
+            entidade = ENTIDADES.get(type(objeto))
+            if entidade is not None:
+                anotar((entidade, objeto.id), operacao, objeto)
+            elif isinstance(objeto, ItemOrcamento) and objeto.orcamento_id:
+                anotar(("orcamentos", objeto.orcamento_id), UPDATE, None)
+
+
+def _gravar_pendentes(session: Session):
+    """before_commit: grava as anotações na mesma transação do commit."""
+    # O commit ainda vai fazer o último flush: faz antes, para anotá-lo
+    session.flush()
+    pendentes = session.info.pop(_PENDENTES, None)
+    if not pendentes:
+        return
+
+    agora = datetime.now()
+    linhas = []
+    for (entidade, entidade_id), (operacao, objeto) in pendentes.items():
+        if objeto is None:
+            # Orçamento tocado só pelos itens: versão atual, se carregado
+            objeto = session.identity_map.get(
+                session.identity_key(Orcamento, entidade_id)
+            )
+        linhas.append(
+            {
+                "entidade": entidade,
+                "entidade_id": entidade_id,
+                "operacao": operacao,
+                "versao": getattr(objeto, "row_version", None),
+                "criado_em": agora,
+            }
+        )
+        metricas.incrementar(
+            "alteracoes_registradas_total", entidade=entidade, operacao=operacao
+        )
+    session.connection().execute(insert(Alteracao), linhas)
+
+
+def _descartar_pendentes(session: Session):
+    session.info.pop(_PENDENTES, None)
+
+
+def ativar_change_feed(fabrica):
+    """Registra o change feed nas sessões criadas por `fabrica` (sessionmaker)."""
+    for nome, funcao in (
+        ("after_flush", _anotar_flush),
+        ("before_commit", _gravar_pendentes),
+        ("after_rollback", _descartar_pendentes),
+    ):
+        if not event.contains(fabrica, nome, funcao):
+            event.listen(fabrica, nome, funcao)
+
+
+# ========== LEITURA ==========
+
+
+class CursorExpirado(Exception):
+    """O cursor é anterior ao último expurgo: sincronize tudo de novo."""
+
+
+def cursor_atual(db: Session) -> int:
+    ultimo = db.query(func.coalesce(func.max(Alteracao.id), 0)).scalar()
+    # Com o log vazio depois de um expurgo, o cursor é o próprio corte
+    return max(ultimo, _corte(db))
+
+
+def _corte(db: Session) -> int:
+    corte = db.get(CorteAlteracoes, 1)
+    return corte.ate_id if corte else 0
+
+
+def listar_alteracoes(db: Session, desde: int, limite: int):
+    """
+    Alterações com id > `desde`, em ordem, no máximo `limite`.
+
+    Retorna (cursor, tuplas, mais): `cursor` é o próximo `since` a usar e
+    cada tupla é (entidade, id, operacao, versao), só a mais recente de
+    cada entidade da página. `versao` é a row_version para orçamentos (o
+    mesmo valor do ETag) e o próprio id da alteração para o resto.
+    """
+    if desde < _corte(db):
+        raise CursorExpirado()
+
+    query = db.query(
+        Alteracao.id,
+        Alteracao.entidade,
+        Alteracao.entidade_id,
+        Alteracao.operacao,
+        Alteracao.versao,
+    ).filter(Alteracao.id > desde)
+    if ALTERACOES_ATRASO_S:
+        query = query.filter(
+            Alteracao.criado_em
+            <= datetime.now() - timedelta(seconds=ALTERACOES_ATRASO_S)
+        )
+    linhas = query.order_by(Alteracao.id).limit(limite + 1).all()
+
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+    if not linhas:
+        return desde, [], False
+
+    ultimas = {}
+    for id_, entidade, entidade_id, operacao, versao in linhas:
+        chave = (entidade, entidade_id)
+        ultimas.pop(chave, None)  # reinsere no fim: ordem da última alteração
+        ultimas[chave] = (operacao, versao if versao is not None else id_)
+
+    tuplas = [
+        (entidade, entidade_id, operacao, versao)
+        for (entidade, entidade_id), (operacao, versao) in ultimas.items()
+    ]
+    return linhas[-1].id, tuplas, mais
+
+
+# ========== RETENÇÃO E COMPACTAÇÃO ==========
+
+
+def compactar_alteracoes(db: Session) -> dict:
+    """
+    Mantém o log pequeno:
+
+    - compactação: de cada entidade fica só a alteração mais recente (quem
+      lê a partir de qualquer cursor continua vendo o estado final);
+    - retenção: alterações com mais de ALTERACOES_RETENCAO_S são apagadas e
+      o corte avança, invalidando cursores anteriores a ele.
+    """
+    recentes = (
+        select(func.max(Alteracao.id))
+        .group_by(Alteracao.entidade, Alteracao.entidade_id)
+        .scalar_subquery()
+    )
+    compactadas = (
+        db.query(Alteracao)
+        .filter(Alteracao.id.not_in(recentes))
+        .delete(synchronize_session=False)
+    )
+
+    agora = datetime.now()
+    limite = agora - timedelta(seconds=ALTERACOES_RETENCAO_S)
+    ate_id = (
+        db.query(func.max(Alteracao.id))
+        .filter(Alteracao.criado_em < limite)
+        .scalar()
+    )
+    expiradas = 0
+    if ate_id is not None:
+        expiradas = (
+            db.query(Alteracao)
+            .filter(Alteracao.id <= ate_id)
+            .delete(synchronize_session=False)
+        )
+        corte = db.get(CorteAlteracoes, 1)
+        if corte is None:
+            db.add(CorteAlteracoes(id=1, ate_id=ate_id, atualizado_em=agora))
+        elif ate_id > corte.ate_id:
+            corte.ate_id = ate_id
+            corte.atualizado_em = agora
+
+    db.commit()
+    if compactadas or expiradas:
+        logger.info(
+            "Change feed: %s alterações compactadas, %s expiradas",
+            compactadas,
+            expiradas,
+        )
+    return {"compactadas": compactadas, "expiradas": expiradas}
+
+
+@tarefa("compactar_alteracoes")
+def tarefa_compactar_alteracoes(db: Session, parametros: dict, progresso):
+    """Tarefa da fila: retenção e compactação do change feed."""
+    return compactar_alteracoes(db)
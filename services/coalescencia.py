@@ -0,0 +1,109 @@
+import asyncio
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.concurrency import run_in_threadpool
+
+from services.metrics import metricas
+
+metricas.descrever(
+    "coalescencia_requisicoes_total",
+    "counter",
+    "GETs coalescidos: líder executa a rota, seguidor reaproveita a resposta",
+)
+
+
+def _query_normalizada(query_string: bytes) -> str:
+    """?b=2&a=1 e ?a=1&b=2 são a mesma consulta."""
+    return urlencode(sorted(parse_qsl(query_string.decode("latin-1"), True)))
+
+
+class SingleFlightMiddleware:
+    """
+    Middleware ASGI que coalesce GETs idênticos simultâneos (single flight).
+
+    Enquanto uma requisição (a líder) executa, as idênticas que chegam
+    esperam por ela e recebem o mesmo status, headers e corpo já
+    serializado, sem executar a rota de novo. Idênticas = mesmo caminho,
+    mesma query (em qualquer ordem), mesmo If-None-Match e mesmo nível de
+    acesso (`nivel_acesso(header Authorization)`: "admin", "usuario" ou
+    None). Sem credencial válida não há coalescência: a rota responde 401.
+
+    Nada fica guardado depois que a líder termina; respostas 5xx (ou
+    erro) não são compartilhadas, e os seguidores executam por conta
+    própria.
+    """
+
+    def __init__(self, app, prefixos=("/",), nivel_acesso=None):
+        self.app = app
+        self.prefixos = tuple(prefixos)
+        self.nivel_acesso = nivel_acesso
+        self._voos = {}  # chave -> Future com (start, corpo) ou None
+
+    def em_voo(self) -> int:
+        return len(self._voos)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.prefixos)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        nivel = None
+        if self.nivel_acesso is not None:
+            nivel = await run_in_threadpool(
+                self.nivel_acesso, headers.get(b"authorization")
+            )
+            if nivel is None:
+                await self.app(scope, receive, send)
+                return
+
+        chave = (
+            scope["path"],
+            _query_normalizada(scope["query_string"]),
+            nivel,
+            headers.get(b"if-none-match"),
+        )
+        voo = self._voos.get(chave)
+        if voo is not None:
+            resposta = await asyncio.shield(voo)
+            if resposta is None:
+                await self.app(scope, receive, send)
+                return
+            metricas.incrementar("coalescencia_requisicoes_total", papel="seguidor")
+            inicio, corpo = resposta
+            await send({**inicio, "headers": list(inicio["headers"])})
+            await send({"type": "http.response.body", "body": corpo})
+            return
+
+        voo = asyncio.get_running_loop().create_future()
+        self._voos[chave] = voo
+        resposta = None
+        try:
+            metricas.incrementar("coalescencia_requisicoes_total", papel="lider")
+            resposta = await self._executar(scope, receive, send)
+        finally:
+            del self._voos[chave]
+            voo.set_result(resposta)
+
+    async def _executar(self, scope, receive, send):
+        """Executa a rota repassando a resposta e guardando uma cópia."""
+        inicio = None
+        partes = []
+
+        async def send_guardando(message):
+            nonlocal inicio
+            if message["type"] == "http.response.start":
+                # Cópia: os middlewares de fora acrescentam headers na mensagem
+                inicio = {**message, "headers": list(message.get("headers", []))}
+            elif message["type"] == "http.response.body":
+                partes.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_guardando)
+        if inicio is None or inicio["status"] >= 500:
+            return None
+        return inicio, b"".join(partes)
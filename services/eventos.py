@@ -0,0 +1,543 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import socket
+import threading
+from decimal import Decimal
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, engine
+from models import Alteracao, ItemOrcamento, Orcamento
+from services.metrics import metricas
+
+logger = logging.getLogger("api.eventos")
+
+# Assinantes simultâneos por processo (conexões SSE); acima disso, 503
+EVENTOS_MAX_ASSINANTES = int(os.environ.get("EVENTOS_MAX_ASSINANTES", "500"))
+# Eventos em espera por assinante; um cliente lento que enche a fila recebe
+# um único evento "recarregar" no lugar dos eventos perdidos
+EVENTOS_FILA_MAX = int(os.environ.get("EVENTOS_FILA_MAX", "32"))
+# Intervalo (s) dos comentários de keep-alive no stream
+EVENTOS_HEARTBEAT_S = float(os.environ.get("EVENTOS_HEARTBEAT_S", "15"))
+# Distribuição entre workers: postgres (LISTEN/NOTIFY), polling (tabela
+# alteracoes) ou local (só este processo)
+EVENTOS_DISTRIBUIDOR = os.environ.get(
+    "EVENTOS_DISTRIBUIDOR",
+    "postgres" if engine.dialect.name == "postgresql" else "polling",
+)
+# Intervalo (s) entre consultas do distribuidor por polling
+EVENTOS_POLL_S = float(os.environ.get("EVENTOS_POLL_S", "1"))
+
+CANAL_POSTGRES = "orcamentos_eventos"
+# Limite do payload do NOTIFY no PostgreSQL é 8000 bytes
+PAYLOAD_MAX = 7900
+
+SNAPSHOT = "snapshot"
+ALTERACAO = "alteracao"
+REMOVIDO = "removido"
+RECARREGAR = "recarregar"
+
+ORIGEM = f"{socket.gethostname()}:{os.getpid()}"
+
+metricas.descrever(
+    "eventos_publicados_total", "counter", "Eventos de orçamento publicados por tipo"
+)
+metricas.descrever(
+    "eventos_descartados_total",
+    "counter",
+    "Eventos descartados porque a fila do assinante estava cheia",
+)
+
+
+def _decimal(valor):
+    return str(valor) if isinstance(valor, Decimal) else valor
+
+
+def _dados_orcamento(orcamento) -> dict:
+    return {
+        "row_version": orcamento.row_version,
+        "status": orcamento.status,
+        "valor_total_bruto": _decimal(orcamento.valor_total_bruto),
+        "desconto_percentual": _decimal(orcamento.desconto_percentual),
+        "valor_total_liquido": _decimal(orcamento.valor_total_liquido),
+    }
+
+
+def _dados_item(item) -> dict:
+    return {
+        "id": item.id,
+        "atividade_id": item.atividade_id,
+        "horas_estimadas": _decimal(item.horas_estimadas),
+        "subtotal_ust": _decimal(item.subtotal_ust),
+        "subtotal_bruto": _decimal(item.subtotal_bruto),
+    }
+
+
+def formatar_sse(tipo: str, dados: dict) -> bytes:
+    """Um evento no formato text/event-stream; o id é a row_version."""
+    linhas = [f"event: {tipo}"]
+    if dados.get("row_version") is not None:
+        linhas.append(f"id: {dados['row_version']}")
+    linhas.append("data: " + json.dumps(dados, separators=(",", ":")))
+    return ("\n".join(linhas) + "\n\n").encode()
+
+
+def carregar_snapshot(db: Session, orcamento_id: int):
+    """Estado atual do orçamento e de todos os itens, sem recalcular."""
+    orcamento = db.get(Orcamento, orcamento_id)
+    if orcamento is None:
+        return None
+    itens = (
+        db.query(ItemOrcamento)
+        .filter(ItemOrcamento.orcamento_id == orcamento_id)
+        .order_by(ItemOrcamento.sequencia, ItemOrcamento.id)
+        .all()
+    )
+    return {
+        "orcamento_id": orcamento_id,
+        **_dados_orcamento(orcamento),
+        "itens": [_dados_item(item) for item in itens],
+    }
+
+
+# ========== PUB/SUB EM PROCESSO ==========
+
+
+class Assinante:
+    """Uma conexão SSE: fila limitada no event loop da requisição."""
+
+    __slots__ = ("orcamento_id", "fila", "loop")
+
+    def __init__(self, orcamento_id: int, loop):
+        self.orcamento_id = orcamento_id
+        self.fila = asyncio.Queue(maxsize=EVENTOS_FILA_MAX)
+        self.loop = loop
+
+    def entregar(self, versao, corpo: bytes):
+        """Chamado no loop do assinante (call_soon_threadsafe)."""
+        if self.fila.full():
+            # Cliente lento: troca o acumulado por um único "recarregar"; os
+            # eventos seguintes continuam valendo depois da recarga
+            metricas.incrementar("eventos_descartados_total", self.fila.qsize())
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait(
+                (None, formatar_sse(RECARREGAR, {"orcamento_id": self.orcamento_id}))
+            )
+        self.fila.put_nowait((versao, corpo))
+
+
+class LimiteAssinantes(Exception):
+    pass
+
+
+class BarramentoEventos:
+    """
+    Pub/sub em processo dos eventos de orçamento.
+
+    Quem publica pode estar em qualquer thread (rotas síncronas, jobs); cada
+    assinante recebe no event loop da própria conexão. O evento é
+    serializado uma vez e os mesmos bytes vão para todos os assinantes.
+    """
+
+    def __init__(self, max_assinantes: int = EVENTOS_MAX_ASSINANTES):
+        self.max_assinantes = max_assinantes
+        self._assinantes = {}  # orcamento_id -> set(Assinante)
+        self._total = 0
+        # Última row_version publicada por orçamento (descarta repetições
+        # que chegam pelo distribuidor)
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def assinar(self, orcamento_id: int) -> Assinante:
+        assinante = Assinante(orcamento_id, asyncio.get_running_loop())
+        with self._lock:
+            if self._total >= self.max_assinantes:
+                raise LimiteAssinantes()
+            self._assinantes.setdefault(orcamento_id, set()).add(assinante)
+            self._total += 1
+        return assinante
+
+    def cancelar(self, assinante: Assinante):
+        with self._lock:
+            assinantes = self._assinantes.get(assinante.orcamento_id)
+            if assinantes and assinante in assinantes:
+                assinantes.discard(assinante)
+                self._total -= 1
+                if not assinantes:
+                    del self._assinantes[assinante.orcamento_id]
+                    self._versoes.pop(assinante.orcamento_id, None)
+
+    def orcamentos_assinados(self) -> list:
+        with self._lock:
+            return list(self._assinantes)
+
+    def total_assinantes(self) -> int:
+        return self._total
+
+    def lotado(self) -> bool:
+        return self._total >= self.max_assinantes
+
+    def ultima_versao(self, orcamento_id: int):
+        return self._versoes.get(orcamento_id)
+
+    def publicar(self, tipo: str, dados: dict):
+        orcamento_id = dados["orcamento_id"]
+        versao = dados.get("row_version")
+        with self._lock:
+            assinantes = list(self._assinantes.get(orcamento_id, ()))
+            if not assinantes:
+                return
+            anterior = self._versoes.get(orcamento_id)
+            if versao is not None:
+                if anterior is not None and versao <= anterior:
+                    return
+                self._versoes[orcamento_id] = versao
+
+        corpo = formatar_sse(tipo, dados)
+        metricas.incrementar("eventos_publicados_total", tipo=tipo)
+        for assinante in assinantes:
+            try:
+                assinante.loop.call_soon_threadsafe(
+                    assinante.entregar, versao, corpo
+                )
+            except RuntimeError:
+                # Loop já encerrado: a conexão caiu e ainda não cancelou
+                pass
+
+
+barramento = BarramentoEventos()
+
+
+def coletor_eventos():
+    return [
+        (
+            "eventos_assinantes",
+            "gauge",
+            "Conexões SSE de orçamentos abertas neste processo",
+            {},
+            barramento.total_assinantes(),
+        )
+    ]
+
+
+async def transmitir(orcamento_id: int):
+    """
+    Corpo do stream SSE de um orçamento: o snapshot atual e, depois, cada
+    alteração confirmada, com keep-alive a cada EVENTOS_HEARTBEAT_S.
+
+    Assina antes de ler o snapshot, para não perder um commit entre os
+    dois; eventos com versão já contida no snapshot são pulados.
+    """
+    try:
+        assinante = barramento.assinar(orcamento_id)
+    except LimiteAssinantes:
+        yield formatar_sse(RECARREGAR, {"orcamento_id": orcamento_id})
+        return
+
+    try:
+        snapshot = await run_in_threadpool(_ler_snapshot, orcamento_id)
+        if snapshot is None:
+            yield formatar_sse(REMOVIDO, {"orcamento_id": orcamento_id})
+            return
+        yield formatar_sse(SNAPSHOT, snapshot)
+
+        while True:
+            try:
+                versao, corpo = await asyncio.wait_for(
+                    assinante.fila.get(), EVENTOS_HEARTBEAT_S
+                )
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if versao is not None and versao <= snapshot["row_version"]:
+                continue
+            yield corpo
+            if corpo.startswith(b"event: " + REMOVIDO.encode()):
+                return
+    finally:
+        barramento.cancelar(assinante)
+
+
+def _ler_snapshot(orcamento_id: int):
+    db = SessionLocal()
+    try:
+        return carregar_snapshot(db, orcamento_id)
+    finally:
+        db.close()
+
+
+# ========== CAPTURA (eventos da Session) ==========
+
+_PENDENTES = "eventos_pendentes"
+_RECARREGAR = "eventos_recarregar"
+_PRONTOS = "eventos_prontos"
+
+
+def _pendente(session: Session, orcamento_id: int) -> dict:
+    pendentes = session.info.setdefault(_PENDENTES, {})
+    return pendentes.setdefault(
+        orcamento_id,
+        {"orcamento": None, "itens": {}, "removidos": set(), "removido": False},
+    )
+
+
+def _anotar_flush(session: Session, flush_context):
+    """after_flush: guarda os valores gravados de orçamentos e itens."""
+    for objeto in list(session.new) + list(session.dirty):
+        if isinstance(objeto, Orcamento):
+            if session.is_modified(objeto, include_collections=False):
+                _pendente(session, objeto.id)["orcamento"] = _dados_orcamento(objeto)
+        elif isinstance(objeto, ItemOrcamento):
+            if session.is_modified(objeto, include_collections=False):
+                pendente = _pendente(session, objeto.orcamento_id)
+                pendente["itens"][objeto.id] = _dados_item(objeto)
+    for objeto in session.deleted:
+        if isinstance(objeto, Orcamento):
+            _pendente(session, objeto.id)["removido"] = True
+        elif isinstance(objeto, ItemOrcamento):
+            pendente = _pendente(session, objeto.orcamento_id)
+            pendente["itens"].pop(objeto.id, None)
+            pendente["removidos"].add(objeto.id)
+
+
+def _anotar_exclusao_em_massa(delete_context):
+    """
+    query.delete() de itens não passa pelo flush: os orçamentos da
+    transação recebem "recarregar" em vez de uma alteração parcial.
+    """
+    if delete_context.mapper.class_ is ItemOrcamento:
+        delete_context.session.info[_RECARREGAR] = True
+
+
+def _eventos(session: Session) -> list:
+    pendentes = session.info.get(_PENDENTES) or {}
+    recarregar = session.info.get(_RECARREGAR, False)
+    eventos = []
+    for orcamento_id, pendente in pendentes.items():
+        if pendente["removido"]:
+            eventos.append((REMOVIDO, {"orcamento_id": orcamento_id}))
+            continue
+        dados = {"orcamento_id": orcamento_id}
+        if pendente["orcamento"] is None:
+            # Só itens mudaram: a versão atual, se o orçamento estiver carregado
+            orcamento = session.identity_map.get(
+                session.identity_key(Orcamento, orcamento_id)
+            )
+            if orcamento is not None:
+                dados.update(_dados_orcamento(orcamento))
+        else:
+            dados.update(pendente["orcamento"])
+        if recarregar:
+            eventos.append((RECARREGAR, dados))
+            continue
+        dados["itens"] = list(pendente["itens"].values())
+        dados["itens_removidos"] = sorted(pendente["removidos"])
+        eventos.append((ALTERACAO, dados))
+    return eventos
+
+
+def _antes_do_commit(session: Session):
+    """
+    Monta os eventos depois do último flush, enquanto os objetos ainda
+    estão carregados (o commit expira todos), e os entrega ao distribuidor.
+    """
+    session.flush()
+    eventos = _eventos(session)
+    _descartar(session)
+    if eventos:
+        session.info[_PRONTOS] = eventos
+        distribuidor.notificar(session, eventos)
+
+
+def _depois_do_commit(session: Session):
+    for tipo, dados in session.info.pop(_PRONTOS, ()):
+        barramento.publicar(tipo, dados)
+
+
+def _descartar(session: Session):
+    session.info.pop(_PENDENTES, None)
+    session.info.pop(_RECARREGAR, None)
+
+
+def _descartar_tudo(session: Session):
+    _descartar(session)
+    session.info.pop(_PRONTOS, None)
+
+
+def ativar_eventos(fabrica):
+    """Publica no barramento os commits das sessões criadas por `fabrica`."""
+    for nome, funcao in (
+        ("after_flush", _anotar_flush),
+        ("after_bulk_delete", _anotar_exclusao_em_massa),
+        ("before_commit", _antes_do_commit),
+        ("after_commit", _depois_do_commit),
+        ("after_rollback", _descartar_tudo),
+    ):
+        if not event.contains(fabrica, nome, funcao):
+            event.listen(fabrica, nome, funcao)
+
+
+# ========== DISTRIBUIÇÃO ENTRE WORKERS ==========
+
+
+class DistribuidorLocal:
+    """Sem distribuição: só os assinantes deste processo recebem."""
+
+    def iniciar(self):
+        pass
+
+    def parar(self):
+        pass
+
+    def notificar(self, session: Session, eventos: list):
+        pass
+
+
+class _DistribuidorEmThread(DistribuidorLocal):
+    def __init__(self):
+        self._thread = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        if self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+
+    def parar(self, timeout: float = 5):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                self._executar()
+            except Exception:
+                logger.exception("Erro no distribuidor de eventos")
+                self._parar.wait(EVENTOS_POLL_S)
+
+
+class DistribuidorPostgres(_DistribuidorEmThread):
+    """
+    NOTIFY na mesma transação do commit (entregue só se ela confirmar) e
+    uma conexão dedicada por processo fazendo LISTEN.
+    """
+
+    def notificar(self, session: Session, eventos: list):
+        for tipo, dados in eventos:
+            payload = json.dumps(
+                {"origem": ORIGEM, "tipo": tipo, "dados": dados},
+                separators=(",", ":"),
+            )
+            if len(payload) > PAYLOAD_MAX:
+                payload = json.dumps(
+                    {
+                        "origem": ORIGEM,
+                        "tipo": RECARREGAR,
+                        "dados": {
+                            "orcamento_id": dados["orcamento_id"],
+                            "row_version": dados.get("row_version"),
+                        },
+                    }
+                )
+            session.connection().execute(
+                text("SELECT pg_notify(:canal, :payload)"),
+                {"canal": CANAL_POSTGRES, "payload": payload},
+            )
+
+    def _executar(self):
+        conexao = engine.raw_connection()
+        try:
+            pg = conexao.driver_connection
+            pg.autocommit = True
+            with pg.cursor() as cursor:
+                cursor.execute(f"LISTEN {CANAL_POSTGRES}")
+            while not self._parar.is_set():
+                if select.select([pg], [], [], EVENTOS_HEARTBEAT_S) == ([], [], []):
+                    continue
+                pg.poll()
+                while pg.notifies:
+                    notificacao = pg.notifies.pop(0)
+                    mensagem = json.loads(notificacao.payload)
+                    # Os assinantes deste processo já receberam no after_commit
+                    if mensagem["origem"] != ORIGEM:
+                        barramento.publicar(mensagem["tipo"], mensagem["dados"])
+        finally:
+            conexao.invalidate()
+
+
+class DistribuidorPolling(_DistribuidorEmThread):
+    """
+    Para bancos sem LISTEN/NOTIFY (SQLite): consulta o change feed
+    (tabela alteracoes) a cada EVENTOS_POLL_S, só pelos orçamentos com
+    assinantes neste processo, e publica o estado completo dos que têm
+    row_version mais nova que a última publicada aqui.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._cursor = None
+
+    def _executar(self):
+        while not self._parar.wait(EVENTOS_POLL_S):
+            self.verificar()
+
+    def verificar(self):
+        db = SessionLocal()
+        try:
+            if self._cursor is None:
+                self._cursor = db.query(Alteracao.id).order_by(
+                    Alteracao.id.desc()
+                ).limit(1).scalar() or 0
+            assinados = barramento.orcamentos_assinados()
+            if not assinados:
+                return
+            linhas = (
+                db.query(Alteracao.id, Alteracao.entidade_id, Alteracao.versao)
+                .filter(
+                    Alteracao.id > self._cursor,
+                    Alteracao.entidade == "orcamentos",
+                )
+                .order_by(Alteracao.id)
+                .all()
+            )
+            if not linhas:
+                return
+            self._cursor = linhas[-1].id
+
+            versoes = {}
+            for _, orcamento_id, versao in linhas:
+                versoes[orcamento_id] = versao
+            for orcamento_id, versao in versoes.items():
+                if orcamento_id not in assinados:
+                    continue
+                ultima = barramento.ultima_versao(orcamento_id)
+                if versao is not None and ultima is not None and versao <= ultima:
+                    continue
+                snapshot = carregar_snapshot(db, orcamento_id)
+                if snapshot is None:
+                    barramento.publicar(REMOVIDO, {"orcamento_id": orcamento_id})
+                else:
+                    barramento.publicar(SNAPSHOT, snapshot)
+        finally:
+            db.close()
+
+
+DISTRIBUIDORES = {
+    "local": DistribuidorLocal,
+    "postgres": DistribuidorPostgres,
+    "polling": DistribuidorPolling,
+}
+
+distribuidor = DISTRIBUIDORES[EVENTOS_DISTRIBUIDOR]()
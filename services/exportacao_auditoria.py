@@ -0,0 +1,225 @@
+import csv
+import io
+import json
+import os
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import HistoricoAuditoria, Orcamento, Usuario
+from services import arquivo_auditoria
+from services.metrics import metricas
+
+# Linhas lidas do cursor do servidor (e escritas na resposta) por vez
+AUDITORIA_EXPORTACAO_LOTE = int(os.environ.get("AUDITORIA_EXPORTACAO_LOTE", "2000"))
+
+CSV = "csv"
+NDJSON = "ndjson"
+TIPOS_MIDIA = {CSV: "text/csv; charset=utf-8", NDJSON: "application/x-ndjson"}
+
+COLUNAS = (
+    "id",
+    "data_alteracao",
+    "tipo_alteracao",
+    "contrato_id",
+    "orcamento_id",
+    "numero_orcamento",
+    "item_orcamento_id",
+    "usuario_id",
+    "usuario",
+    "valor_anterior",
+    "valor_novo",
+    "motivo",
+)
+
+metricas.descrever(
+    "auditoria_linhas_exportadas_total",
+    "counter",
+    "Linhas de auditoria enviadas por exportações, por formato",
+)
+
+
+def _formatar(formato: str, linhas, cabecalho: bool = False) -> bytes:
+    """Um bloco da resposta: linhas são tuplas na ordem de COLUNAS."""
+    if formato == NDJSON:
+        return "".join(
+            json.dumps(
+                dict(zip(COLUNAS, _texto(linha))),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            + "\n"
+            for linha in linhas
+        ).encode()
+
+    saida = io.StringIO()
+    escritor = csv.writer(saida, lineterminator="\n")
+    if cabecalho:
+        escritor.writerow(COLUNAS)
+    escritor.writerows(_texto(linha) for linha in linhas)
+    return saida.getvalue().encode()
+
+
+def _texto(linha):
+    """Datas em ISO 8601 e decimais como texto (sem perder casas)."""
+    valores = list(linha)
+    valores[1] = valores[1].isoformat()
+    valores[9] = str(valores[9])
+    valores[10] = str(valores[10])
+    return valores
+
+
+def _arquivados(db: Session, contrato_id, orcamento_id, usuario_id, de, ate):
+    """
+    Eventos arquivados do filtro, em lotes, com contrato, número do
+    orçamento e nome do usuário buscados uma vez por lote.
+    """
+    orcamentos_do_contrato = None
+    if contrato_id is not None and orcamento_id is None:
+        orcamentos_do_contrato = {
+            id_
+            for (id_,) in db.query(Orcamento.id).filter(
+                Orcamento.contrato_id == contrato_id
+            )
+        }
+        if not orcamentos_do_contrato:
+            return
+    de, ate = arquivo_auditoria.utc(de), arquivo_auditoria.utc(ate)
+
+    for segmento, _ in arquivo_auditoria.segmentos_candidatos(
+        db, orcamento_id, de, ate
+    ):
+        eventos = [
+            evento
+            for evento in arquivo_auditoria.ler_segmento(segmento)
+            if (orcamento_id is None or evento.orcamento_id == orcamento_id)
+            and (
+                orcamentos_do_contrato is None
+                or evento.orcamento_id in orcamentos_do_contrato
+            )
+            and (usuario_id is None or evento.usuario_id == usuario_id)
+            and (de is None or evento.data_alteracao >= de)
+            and (ate is None or evento.data_alteracao < ate)
+        ]
+        eventos.sort(key=lambda evento: (evento.data_alteracao, evento.id))
+
+        for inicio in range(0, len(eventos), AUDITORIA_EXPORTACAO_LOTE):
+            lote = eventos[inicio : inicio + AUDITORIA_EXPORTACAO_LOTE]
+            orcamentos = {
+                id_: (contrato, numero)
+                for id_, contrato, numero in db.query(
+                    Orcamento.id, Orcamento.contrato_id, Orcamento.numero_orcamento
+                ).filter(Orcamento.id.in_({e.orcamento_id for e in lote}))
+            }
+            ids_usuarios = {e.usuario_id for e in lote if e.usuario_id is not None}
+            usuarios = (
+                dict(
+                    db.query(Usuario.id, Usuario.username).filter(
+                        Usuario.id.in_(ids_usuarios)
+                    )
+                )
+                if ids_usuarios
+                else {}
+            )
+
+            linhas = []
+            for e in lote:
+                contrato, numero = orcamentos.get(e.orcamento_id, (None, None))
+                if contrato_id is not None and contrato != contrato_id:
+                    continue
+                linhas.append(
+                    (
+                        e.id,
+                        e.data_alteracao,
+                        e.tipo_alteracao,
+                        contrato,
+                        e.orcamento_id,
+                        numero,
+                        e.item_orcamento_id,
+                        e.usuario_id,
+                        usuarios.get(e.usuario_id),
+                        e.valor_anterior,
+                        e.valor_novo,
+                        e.motivo,
+                    )
+                )
+            yield linhas
+
+
+def _consulta(contrato_id, orcamento_id, usuario_id, de, ate):
+    """Eventos da tabela com contrato, orçamento e usuário no mesmo SELECT."""
+    consulta = (
+        select(
+            HistoricoAuditoria.id,
+            HistoricoAuditoria.data_alteracao,
+            HistoricoAuditoria.tipo_alteracao,
+            Orcamento.contrato_id,
+            HistoricoAuditoria.orcamento_id,
+            Orcamento.numero_orcamento,
+            HistoricoAuditoria.item_orcamento_id,
+            HistoricoAuditoria.usuario_id,
+            Usuario.username,
+            HistoricoAuditoria.valor_anterior,
+            HistoricoAuditoria.valor_novo,
+            HistoricoAuditoria.motivo,
+        )
+        .outerjoin(Orcamento, Orcamento.id == HistoricoAuditoria.orcamento_id)
+        .outerjoin(Usuario, Usuario.id == HistoricoAuditoria.usuario_id)
+    )
+    if contrato_id is not None:
+        consulta = consulta.where(Orcamento.contrato_id == contrato_id)
+    if orcamento_id is not None:
+        consulta = consulta.where(HistoricoAuditoria.orcamento_id == orcamento_id)
+    if usuario_id is not None:
+        consulta = consulta.where(HistoricoAuditoria.usuario_id == usuario_id)
+    if de is not None:
+        consulta = consulta.where(HistoricoAuditoria.data_alteracao >= de)
+    if ate is not None:
+        consulta = consulta.where(HistoricoAuditoria.data_alteracao < ate)
+    return consulta.order_by(
+        HistoricoAuditoria.data_alteracao, HistoricoAuditoria.id
+    )
+
+
+def exportar(
+    formato: str,
+    contrato_id=None,
+    orcamento_id=None,
+    usuario_id=None,
+    de=None,
+    ate=None,
+):
+    """
+    Gera a exportação em blocos de bytes, do evento mais antigo para o mais
+    recente: primeiro os arquivados, depois os da tabela.
+
+    A tabela é lida por um cursor do servidor (yield_per), um lote por vez,
+    então a memória não cresce com o número de linhas. Abre a própria
+    sessão: o gerador roda depois que a requisição já devolveu a dela.
+    """
+    db = SessionLocal()
+    try:
+        filtros = (contrato_id, orcamento_id, usuario_id, de, ate)
+        if formato == CSV:
+            yield _formatar(formato, [], cabecalho=True)
+
+        for lote in _arquivados(db, *filtros):
+            if lote:
+                metricas.incrementar(
+                    "auditoria_linhas_exportadas_total", len(lote), formato=formato
+                )
+                yield _formatar(formato, lote)
+
+        resultado = db.execute(
+            _consulta(*filtros).execution_options(
+                yield_per=AUDITORIA_EXPORTACAO_LOTE
+            )
+        )
+        for lote in resultado.partitions():
+            metricas.incrementar(
+                "auditoria_linhas_exportadas_total", len(lote), formato=formato
+            )
+            yield _formatar(formato, lote)
+    finally:
+        db.close()
@@ -0,0 +1,379 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from models import RespostaIdempotente
+from services.asgi_util import ler_corpo, reenviar_corpo
+from services.metrics import metricas
+
+logger = logging.getLogger("api.idempotencia")
+
+# Por quanto tempo (s) uma resposta fica disponível para retentativas
+IDEMPOTENCY_TTL_S = float(os.environ.get("IDEMPOTENCY_TTL_S", "86400"))
+# Validade (s) da reserva "processando", renovada enquanto a requisição
+# original executa. Se o processo dela morrer (OOM, deploy, kill), a reserva
+# vence em até esse tempo e a próxima retentativa a retoma e executa.
+IDEMPOTENCY_PROCESSANDO_S = float(os.environ.get("IDEMPOTENCY_PROCESSANDO_S", "60"))
+# Quanto tempo (s) uma duplicata espera a requisição original terminar
+IDEMPOTENCY_ESPERA_S = float(os.environ.get("IDEMPOTENCY_ESPERA_S", "30"))
+# Intervalo mínimo (s) entre limpezas das respostas expiradas, por processo
+IDEMPOTENCY_LIMPEZA_S = 300
+
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+
+METODOS_MUTAVEIS = {"POST", "PUT", "PATCH", "DELETE"}
+
+metricas.descrever(
+    "idempotency_replays_total",
+    "counter",
+    "Retentativas respondidas com a resposta guardada (Idempotency-Key)",
+)
+
+
+def _sha256(*partes: bytes) -> str:
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(parte)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# ========== ACESSO AO BANCO (executado em threadpool) ==========
+
+
+def _reservar(chave: str, dono: str, impressao: str):
+    """
+    Tenta gravar a chave como 'processando'. Retorna None se conseguiu
+    (esta requisição executa), ou o registro já existente.
+
+    Um registro vencido (resposta além do TTL ou reserva cuja requisição
+    parou de renová-la) é apagado e a chave é reservada de novo.
+    """
+    db = SessionLocal()
+    try:
+        agora = datetime.now()
+        registro = RespostaIdempotente(
+            chave=chave,
+            dono=dono,
+            impressao=impressao,
+            status=PROCESSANDO,
+            criado_em=agora,
+            expira_em=agora + timedelta(seconds=IDEMPOTENCY_PROCESSANDO_S),
+        )
+        db.add(registro)
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            db.rollback()
+
+        existente = (
+            db.query(RespostaIdempotente)
+            .filter(
+                RespostaIdempotente.chave == chave, RespostaIdempotente.dono == dono
+            )
+            .first()
+        )
+        if existente is None or existente.expira_em < agora:
+            # Liberada ou vencida: tenta de novo. O DELETE é condicional, e
+            # entre duplicatas que retomam a mesma reserva só um INSERT vence
+            if existente is not None:
+                db.query(RespostaIdempotente).filter(
+                    RespostaIdempotente.id == existente.id,
+                    RespostaIdempotente.expira_em < agora,
+                ).delete()
+                db.commit()
+            return _reservar(chave, dono, impressao)
+        db.expunge(existente)
+        return existente
+    finally:
+        db.close()
+
+
+def _buscar(chave: str, dono: str):
+    db = SessionLocal()
+    try:
+        registro = (
+            db.query(RespostaIdempotente)
+            .filter(
+                RespostaIdempotente.chave == chave, RespostaIdempotente.dono == dono
+            )
+            .first()
+        )
+        if registro is not None:
+            db.expunge(registro)
+        return registro
+    finally:
+        db.close()
+
+
+def _renovar(chave: str, dono: str):
+    """Estende a reserva 'processando' enquanto a requisição original executa."""
+    db = SessionLocal()
+    try:
+        db.query(RespostaIdempotente).filter(
+            RespostaIdempotente.chave == chave,
+            RespostaIdempotente.dono == dono,
+            RespostaIdempotente.status == PROCESSANDO,
+        ).update(
+            {
+                "expira_em": datetime.now()
+                + timedelta(seconds=IDEMPOTENCY_PROCESSANDO_S)
+            }
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _concluir(chave: str, dono: str, status_code: int, headers: list, corpo: bytes):
+    db = SessionLocal()
+    try:
+        db.query(RespostaIdempotente).filter(
+            RespostaIdempotente.chave == chave, RespostaIdempotente.dono == dono
+        ).update(
+            {
+                "status": CONCLUIDO,
+                "expira_em": datetime.now() + timedelta(seconds=IDEMPOTENCY_TTL_S),
+                "status_code": status_code,
+                "headers": json.dumps(headers),
+                "corpo": corpo,
+            }
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _liberar(chave: str, dono: str):
+    """Apaga a reserva: a próxima retentativa executa a operação de novo."""
+    db = SessionLocal()
+    try:
+        db.query(RespostaIdempotente).filter(
+            RespostaIdempotente.chave == chave,
+            RespostaIdempotente.dono == dono,
+            RespostaIdempotente.status == PROCESSANDO,
+        ).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def limpar_expiradas() -> int:
+    db = SessionLocal()
+    try:
+        removidas = (
+            db.query(RespostaIdempotente)
+            .filter(RespostaIdempotente.expira_em < datetime.now())
+            .delete()
+        )
+        db.commit()
+        return removidas
+    finally:
+        db.close()
+
+
+# ========== MIDDLEWARE ==========
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI que implementa o header Idempotency-Key nas requisições
+    mutáveis (POST/PUT/PATCH/DELETE) dos caminhos em `prefixos`.
+
+    - Primeira requisição com a chave: executa e guarda status, headers e
+      corpo da resposta na tabela respostas_idempotentes.
+    - Retentativa com a mesma chave e o mesmo corpo: devolve a resposta
+      guardada, sem executar de novo (header Idempotent-Replayed: true).
+    - Mesma chave com outra requisição: 422.
+    - Duplicata enquanto a original ainda executa: espera por ela (até
+      IDEMPOTENCY_ESPERA_S) em vez de executar em paralelo; depois, 409.
+
+    Respostas 5xx não são guardadas, para que a retentativa possa refazer
+    a operação. As chaves são separadas por usuário
+    (`identificar_usuario(header Authorization)`), e não pelo token: uma
+    retentativa feita depois de renovar o token continua sendo a mesma
+    operação. Sem usuário identificado, vale o hash do header.
+    """
+
+    def __init__(self, app, prefixos=("/",), identificar_usuario=None):
+        self.app = app
+        self.prefixos = tuple(prefixos)
+        self.identificar_usuario = identificar_usuario
+        self._ultima_limpeza = 0.0
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in METODOS_MUTAVEIS
+            or not scope["path"].startswith(self.prefixos)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        chave = headers.get(b"idempotency-key")
+        if chave is None:
+            await self.app(scope, receive, send)
+            return
+        if not chave or len(chave) > 255:
+            await _responder_erro(
+                send, 400, "Idempotency-Key deve ter entre 1 e 255 caracteres"
+            )
+            return
+
+        corpo = await ler_corpo(receive)
+        chave = chave.decode("latin-1")
+        dono = await self._dono(headers.get(b"authorization"))
+        impressao = _sha256(
+            scope["method"].encode(),
+            scope["path"].encode(),
+            scope["query_string"],
+            corpo,
+        )
+
+        self._agendar_limpeza()
+
+        limite = time.monotonic() + IDEMPOTENCY_ESPERA_S
+        while True:
+            registro = await run_in_threadpool(_reservar, chave, dono, impressao)
+            if registro is None:
+                break
+            if registro.impressao != impressao:
+                await _responder_erro(
+                    send,
+                    422,
+                    "Idempotency-Key já usada com outra requisição",
+                )
+                return
+            if registro.status == CONCLUIDO:
+                metricas.incrementar("idempotency_replays_total")
+                await _repetir_resposta(send, registro)
+                return
+
+            # A original ainda está executando: espera ela concluir ou liberar
+            while time.monotonic() < limite:
+                await asyncio.sleep(0.05)
+                registro = await run_in_threadpool(_buscar, chave, dono)
+                if (
+                    registro is None
+                    or registro.status == CONCLUIDO
+                    or registro.expira_em < datetime.now()  # original morreu
+                ):
+                    break
+            else:
+                await _responder_erro(
+                    send,
+                    409,
+                    "Requisição com esta Idempotency-Key ainda em processamento",
+                )
+                return
+
+        await self._executar(scope, reenviar_corpo(corpo, receive), send, chave, dono)
+
+    async def _dono(self, authorization) -> str:
+        if self.identificar_usuario is not None:
+            usuario_id = await run_in_threadpool(
+                self.identificar_usuario, authorization
+            )
+            if usuario_id is not None:
+                return f"usuario:{usuario_id}"
+        return _sha256(authorization or b"")
+
+    async def _executar(self, scope, receive, send, chave, dono):
+        inicio = None
+        partes = []
+
+        async def send_guardando(message):
+            nonlocal inicio
+            if message["type"] == "http.response.start":
+                inicio = message
+            elif message["type"] == "http.response.body":
+                partes.append(message.get("body", b""))
+            await send(message)
+
+        renovacao = asyncio.ensure_future(_renovar_reserva(chave, dono))
+        try:
+            await self.app(scope, receive, send_guardando)
+        except BaseException:
+            await run_in_threadpool(_liberar, chave, dono)
+            raise
+        finally:
+            renovacao.cancel()
+
+        if inicio is None or inicio["status"] >= 500:
+            await run_in_threadpool(_liberar, chave, dono)
+            return
+
+        headers = [
+            [nome.decode("latin-1"), valor.decode("latin-1")]
+            for nome, valor in inicio.get("headers", [])
+        ]
+        await run_in_threadpool(
+            _concluir, chave, dono, inicio["status"], headers, b"".join(partes)
+        )
+
+    def _agendar_limpeza(self):
+        agora = time.monotonic()
+        if agora - self._ultima_limpeza < IDEMPOTENCY_LIMPEZA_S:
+            return
+        self._ultima_limpeza = agora
+
+        async def limpar():
+            try:
+                removidas = await run_in_threadpool(limpar_expiradas)
+                if removidas:
+                    logger.info("%s respostas idempotentes expiradas", removidas)
+            except Exception:
+                logger.exception("Erro ao limpar respostas idempotentes")
+
+        asyncio.ensure_future(limpar())
+
+
+async def _renovar_reserva(chave: str, dono: str):
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_PROCESSANDO_S / 3)
+        try:
+            await run_in_threadpool(_renovar, chave, dono)
+        except Exception:
+            logger.exception("Erro ao renovar reserva idempotente")
+
+
+async def _repetir_resposta(send, registro):
+    headers = [
+        (nome.encode("latin-1"), valor.encode("latin-1"))
+        for nome, valor in json.loads(registro.headers or "[]")
+    ]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send(
+        {
+            "type": "http.response.start",
+            "status": registro.status_code,
+            "headers": headers,
+        }
+    )
+    await send({"type": "http.response.body", "body": registro.corpo or b""})
+
+
+async def _responder_erro(send, status_code: int, detalhe: str):
+    corpo = json.dumps({"detail": detalhe}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": corpo})
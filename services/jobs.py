@@ -0,0 +1,349 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+from models import Job
+from services.metrics import metricas
+
+logger = logging.getLogger("api.jobs")
+
+# Threads de worker por processo (0 desliga o processamento neste processo)
+JOBS_WORKERS = int(os.environ.get("JOBS_WORKERS", "2"))
+# Intervalo (s) entre consultas à tabela quando a fila está vazia
+JOBS_POLL_S = float(os.environ.get("JOBS_POLL_S", "1"))
+# Tentativas por job e espera base (s) entre elas, dobrando a cada falha
+JOBS_MAX_TENTATIVAS = int(os.environ.get("JOBS_MAX_TENTATIVAS", "3"))
+JOBS_BACKOFF_S = float(os.environ.get("JOBS_BACKOFF_S", "5"))
+# Job "executando" sem heartbeat há mais que isso volta para a fila
+# (o worker que o pegou morreu). O worker renova o heartbeat a cada terço
+# desse intervalo enquanto a tarefa roda, mesmo sem chamar progresso().
+JOBS_TIMEOUT_S = float(os.environ.get("JOBS_TIMEOUT_S", "600"))
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+
+_tarefas = {}
+_periodicas = {}  # tipo -> intervalo (s)
+
+metricas.descrever(
+    "jobs_executados_total", "counter", "Execuções de jobs por tipo e resultado"
+)
+metricas.descrever(
+    "job_duration_seconds", "histogram", "Duração das execuções de jobs por tipo"
+)
+
+
+def tarefa(tipo: str):
+    """
+    Registra uma função como tarefa da fila.
+
+    A função recebe (db, parametros, progresso) e retorna um dict com o
+    resultado (ou None). `progresso(percentual)` grava o andamento e faz
+    commit da sessão: chame entre unidades de trabalho já consistentes.
+    """
+
+    def registrar(funcao):
+        _tarefas[tipo] = funcao
+        return funcao
+
+    return registrar
+
+
+def periodica(tipo: str, intervalo: float):
+    """
+    Agenda a tarefa `tipo` a cada `intervalo` segundos (0 desliga).
+
+    Cada processo confere no seu agendador; o job só é enfileirado se não
+    houver outro do mesmo tipo pendente ou executando, então vários workers
+    não empilham execuções repetidas.
+    """
+    if intervalo > 0:
+        _periodicas[tipo] = intervalo
+
+
+def enfileirar(
+    db: Session,
+    tipo: str,
+    parametros: dict = None,
+    usuario_id: int = None,
+    max_tentativas: int = JOBS_MAX_TENTATIVAS,
+) -> Job:
+    """Grava um job pendente e acorda os workers deste processo."""
+    if tipo not in _tarefas:
+        raise ValueError(f"Tarefa desconhecida: {tipo}")
+
+    agora = datetime.now()
+    job = Job(
+        tipo=tipo,
+        status=PENDENTE,
+        parametros=json.dumps(parametros or {}),
+        progresso=0,
+        tentativas=0,
+        max_tentativas=max_tentativas,
+        usuario_id=usuario_id,
+        criado_em=agora,
+        disponivel_em=agora,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    fila_jobs.acordar()
+    return job
+
+
+class FilaJobs:
+    """
+    Pool de threads que consome a tabela `jobs`.
+
+    Vários processos (workers do uvicorn/gunicorn) podem consumir a mesma
+    tabela: no PostgreSQL o job é reivindicado com FOR UPDATE SKIP LOCKED;
+    no SQLite, que serializa as escritas, com um UPDATE condicional
+    (status e heartbeat ainda os lidos) cujo rowcount diz quem ganhou.
+    """
+
+    def __init__(self, workers: int = JOBS_WORKERS, intervalo: float = JOBS_POLL_S):
+        self.workers = workers
+        self.intervalo = intervalo
+        self._threads = []
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._nome = f"{socket.gethostname()}:{os.getpid()}"
+
+    def iniciar(self):
+        if self._threads or self.workers <= 0:
+            return
+        self._parar.clear()
+        for n in range(self.workers):
+            thread = threading.Thread(
+                target=self._loop, name=f"job-worker-{n}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        if _periodicas:
+            thread = threading.Thread(
+                target=self._agendador, name="job-agendador", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def parar(self, timeout: float = 10):
+        self._parar.set()
+        self._acordar.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def acordar(self):
+        self._acordar.set()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                job_id = self.reivindicar()
+            except Exception:
+                logger.exception("Erro ao reivindicar job")
+                job_id = None
+
+            if job_id is None:
+                self._acordar.wait(self.intervalo)
+                self._acordar.clear()
+                continue
+            self.executar(job_id)
+
+    # ========== PERIÓDICAS ==========
+
+    def _agendador(self):
+        agora = time.monotonic()
+        proximas = {tipo: agora + intervalo for tipo, intervalo in _periodicas.items()}
+        while not self._parar.wait(self.intervalo):
+            for tipo, intervalo in _periodicas.items():
+                if time.monotonic() < proximas.get(tipo, 0):
+                    continue
+                proximas[tipo] = time.monotonic() + intervalo
+                try:
+                    self.agendar_periodica(tipo)
+                except Exception:
+                    logger.exception("Erro ao agendar job periódico %s", tipo)
+
+    def agendar_periodica(self, tipo: str):
+        """Enfileira `tipo` se não houver um pendente ou executando."""
+        db = SessionLocal()
+        try:
+            em_andamento = (
+                db.query(Job.id)
+                .filter(Job.tipo == tipo, Job.status.in_((PENDENTE, EXECUTANDO)))
+                .first()
+            )
+            if em_andamento is not None:
+                return None
+            return enfileirar(db, tipo)
+        finally:
+            db.close()
+
+    # ========== REIVINDICAÇÃO ==========
+
+    def _disponiveis(self, agora: datetime):
+        abandonado = agora - timedelta(seconds=JOBS_TIMEOUT_S)
+        return or_(
+            and_(Job.status == PENDENTE, Job.disponivel_em <= agora),
+            and_(Job.status == EXECUTANDO, Job.atualizado_em < abandonado),
+        )
+
+    def reivindicar(self):
+        """Marca o próximo job disponível como 'executando' e retorna seu id."""
+        db = SessionLocal()
+        try:
+            agora = datetime.now()
+            consulta = (
+                db.query(Job.id, Job.status, Job.atualizado_em)
+                .filter(self._disponiveis(agora))
+                .order_by(Job.id)
+            )
+            if engine.dialect.name == "postgresql":
+                consulta = consulta.with_for_update(skip_locked=True, of=Job)
+            linha = consulta.first()
+            if linha is None:
+                db.rollback()
+                return None
+            return linha[0] if self._tomar(db, *linha, agora) else None
+        finally:
+            db.close()
+
+    def _tomar(self, db, job_id, status_atual, atualizado_atual, agora) -> bool:
+        """
+        UPDATE condicional ao status e ao heartbeat lidos. Um job abandonado
+        continua 'executando' ao ser retomado: só o heartbeat distingue o
+        primeiro worker a tomá-lo dos que leram a mesma linha.
+        """
+        resultado = db.execute(
+            update(Job)
+            .where(
+                Job.id == job_id,
+                Job.status == status_atual,
+                Job.atualizado_em == atualizado_atual,
+            )
+            .values(
+                status=EXECUTANDO,
+                tentativas=Job.tentativas + 1,
+                worker=self._nome,
+                iniciado_em=agora,
+                atualizado_em=agora,
+            )
+        )
+        db.commit()
+        # No SQLite, outro worker pode ter ganhado entre o SELECT e o UPDATE
+        return resultado.rowcount == 1
+
+    def _renovar(self, job_id: int):
+        """Renova o heartbeat de um job que este worker está executando."""
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(
+                Job.id == job_id, Job.status == EXECUTANDO, Job.worker == self._nome
+            ).update({"atualizado_em": datetime.now()})
+            db.commit()
+        finally:
+            db.close()
+
+    def _batimentos(self, job_id: int, parar: threading.Event):
+        while not parar.wait(JOBS_TIMEOUT_S / 3):
+            try:
+                self._renovar(job_id)
+            except Exception:
+                logger.exception("Erro ao renovar heartbeat do job %s", job_id)
+
+    # ========== EXECUÇÃO ==========
+
+    def executar(self, job_id: int):
+        db = SessionLocal()
+        inicio = time.perf_counter()
+        tipo = "?"
+        try:
+            job = db.get(Job, job_id)
+            tipo = job.tipo
+            funcao = _tarefas.get(tipo)
+            if funcao is None:
+                self._finalizar(db, job, FALHOU, erro=f"Tarefa desconhecida: {tipo}")
+                return
+            if job.tentativas > job.max_tentativas:
+                # Reivindicado de novo depois que o worker anterior morreu
+                self._finalizar(db, job, FALHOU, erro="Tentativas esgotadas")
+                return
+
+            def progresso(percentual: int):
+                job.progresso = max(0, min(100, int(percentual)))
+                job.atualizado_em = datetime.now()
+                db.commit()
+
+            parar = threading.Event()
+            threading.Thread(
+                target=self._batimentos,
+                args=(job_id, parar),
+                name=f"job-heartbeat-{job_id}",
+                daemon=True,
+            ).start()
+            try:
+                resultado = funcao(db, json.loads(job.parametros or "{}"), progresso)
+            except Exception as e:
+                db.rollback()
+                self._falhar(db, job, e)
+            else:
+                self._finalizar(db, job, CONCLUIDO, resultado=resultado)
+            finally:
+                parar.set()
+        except Exception:
+            logger.exception("Erro ao executar job %s", job_id)
+            db.rollback()
+        finally:
+            db.close()
+            metricas.observar(
+                "job_duration_seconds", time.perf_counter() - inicio, tipo=tipo
+            )
+
+    def _finalizar(self, db, job, status, resultado=None, erro=None):
+        agora = datetime.now()
+        job.status = status
+        job.erro = erro
+        job.atualizado_em = agora
+        job.finalizado_em = agora
+        if status == CONCLUIDO:
+            job.progresso = 100
+            job.resultado = json.dumps(resultado, default=str)
+        db.commit()
+        metricas.incrementar("jobs_executados_total", tipo=job.tipo, status=status)
+
+    def _falhar(self, db, job, erro: Exception):
+        logger.warning(
+            "Job %s (%s) falhou na tentativa %s/%s: %r",
+            job.id,
+            job.tipo,
+            job.tentativas,
+            job.max_tentativas,
+            erro,
+        )
+        if job.tentativas >= job.max_tentativas:
+            self._finalizar(db, job, FALHOU, erro=repr(erro))
+            return
+
+        espera = JOBS_BACKOFF_S * 2 ** (job.tentativas - 1)
+        job.status = PENDENTE
+        job.erro = repr(erro)
+        job.worker = None
+        job.disponivel_em = datetime.now() + timedelta(seconds=espera)
+        db.commit()
+        metricas.incrementar(
+            "jobs_executados_total", tipo=job.tipo, status="retentativa"
+        )
+
+
+fila_jobs = FilaJobs()
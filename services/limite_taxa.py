@@ -0,0 +1,351 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from models import BaldeLimiteTaxa
+from services.asgi_util import ler_corpo, reenviar_corpo
+from services.metrics import metricas
+
+logger = logging.getLogger("api.limite_taxa")
+
+# Limites por grupo de rotas, no formato "capacidade/periodo_s": rajada de
+# até `capacidade` requisições, repostas aos poucos ao longo de `periodo_s`.
+# "0" desliga o limite.
+RATE_LIMIT_LOGIN_IP = os.environ.get("RATE_LIMIT_LOGIN_IP", "30/60")
+RATE_LIMIT_LOGIN_USUARIO = os.environ.get("RATE_LIMIT_LOGIN_USUARIO", "5/60")
+RATE_LIMIT_REGISTRO_IP = os.environ.get("RATE_LIMIT_REGISTRO_IP", "10/3600")
+# Proxies reversos confiáveis na frente da aplicação, para achar o IP do
+# cliente dos limites por IP. "0": conexão direta, o IP é o do socket. N: o
+# IP é o N-ésimo endereço do X-Forwarded-For, contando da direita (cada proxy
+# acrescenta quem o chamou; o que fica à esquerda o cliente pode forjar).
+# Sem valor, os limites por IP ficam desligados: atrás de um proxy, o socket
+# é sempre o do proxy e o site inteiro dividiria um único balde.
+RATE_LIMIT_PROXIES = os.environ.get("RATE_LIMIT_PROXIES", "")
+# Onde ficam os baldes: "memoria" (por worker) ou "banco" (tabela
+# baldes_limite_taxa, compartilhada entre workers; uma escrita por requisição)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memoria")
+# Baldes em memória por worker (LRU). O balde descartado volta cheio, então
+# isso limita a memória sem bloquear ninguém por engano.
+RATE_LIMIT_MAX_BALDES = int(os.environ.get("RATE_LIMIT_MAX_BALDES", "100000"))
+# Intervalo mínimo (s) entre limpezas dos baldes antigos no banco, por processo
+RATE_LIMIT_LIMPEZA_S = 300
+
+metricas.descrever(
+    "rate_limit_rejeitadas_total",
+    "counter",
+    "Requisições recusadas com 429 por grupo de rotas e chave (ip/usuario)",
+)
+
+
+class Limite:
+    """Balde de `capacidade` fichas, reposto a `capacidade / periodo_s` por segundo."""
+
+    def __init__(self, capacidade: float, periodo_s: float):
+        self.capacidade = capacidade
+        self.periodo_s = periodo_s
+        self.taxa = capacidade / periodo_s
+
+    @classmethod
+    def de_texto(cls, texto: str):
+        """'5/60' → Limite(5, 60); '0' ou vazio → None (sem limite)."""
+        if not texto or texto.strip() == "0":
+            return None
+        capacidade, periodo = texto.split("/")
+        return cls(float(capacidade), float(periodo))
+
+
+class GrupoRotas:
+    """Rotas que dividem os mesmos limites, por IP e (opcional) por username."""
+
+    def __init__(self, nome, metodo, caminhos, por_ip=None, por_usuario=None):
+        self.nome = nome
+        self.metodo = metodo
+        self.caminhos = tuple(caminhos)
+        self.por_ip = por_ip
+        self.por_usuario = por_usuario
+
+
+GRUPOS = (
+    GrupoRotas(
+        "login",
+        "POST",
+        ("/auth/login",),
+        por_ip=Limite.de_texto(RATE_LIMIT_LOGIN_IP),
+        por_usuario=Limite.de_texto(RATE_LIMIT_LOGIN_USUARIO),
+    ),
+    GrupoRotas(
+        "registro",
+        "POST",
+        ("/auth/registro",),
+        por_ip=Limite.de_texto(RATE_LIMIT_REGISTRO_IP),
+    ),
+)
+
+
+# ========== BALDES ==========
+
+
+class BaldesMemoria:
+    """Baldes em memória do worker, com no máximo `maximo` chaves (LRU)."""
+
+    def __init__(self, maximo: int = RATE_LIMIT_MAX_BALDES):
+        self.maximo = maximo
+        self._baldes = OrderedDict()  # chave -> (fichas, atualizado_em)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._baldes)
+
+    def consumir(self, chave: str, limite: Limite) -> float:
+        """Tira uma ficha: 0 se conseguiu, senão segundos até haver uma."""
+        agora = time.monotonic()
+        with self._lock:
+            fichas, atualizado_em = self._baldes.get(
+                chave, (limite.capacidade, agora)
+            )
+            fichas = min(
+                limite.capacidade, fichas + (agora - atualizado_em) * limite.taxa
+            )
+            espera = 0.0 if fichas >= 1 else (1 - fichas) / limite.taxa
+            self._baldes[chave] = (fichas - 1 if fichas >= 1 else fichas, agora)
+            self._baldes.move_to_end(chave)
+            while len(self._baldes) > self.maximo:
+                self._baldes.popitem(last=False)
+            return espera
+
+
+class BaldesBanco:
+    """
+    Baldes na tabela baldes_limite_taxa, vistos por todos os workers.
+
+    O caminho comum é um único UPDATE condicional (repõe as fichas e tira
+    uma, se houver), atômico no SQLite e no PostgreSQL.
+    """
+
+    def consumir(self, chave: str, limite: Limite) -> float:
+        agora = time.time()
+        repostas = BaldeLimiteTaxa.fichas + (
+            agora - BaldeLimiteTaxa.atualizado_em
+        ) * limite.taxa
+        disponiveis = case(
+            (repostas > limite.capacidade, limite.capacidade), else_=repostas
+        )
+
+        db = SessionLocal()
+        try:
+            atualizados = (
+                db.query(BaldeLimiteTaxa)
+                .filter(BaldeLimiteTaxa.chave == chave, disponiveis >= 1)
+                .update(
+                    {
+                        BaldeLimiteTaxa.fichas: disponiveis - 1,
+                        BaldeLimiteTaxa.atualizado_em: agora,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if atualizados:
+                db.commit()
+                return 0.0
+
+            balde = db.get(BaldeLimiteTaxa, chave)
+            if balde is None:
+                db.add(
+                    BaldeLimiteTaxa(
+                        chave=chave,
+                        fichas=limite.capacidade - 1,
+                        atualizado_em=agora,
+                    )
+                )
+                try:
+                    db.commit()
+                    return 0.0
+                except IntegrityError:
+                    # Outro worker criou o balde ao mesmo tempo
+                    db.rollback()
+                    return self.consumir(chave, limite)
+
+            fichas = min(
+                limite.capacidade,
+                balde.fichas + (agora - balde.atualizado_em) * limite.taxa,
+            )
+            db.rollback()
+            return max((1 - fichas) / limite.taxa, 0.0)
+        finally:
+            db.close()
+
+    def limpar_antigos(self, idade_s: float) -> int:
+        """Remove baldes parados há mais de `idade_s` (já estariam cheios)."""
+        db = SessionLocal()
+        try:
+            removidos = (
+                db.query(BaldeLimiteTaxa)
+                .filter(BaldeLimiteTaxa.atualizado_em < time.time() - idade_s)
+                .delete()
+            )
+            db.commit()
+            return removidos
+        finally:
+            db.close()
+
+
+def criar_baldes(backend: str = RATE_LIMIT_BACKEND):
+    if backend == "banco":
+        return BaldesBanco()
+    if backend == "memoria":
+        return BaldesMemoria()
+    raise ValueError(f"RATE_LIMIT_BACKEND inválido: {backend!r}")
+
+
+# ========== MIDDLEWARE ==========
+
+
+def _hash(valor: str) -> str:
+    return hashlib.sha256(valor.encode()).hexdigest()[:32]
+
+
+def ip_do_cliente(scope, proxies: int) -> str:
+    """IP do cliente atrás de `proxies` proxies confiáveis (RATE_LIMIT_PROXIES)."""
+    conexao = (scope.get("client") or ("desconhecido",))[0]
+    if proxies <= 0:
+        return conexao
+    encaminhado = dict(scope["headers"]).get(b"x-forwarded-for", b"")
+    enderecos = [
+        endereco.strip()
+        for endereco in encaminhado.decode("latin-1").split(",")
+        if endereco.strip()
+    ]
+    if len(enderecos) < proxies:
+        # Não passou por todos os proxies: quem conectou é o próprio cliente
+        return conexao
+    return enderecos[-proxies]
+
+
+def _username(corpo: bytes):
+    try:
+        dados = json.loads(corpo)
+    except ValueError:
+        return None
+    username = dados.get("username") if isinstance(dados, dict) else None
+    return username.strip().lower() if isinstance(username, str) else None
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI de limite de taxa (token bucket) por grupo de rotas.
+
+    Cada requisição de um grupo tira uma ficha do balde do IP e, se o grupo
+    limitar por usuário, do balde do username do corpo JSON (tentativas
+    contra a mesma conta vindas de vários IPs). Sem ficha: 429 com
+    Retry-After, antes de a rota calcular o hash da senha ou tocar no banco.
+
+    O IP vem de `ip_do_cliente` com `proxies` proxies confiáveis
+    (RATE_LIMIT_PROXIES). Com `proxies=None` os limites por IP ficam
+    desligados e só os limites por username valem.
+    """
+
+    def __init__(self, app, grupos=GRUPOS, baldes=None, proxies=RATE_LIMIT_PROXIES):
+        self.app = app
+        self.grupos = grupos
+        self.baldes = baldes if baldes is not None else criar_baldes()
+        self.proxies = int(proxies) if str(proxies).strip() else None
+        self._ultima_limpeza = 0.0
+        if self.proxies is None and any(g.por_ip for g in grupos):
+            logger.warning(
+                "RATE_LIMIT_PROXIES não definido: limites por IP desligados"
+            )
+
+    def _grupo(self, scope):
+        for grupo in self.grupos:
+            if scope["method"] == grupo.metodo and scope["path"] in grupo.caminhos:
+                return grupo
+        return None
+
+    async def __call__(self, scope, receive, send):
+        grupo = self._grupo(scope) if scope["type"] == "http" else None
+        por_ip = grupo.por_ip if grupo and self.proxies is not None else None
+        if grupo is None or (por_ip is None and grupo.por_usuario is None):
+            await self.app(scope, receive, send)
+            return
+
+        chaves = []
+        if por_ip is not None:
+            ip = ip_do_cliente(scope, self.proxies)
+            chaves.append(("ip", f"{grupo.nome}:ip:{ip}", grupo.por_ip))
+        if grupo.por_usuario is not None:
+            corpo = await ler_corpo(receive)
+            receive = reenviar_corpo(corpo, receive)
+            username = _username(corpo)
+            if username:
+                chave = f"{grupo.nome}:usuario:{_hash(username)}"
+                chaves.append(("usuario", chave, grupo.por_usuario))
+
+        self._agendar_limpeza()
+        for por, chave, limite in chaves:
+            espera = await self._consumir(chave, limite)
+            if espera > 0:
+                metricas.incrementar(
+                    "rate_limit_rejeitadas_total", grupo=grupo.nome, por=por
+                )
+                await _responder_429(send, espera)
+                return
+
+        await self.app(scope, receive, send)
+
+    async def _consumir(self, chave, limite) -> float:
+        if isinstance(self.baldes, BaldesBanco):
+            return await run_in_threadpool(self.baldes.consumir, chave, limite)
+        return self.baldes.consumir(chave, limite)
+
+    def _agendar_limpeza(self):
+        if not isinstance(self.baldes, BaldesBanco):
+            return
+        agora = time.monotonic()
+        if agora - self._ultima_limpeza < RATE_LIMIT_LIMPEZA_S:
+            return
+        self._ultima_limpeza = agora
+        idade = max(
+            limite.periodo_s
+            for grupo in self.grupos
+            for limite in (grupo.por_ip, grupo.por_usuario)
+            if limite is not None
+        )
+
+        async def limpar():
+            try:
+                removidos = await run_in_threadpool(self.baldes.limpar_antigos, idade)
+                if removidos:
+                    logger.info("%s baldes de limite de taxa removidos", removidos)
+            except Exception:
+                logger.exception("Erro ao limpar baldes de limite de taxa")
+
+        asyncio.ensure_future(limpar())
+
+
+async def _responder_429(send, espera: float):
+    corpo = json.dumps(
+        {"detail": "Muitas requisições, tente novamente mais tarde"}
+    ).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"retry-after", str(max(1, math.ceil(espera))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": corpo})
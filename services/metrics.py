@@ -0,0 +1,242 @@
+import bisect
+import threading
+import time
+
+from services.request_timing import rota_da_requisicao
+
+# Limites (segundos) dos buckets do histograma de latência
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    """Séries de uma única thread; só essa thread escreve nelas."""
+
+    __slots__ = ("contadores", "histogramas")
+
+    def __init__(self):
+        self.contadores = {}
+        self.histogramas = {}
+
+
+class RegistroMetricas:
+    """
+    Registro de métricas em processo, no formato texto do Prometheus.
+
+    Cada thread escreve no seu próprio shard, sem locks; a leitura (/metrics)
+    soma os shards. O lock só é usado quando uma thread nova aparece.
+    Gauges calculados na leitura (pool do banco, caches, filas) são
+    registrados com `registrar_coletor`.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._descricoes = {}
+        self._coletores = []
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def descrever(self, nome: str, tipo: str, ajuda: str):
+        self._descricoes[nome] = (tipo, ajuda)
+
+    def incrementar(self, nome: str, valor: float = 1, **labels):
+        chave = (nome, tuple(sorted(labels.items())))
+        contadores = self._shard().contadores
+        contadores[chave] = contadores.get(chave, 0) + valor
+
+    def observar(self, nome: str, valor: float, buckets=BUCKETS_LATENCIA, **labels):
+        chave = (nome, tuple(sorted(labels.items())))
+        histogramas = self._shard().histogramas
+        serie = histogramas.get(chave)
+        if serie is None:
+            # [contagem por bucket..., +Inf], soma
+            serie = histogramas[chave] = [buckets, [0] * (len(buckets) + 1), 0.0]
+        serie[1][bisect.bisect_left(buckets, valor)] += 1
+        serie[2] += valor
+
+    def registrar_coletor(self, coletor):
+        """`coletor()` retorna [(nome, tipo, ajuda, {labels}, valor), ...]."""
+        self._coletores.append(coletor)
+
+    # ========== EXPORTAÇÃO ==========
+
+    def _agregar(self):
+        with self._lock:
+            shards = list(self._shards)
+
+        contadores = {}
+        histogramas = {}
+        for shard in shards:
+            for chave, valor in list(shard.contadores.items()):
+                contadores[chave] = contadores.get(chave, 0) + valor
+            for chave, (buckets, contagens, soma) in list(shard.histogramas.items()):
+                atual = histogramas.get(chave)
+                if atual is None:
+                    histogramas[chave] = [buckets, list(contagens), soma]
+                else:
+                    atual[1] = [a + b for a, b in zip(atual[1], contagens)]
+                    atual[2] += soma
+        return contadores, histogramas
+
+    def exportar(self) -> str:
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        contadores, histogramas = self._agregar()
+        linhas = []
+        cabecalhos = set()
+
+        def cabecalho(nome, tipo_padrao):
+            if nome in cabecalhos:
+                return
+            cabecalhos.add(nome)
+            tipo, ajuda = self._descricoes.get(nome, (tipo_padrao, nome))
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+
+        for (nome, labels), valor in sorted(contadores.items()):
+            cabecalho(nome, "counter")
+            linhas.append(f"{nome}{_formatar_labels(labels)} {_numero(valor)}")
+
+        for (nome, labels), (buckets, contagens, soma) in sorted(histogramas.items()):
+            cabecalho(nome, "histogram")
+            acumulado = 0
+            for limite, contagem in zip(list(buckets) + ["+Inf"], contagens):
+                acumulado += contagem
+                le = limite if limite == "+Inf" else _numero(limite)
+                rotulos = _formatar_labels(labels + (("le", le),))
+                linhas.append(f"{nome}_bucket{rotulos} {acumulado}")
+            linhas.append(f"{nome}_sum{_formatar_labels(labels)} {_numero(soma)}")
+            linhas.append(f"{nome}_count{_formatar_labels(labels)} {acumulado}")
+
+        for coletor in self._coletores:
+            try:
+                amostras = coletor()
+            except Exception:
+                continue
+            for nome, tipo, ajuda, labels, valor in amostras:
+                if nome not in cabecalhos:
+                    self.descrever(nome, tipo, ajuda)
+                cabecalho(nome, tipo)
+                rotulos = _formatar_labels(tuple(sorted(labels.items())))
+                linhas.append(f"{nome}{rotulos} {_numero(valor)}")
+
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in labels) + "}"
+
+
+def _numero(valor) -> str:
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+metricas = RegistroMetricas()
+
+metricas.descrever(
+    "http_request_duration_seconds",
+    "histogram",
+    "Latência das requisições HTTP por rota e status",
+)
+metricas.descrever(
+    "http_requests_in_flight", "gauge", "Requisições HTTP em andamento"
+)
+metricas.descrever(
+    "orcamentos_criados_total", "counter", "Orçamentos criados desde o início"
+)
+metricas.descrever(
+    "orcamentos_aprovados_total", "counter", "Orçamentos aprovados desde o início"
+)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que alimenta o histograma de latência e o gauge in-flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status_code = 500
+
+        async def send_com_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metricas.incrementar("http_requests_in_flight")
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            metricas.incrementar("http_requests_in_flight", -1)
+            metricas.observar(
+                "http_request_duration_seconds",
+                time.perf_counter() - inicio,
+                method=scope["method"],
+                route=rota_da_requisicao(scope),
+                status=str(status_code),
+            )
+
+
+# ========== COLETORES ==========
+
+
+def coletor_pool(engine):
+    """Gauges do pool de conexões do SQLAlchemy."""
+
+    def coletar():
+        pool = engine.pool
+        amostras = []
+        for nome, atributo, ajuda in (
+            ("db_pool_size", "size", "Tamanho configurado do pool"),
+            ("db_pool_checked_out", "checkedout", "Conexões em uso"),
+            ("db_pool_checked_in", "checkedin", "Conexões ociosas no pool"),
+            ("db_pool_overflow", "overflow", "Conexões acima do tamanho do pool"),
+        ):
+            metodo = getattr(pool, atributo, None)
+            if metodo is not None:
+                amostras.append((nome, "gauge", ajuda, {}, metodo()))
+        return amostras
+
+    return coletar
+
+
+def coletor_cache(nome_cache: str, cache):
+    """Acertos, falhas e taxa de acerto de um cache com atributos hits/misses."""
+
+    def coletar():
+        total = cache.hits + cache.misses
+        labels = {"cache": nome_cache}
+        return [
+            ("cache_hits_total", "counter", "Acertos de cache", labels, cache.hits),
+            ("cache_misses_total", "counter", "Falhas de cache", labels, cache.misses),
+            (
+                "cache_hit_ratio",
+                "gauge",
+                "Taxa de acerto do cache",
+                labels,
+                cache.hits / total if total else 0.0,
+            ),
+        ]
+
+    return coletar
@@ -1,7 +1,12 @@
 from decimal import Decimal
 from sqlalchemy.orm import Session
 
-from models import ItemOrcamento, ServicosCatalogo as Atividade, calcular_item_orcamento
+from models import Orcamento, calcular_item_orcamento, calcular_valor_liquido
+from services.catalogo_cache import catalogo_cache
+from services.jobs import tarefa
+
+# Orçamentos recalculados entre dois commits/atualizações de progresso
+RECALCULO_LOTE = 50
 
 
 def recalculate_orcamento(db: Session, orcamento, persist: bool = True):
@@ -23,20 +28,53 @@ def recalculate_orcamento(db: Session, orcamento, persist: bool = True):
     if not orcamento or getattr(orcamento, "status", None) != "Rascunho":
         return orcamento
 
-    total_bruto = Decimal("0.0000")
-
     # Recarregar itens (garante que temos itens atualizados do DB)
     db.refresh(orcamento)
-    itens = list(orcamento.itens or [])
+    _aplicar_complexidades(orcamento, catalogo_cache.complexidades(db))
+
+    if persist:
+        db.commit()
+        db.refresh(orcamento)
+
+    return orcamento
+
+
+def recalcular_rascunhos(db: Session, orcamentos: list):
+    """
+    Recalcula os rascunhos de uma listagem em lote.
+
+    Os itens devem vir carregados (selectinload): o catálogo é lido uma vez
+    e tudo é gravado em um único commit, sem expirar os objetos que a
+    resposta ainda vai serializar. Com recalculate_orcamento por linha, cada
+    rascunho custava refresh, itens, commit e novo refresh.
+    """
+    rascunhos = [o for o in orcamentos if o.status == "Rascunho"]
+    if not rascunhos:
+        return
+
+    complexidades = catalogo_cache.complexidades(db)
+    for orcamento in rascunhos:
+        _aplicar_complexidades(orcamento, complexidades)
+
+    expirar = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expirar
+
+
+def _aplicar_complexidades(orcamento, complexidades: dict):
+    """Atualiza itens e totais do orçamento com as complexidades dadas."""
+    total_bruto = Decimal("0.0000")
 
-    for item in itens:
-        atividade = db.query(Atividade).filter(Atividade.id == item.atividade_id).first()
-        if not atividade:
+    for item in orcamento.itens or []:
+        if item.atividade_id not in complexidades:
             # se atividade removida, manter snapshot existente
             total_bruto += Decimal(item.subtotal_bruto or 0)
             continue
 
-        complexidade_snapshot = atividade.complexidade_ust
+        complexidade_snapshot = complexidades[item.atividade_id]
 
         ust_item, valor_item_bruto = calcular_item_orcamento(
             item.horas_estimadas,
@@ -50,14 +88,30 @@ def recalculate_orcamento(db: Session, orcamento, persist: bool = True):
 
         total_bruto += valor_item_bruto
 
-    desconto = (total_bruto * (orcamento.desconto_percentual or Decimal("0")) / Decimal("100"))
-    valor_liquido = total_bruto - desconto
+    valor_liquido = calcular_valor_liquido(total_bruto, orcamento.desconto_percentual)
 
     orcamento.valor_total_bruto = total_bruto
     orcamento.valor_total_liquido = valor_liquido
 
-    if persist:
-        db.commit()
-        db.refresh(orcamento)
 
-    return orcamento
+@tarefa("recalcular_orcamentos")
+def recalcular_orcamentos(db: Session, parametros: dict, progresso):
+    """
+    Tarefa da fila: recalcula os orçamentos em rascunho, opcionalmente
+    filtrados por `contrato_id`, `projeto_id` ou lista de `orcamento_ids`.
+    """
+    query = db.query(Orcamento.id).filter(Orcamento.status == "Rascunho")
+    if parametros.get("contrato_id"):
+        query = query.filter(Orcamento.contrato_id == parametros["contrato_id"])
+    if parametros.get("projeto_id"):
+        query = query.filter(Orcamento.projeto_id == parametros["projeto_id"])
+    if parametros.get("orcamento_ids"):
+        query = query.filter(Orcamento.id.in_(parametros["orcamento_ids"]))
+    ids = [id_ for (id_,) in query.order_by(Orcamento.id)]
+
+    for n, orcamento_id in enumerate(ids, start=1):
+        recalculate_orcamento(db, db.get(Orcamento, orcamento_id), persist=False)
+        if n % RECALCULO_LOTE == 0:
+            progresso(n * 100 // len(ids))
+
+    return {"recalculados": len(ids)}
@@ -0,0 +1,143 @@
+import fnmatch
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from services.request_timing import observadores_endpoint
+
+_RE_PARAMETRO = re.compile(r"\{[^}]*\}")
+
+
+def _normalizar_rota(rota: str) -> str:
+    """'PUT /orcamentos/{id}' e 'PUT /orcamentos/{orcamento_id}' viram iguais."""
+    return _RE_PARAMETRO.sub("{}", rota.strip())
+
+
+def _pilha_colapsada(frame) -> str:
+    """Pilha no formato 'collapsed' (raiz primeiro, frames separados por ';')."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        arquivo = os.path.basename(code.co_filename)
+        frames.append(f"{code.co_name} ({arquivo}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class PerfiladorAmostragem:
+    """
+    Perfilador por amostragem sob demanda.
+
+    Quando armado, acompanha as próximas N requisições cuja rota corresponde
+    ao padrão ("PUT /orcamentos/{id}", aceita curingas do fnmatch) e, enquanto
+    o endpoint executa, amostra a pilha da thread a cada `intervalo_ms`.
+    O resultado é agregado no formato "collapsed stacks", aceito por
+    flamegraph.pl, speedscope e similares.
+
+    Desarmado, não há thread de amostragem nem observador registrado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._amostrador = None
+        self.ativo = False
+        self.padrao = None
+        self.restantes = 0
+        self.capturadas = 0
+        self.intervalo = 0.005
+        self.amostras = 0
+        self.pilhas = Counter()
+        self.iniciado_em = None
+        self.finalizado_em = None
+
+    def iniciar(self, padrao: str, requisicoes: int, intervalo_ms: float):
+        with self._lock:
+            if self.ativo:
+                raise RuntimeError("Perfilador já está ativo")
+            metodo, _, caminho = _normalizar_rota(padrao).partition(" ")
+            self.padrao = f"{metodo.upper()} {caminho.strip()}"
+            self.restantes = requisicoes
+            self.capturadas = 0
+            self.intervalo = intervalo_ms / 1000
+            self.amostras = 0
+            self.pilhas = Counter()
+            self._threads = {}
+            self.iniciado_em = datetime.now().isoformat()
+            self.finalizado_em = None
+            self.ativo = True
+
+            self._amostrador = threading.Thread(
+                target=self._amostrar, name="perfilador", daemon=True
+            )
+            self._amostrador.start()
+            observadores_endpoint.append(self._observar_endpoint)
+
+    def parar(self):
+        with self._lock:
+            self._parar()
+
+    def _parar(self):
+        if not self.ativo:
+            return
+        self.ativo = False
+        self._threads = {}
+        self.finalizado_em = datetime.now().isoformat()
+        if self._observar_endpoint in observadores_endpoint:
+            observadores_endpoint.remove(self._observar_endpoint)
+
+    def _corresponde(self, estado) -> bool:
+        rota = _normalizar_rota(f"{estado.metodo} {estado.rota}")
+        return fnmatch.fnmatchcase(rota, self.padrao)
+
+    def _observar_endpoint(self, estado, entrando: bool):
+        thread_id = threading.get_ident()
+        with self._lock:
+            if not self.ativo:
+                return
+            if entrando:
+                if self.restantes > 0 and self._corresponde(estado):
+                    self.restantes -= 1
+                    self.capturadas += 1
+                    self._threads[thread_id] = True
+            elif self._threads.pop(thread_id, None):
+                if self.restantes == 0 and not self._threads:
+                    self._parar()
+
+    def _amostrar(self):
+        while self.ativo:
+            threads = list(self._threads)
+            if threads:
+                frames = sys._current_frames()
+                for thread_id in threads:
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        self.pilhas[_pilha_colapsada(frame)] += 1
+                        self.amostras += 1
+            time.sleep(self.intervalo)
+
+    def status(self) -> dict:
+        return {
+            "ativo": self.ativo,
+            "padrao": self.padrao,
+            "requisicoes_restantes": self.restantes,
+            "requisicoes_capturadas": self.capturadas,
+            "intervalo_ms": self.intervalo * 1000,
+            "amostras": self.amostras,
+            "pilhas_distintas": len(self.pilhas),
+            "iniciado_em": self.iniciado_em,
+            "finalizado_em": self.finalizado_em,
+        }
+
+    def pilhas_colapsadas(self) -> str:
+        """Uma linha por pilha: 'frame1;frame2;... contagem'."""
+        return "".join(
+            f"{pilha} {contagem}\n" for pilha, contagem in self.pilhas.most_common()
+        )
+
+
+perfilador = PerfiladorAmostragem()
@@ -0,0 +1,104 @@
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from services.request_timing import observadores_sql
+
+logger = logging.getLogger("api.nplusone")
+
+# Modo do detector de N+1: "" (desligado), "warn" (loga) ou "raise" (falha)
+NPLUSONE_MODE = os.environ.get("NPLUSONE_MODE", "").strip().lower()
+# Quantas vezes o mesmo formato de SQL pode rodar em uma requisição
+NPLUSONE_THRESHOLD = int(os.environ.get("NPLUSONE_THRESHOLD", "10"))
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = r"(?:\?|%\(\w+\)s|:\w+)"
+_RE_LISTA = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+class NPlusOneError(RuntimeError):
+    """O mesmo formato de SQL rodou mais vezes que o permitido em uma requisição."""
+
+
+def normalizar_sql(statement: str) -> str:
+    """
+    Reduz um statement ao seu "formato": literais viram ?, listas de
+    parâmetros (IN (...)) viram (?) e espaços são colapsados.
+    """
+    sql = _RE_STRING.sub("?", statement)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_LISTA.sub("(?)", sql)
+    return _RE_ESPACOS.sub(" ", sql).strip()
+
+
+def _observar_requisicao(estado, statement, parameters, duracao_ms):
+    if estado is None:
+        return
+
+    if estado.formatos_sql is None:
+        estado.formatos_sql = Counter()
+
+    formato = normalizar_sql(statement)
+    estado.formatos_sql[formato] += 1
+    if estado.formatos_sql[formato] != NPLUSONE_THRESHOLD + 1:
+        return
+
+    mensagem = (
+        f"Possível N+1 em {estado.metodo} {estado.rota or '?'}: "
+        f"{NPLUSONE_THRESHOLD + 1}x {formato}"
+    )
+    if NPLUSONE_MODE == "raise":
+        raise NPlusOneError(mensagem)
+    logger.warning(mensagem)
+
+
+def ativar_detector():
+    """Liga o detector de N+1 se NPLUSONE_MODE estiver definido."""
+    if NPLUSONE_MODE and _observar_requisicao not in observadores_sql:
+        observadores_sql.append(_observar_requisicao)
+    return bool(NPLUSONE_MODE)
+
+
+# ========== ORÇAMENTO DE CONSULTAS (TESTES) ==========
+
+
+class ContadorConsultas:
+    """Conta os statements executados (em qualquer thread) enquanto ativo."""
+
+    def __init__(self):
+        self.formatos = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return sum(self.formatos.values())
+
+    def registrar(self, estado, statement, parameters, duracao_ms):
+        with self._lock:
+            self.formatos[normalizar_sql(statement)] += 1
+
+    def repetidas(self, limite: int) -> dict:
+        """Formatos de SQL executados mais de `limite` vezes."""
+        return {sql: n for sql, n in self.formatos.items() if n > limite}
+
+
+@contextmanager
+def contar_consultas():
+    """
+    Conta as consultas executadas dentro do bloco.
+
+        with contar_consultas() as contador:
+            client.get("/orcamentos/")
+        assert contador.total <= 10
+    """
+    contador = ContadorConsultas()
+    observadores_sql.append(contador.registrar)
+    try:
+        yield contador
+    finally:
+        observadores_sql.remove(contador.registrar)
@@ -0,0 +1,235 @@
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import CheckpointOrcamento, HistoricoAuditoria, ItemOrcamento, Orcamento
+from services import arquivo_auditoria
+from services.jobs import periodica, tarefa
+
+# O job de checkpoints cria checkpoint dos orçamentos com pelo menos K
+# eventos de auditoria desde o último. Reconstruir custa O(eventos desde o
+# checkpoint).
+AUDITORIA_CHECKPOINT_EVENTOS = int(
+    os.environ.get("AUDITORIA_CHECKPOINT_EVENTOS", "50")
+)
+# Intervalo (s) entre execuções agendadas do job de checkpoints (0 desliga)
+AUDITORIA_CHECKPOINT_INTERVALO_S = float(
+    os.environ.get("AUDITORIA_CHECKPOINT_INTERVALO_S", "300")
+)
+# Checkpoints gravados entre dois commits/atualizações de progresso
+CHECKPOINT_LOTE = 100
+
+DESCONTO = "DESCONTO_ORCAMENTO"
+HORAS = "HORAS_ITEM"
+
+
+class EstadoOrcamento:
+    """Horas por item e desconto de um orçamento em um ponto do histórico."""
+
+    def __init__(self, desconto_percentual, horas: dict):
+        self.desconto_percentual = Decimal(desconto_percentual or 0)
+        self.horas = horas  # item_orcamento_id -> Decimal
+
+    @classmethod
+    def do_checkpoint(cls, checkpoint: CheckpointOrcamento):
+        return cls(
+            checkpoint.desconto_percentual,
+            {item_id: Decimal(horas) for item_id, horas in json.loads(checkpoint.horas)},
+        )
+
+    @classmethod
+    def atual(cls, db: Session, orcamento: Orcamento):
+        linhas = db.query(ItemOrcamento.id, ItemOrcamento.horas_estimadas).filter(
+            ItemOrcamento.orcamento_id == orcamento.id
+        )
+        return cls(
+            orcamento.desconto_percentual,
+            {item_id: Decimal(horas or 0) for item_id, horas in linhas},
+        )
+
+    def aplicar(self, evento, valor):
+        if evento.tipo_alteracao == DESCONTO:
+            self.desconto_percentual = Decimal(valor)
+        elif evento.tipo_alteracao == HORAS and evento.item_orcamento_id is not None:
+            self.horas[evento.item_orcamento_id] = Decimal(valor)
+
+
+def _eventos(db: Session, orcamento_id: int, condicoes, filtro):
+    """
+    Eventos do orçamento na tabela (`condicoes`) e no arquivo (`filtro`, o
+    mesmo critério em Python), em ordem de id.
+    """
+    eventos = (
+        db.query(HistoricoAuditoria)
+        .filter(HistoricoAuditoria.orcamento_id == orcamento_id, *condicoes)
+        .all()
+    )
+    eventos += arquivo_auditoria.buscar(db, orcamento_id=orcamento_id, filtro=filtro)
+    return sorted(eventos, key=lambda evento: evento.id)
+
+
+def reconstruir_orcamento(db: Session, orcamento_id: int, em: datetime):
+    """
+    Horas dos itens e desconto do orçamento no instante `em`.
+
+    Parte do checkpoint mais recente anterior a `em` e reaplica os eventos
+    seguintes (valor_novo). Sem checkpoint anterior, parte do primeiro
+    checkpoint posterior (ou do estado atual) e desfaz os eventos até `em`
+    (valor_anterior). Retorna None se o orçamento não existir. Um `em` sem
+    fuso é tratado como UTC.
+
+    Só horas e desconto são auditados: itens incluídos ou removidos fora do
+    histórico aparecem como estão no ponto de partida.
+    """
+    orcamento = db.get(Orcamento, orcamento_id)
+    if orcamento is None:
+        return None
+    referencia = em if em.tzinfo is not None else em.replace(tzinfo=timezone.utc)
+
+    checkpoints = db.query(CheckpointOrcamento).filter(
+        CheckpointOrcamento.orcamento_id == orcamento_id
+    )
+
+    checkpoint = (
+        checkpoints.filter(CheckpointOrcamento.data_referencia <= referencia)
+        .order_by(CheckpointOrcamento.ultimo_evento_id.desc())
+        .first()
+    )
+    if checkpoint is not None:
+        estado = EstadoOrcamento.do_checkpoint(checkpoint)
+        desde = checkpoint.ultimo_evento_id
+        aplicados = _eventos(
+            db,
+            orcamento_id,
+            [
+                HistoricoAuditoria.id > desde,
+                HistoricoAuditoria.data_alteracao <= referencia,
+            ],
+            lambda e: e.id > desde and e.data_alteracao <= referencia,
+        )
+        for evento in aplicados:
+            estado.aplicar(evento, evento.valor_novo)
+        ultimo_evento_id = aplicados[-1].id if aplicados else desde
+    else:
+        checkpoint = checkpoints.order_by(
+            CheckpointOrcamento.ultimo_evento_id
+        ).first()
+        if checkpoint is not None:
+            estado = EstadoOrcamento.do_checkpoint(checkpoint)
+            ate = checkpoint.ultimo_evento_id
+        else:
+            estado = EstadoOrcamento.atual(db, orcamento)
+            ate = None
+        aplicados = _eventos(
+            db,
+            orcamento_id,
+            [HistoricoAuditoria.data_alteracao > referencia]
+            + ([HistoricoAuditoria.id <= ate] if ate is not None else []),
+            lambda e: e.data_alteracao > referencia and (ate is None or e.id <= ate),
+        )
+        for evento in reversed(aplicados):
+            estado.aplicar(evento, evento.valor_anterior)
+        ultimo_evento_id = (
+            db.query(func.max(HistoricoAuditoria.id))
+            .filter(
+                HistoricoAuditoria.orcamento_id == orcamento_id,
+                HistoricoAuditoria.data_alteracao <= referencia,
+            )
+            .scalar()
+        )
+        if ultimo_evento_id is None:
+            arquivados = arquivo_auditoria.buscar(
+                db,
+                1,
+                orcamento_id=orcamento_id,
+                filtro=lambda e: e.data_alteracao <= referencia,
+            )
+            ultimo_evento_id = arquivados[0].id if arquivados else None
+
+    return {
+        "orcamento_id": orcamento_id,
+        "em": referencia,
+        "desconto_percentual": estado.desconto_percentual,
+        "itens": [
+            {"item_orcamento_id": item_id, "horas_estimadas": horas}
+            for item_id, horas in sorted(estado.horas.items())
+        ],
+        "ultimo_evento_id": ultimo_evento_id,
+        "checkpoint_id": checkpoint.id if checkpoint is not None else None,
+        "eventos_aplicados": len(aplicados),
+    }
+
+
+# ========== CHECKPOINTS ==========
+
+
+def criar_checkpoint(db: Session, orcamento: Orcamento):
+    """Checkpoint do estado atual, marcado com o último evento já aplicado."""
+    # Lê o último evento antes das horas: um evento que chegue no meio fica
+    # depois do checkpoint e é reaplicado (valor absoluto, sem efeito duplo)
+    ultimo = (
+        db.query(HistoricoAuditoria.id, HistoricoAuditoria.data_alteracao)
+        .filter(HistoricoAuditoria.orcamento_id == orcamento.id)
+        .order_by(HistoricoAuditoria.id.desc())
+        .first()
+    )
+    if ultimo is None:
+        return None
+    estado = EstadoOrcamento.atual(db, orcamento)
+    checkpoint = CheckpointOrcamento(
+        orcamento_id=orcamento.id,
+        ultimo_evento_id=ultimo.id,
+        data_referencia=ultimo.data_alteracao,
+        desconto_percentual=estado.desconto_percentual,
+        horas=json.dumps(
+            [[item_id, str(horas)] for item_id, horas in sorted(estado.horas.items())],
+            separators=(",", ":"),
+        ),
+        criado_em=datetime.now(),
+    )
+    db.add(checkpoint)
+    return checkpoint
+
+
+@tarefa("criar_checkpoints_auditoria")
+def criar_checkpoints_auditoria(db: Session, parametros: dict, progresso):
+    """
+    Tarefa da fila: cria checkpoint dos orçamentos com pelo menos `k`
+    eventos de auditoria desde o último checkpoint.
+    """
+    k = parametros.get("k") or AUDITORIA_CHECKPOINT_EVENTOS
+    ultimos = (
+        db.query(
+            CheckpointOrcamento.orcamento_id,
+            func.max(CheckpointOrcamento.ultimo_evento_id).label("ate"),
+        )
+        .group_by(CheckpointOrcamento.orcamento_id)
+        .subquery()
+    )
+    ids = [
+        orcamento_id
+        for (orcamento_id,) in db.query(HistoricoAuditoria.orcamento_id)
+        .outerjoin(ultimos, ultimos.c.orcamento_id == HistoricoAuditoria.orcamento_id)
+        .filter(HistoricoAuditoria.id > func.coalesce(ultimos.c.ate, 0))
+        .group_by(HistoricoAuditoria.orcamento_id)
+        .having(func.count(HistoricoAuditoria.id) >= k)
+        .order_by(HistoricoAuditoria.orcamento_id)
+    ]
+
+    criados = 0
+    for n, orcamento_id in enumerate(ids, start=1):
+        orcamento = db.get(Orcamento, orcamento_id)
+        if orcamento is not None and criar_checkpoint(db, orcamento) is not None:
+            criados += 1
+        if n % CHECKPOINT_LOTE == 0:
+            progresso(n * 100 // len(ids))
+    db.commit()
+
+    return {"checkpoints": criados}
+
+
+periodica("criar_checkpoints_auditoria", AUDITORIA_CHECKPOINT_INTERVALO_S)
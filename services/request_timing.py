@@ -0,0 +1,230 @@
+import functools
+import inspect
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger("api.timing")
+
+
+class EstadoRequisicao:
+    """Medições acumuladas durante uma requisição HTTP."""
+
+    __slots__ = (
+        "metodo",
+        "rota",
+        "inicio",
+        "sql_total",
+        "sql_ms",
+        "inicio_endpoint",
+        "fim_endpoint",
+        "endpoint_ms",
+        "serializacao_ms",
+        "formatos_sql",
+    )
+
+    def __init__(self, metodo: str = "", rota: Optional[str] = None):
+        self.metodo = metodo
+        self.rota = rota
+        self.inicio = time.perf_counter()
+        self.sql_total = 0
+        self.sql_ms = 0.0
+        self.inicio_endpoint = None
+        self.fim_endpoint = None
+        self.endpoint_ms = 0.0
+        self.serializacao_ms = 0.0
+        self.formatos_sql = None
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def server_timing(self, total_ms: float) -> str:
+        """Valor do header Server-Timing (https://www.w3.org/TR/server-timing/)."""
+        return ", ".join(
+            [
+                f"total;dur={total_ms:.1f}",
+                f'db;dur={self.sql_ms:.1f};desc="{self.sql_total} queries"',
+                f"app;dur={self.endpoint_ms:.1f}",
+                f"ser;dur={self.serializacao_ms:.1f}",
+            ]
+        )
+
+
+_estado: ContextVar[Optional[EstadoRequisicao]] = ContextVar(
+    "estado_requisicao", default=None
+)
+
+
+def estado_atual() -> Optional[EstadoRequisicao]:
+    """Retorna as medições da requisição corrente (None fora de requisições)."""
+    return _estado.get()
+
+
+def rota_da_requisicao(scope) -> str:
+    """Template da rota (ex: /orcamentos/{orcamento_id}) ou 'sem_rota'."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "sem_rota"
+
+
+# ========== SQL ==========
+
+# Funções chamadas após cada statement: observador(estado, statement, parameters,
+# duracao_ms). `estado` é None quando o SQL roda fora de uma requisição.
+observadores_sql = []
+
+
+def instrumentar_engine(engine):
+    """Registra os eventos de cursor que cronometram cada statement SQL."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes_execucao(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_query", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois_execucao(conn, cursor, statement, parameters, context, executemany):
+        duracao_ms = (time.perf_counter() - conn.info["inicio_query"].pop()) * 1000
+        estado = _estado.get()
+        if estado is not None:
+            estado.sql_total += 1
+            estado.sql_ms += duracao_ms
+        for observador in observadores_sql:
+            observador(estado, statement, parameters, duracao_ms)
+
+
+# ========== ENDPOINT E SERIALIZAÇÃO ==========
+
+# Funções chamadas na thread do endpoint, ao entrar e ao sair dele:
+# observador(estado, entrando: bool)
+observadores_endpoint = []
+
+
+def _marcar_inicio_endpoint():
+    estado = _estado.get()
+    if estado is not None:
+        estado.inicio_endpoint = time.perf_counter()
+        for observador in observadores_endpoint:
+            observador(estado, True)
+
+
+def _marcar_fim_endpoint():
+    estado = _estado.get()
+    if estado is not None and estado.inicio_endpoint is not None:
+        estado.fim_endpoint = time.perf_counter()
+        estado.endpoint_ms += (estado.fim_endpoint - estado.inicio_endpoint) * 1000
+        for observador in observadores_endpoint:
+            observador(estado, False)
+
+
+def _cronometrar_endpoint(endpoint):
+    # include_router recria as rotas com o endpoint já cronometrado
+    if getattr(endpoint, "_cronometrado", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def endpoint_cronometrado(*args, **kwargs):
+            _marcar_inicio_endpoint()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _marcar_fim_endpoint()
+
+    else:
+
+        @functools.wraps(endpoint)
+        def endpoint_cronometrado(*args, **kwargs):
+            _marcar_inicio_endpoint()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _marcar_fim_endpoint()
+
+    endpoint_cronometrado._cronometrado = True
+    return endpoint_cronometrado
+
+
+class TimedRoute(APIRoute):
+    """
+    Rota que separa o tempo do endpoint do tempo de serialização da resposta
+    (validação do response_model + renderização do JSON).
+    Uso: APIRouter(..., route_class=TimedRoute)
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _cronometrar_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def handler_cronometrado(request):
+            estado = _estado.get()
+            if estado is not None:
+                estado.rota = self.path
+            response = await handler(request)
+            if estado is not None and estado.fim_endpoint is not None:
+                estado.serializacao_ms += (
+                    time.perf_counter() - estado.fim_endpoint
+                ) * 1000
+            return response
+
+        return handler_cronometrado
+
+
+# ========== MIDDLEWARE ==========
+
+
+class TimingMiddleware:
+    """
+    Middleware ASGI que mede cada requisição e emite:
+    - header Server-Timing (total, db, app, ser)
+    - uma linha de log estruturada (JSON) por requisição, com o template da rota
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = EstadoRequisicao(metodo=scope["method"])
+        token = _estado.set(estado)
+        status_code = 500
+
+        async def send_com_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", estado.server_timing(estado.total_ms())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_com_timing)
+        finally:
+            _estado.reset(token)
+            estado.rota = estado.rota or rota_da_requisicao(scope)
+            logger.info(
+                json.dumps(
+                    {
+                        "metodo": estado.metodo,
+                        "rota": estado.rota,
+                        "status": status_code,
+                        "total_ms": round(estado.total_ms(), 2),
+                        "sql_total": estado.sql_total,
+                        "sql_ms": round(estado.sql_ms, 2),
+                        "endpoint_ms": round(estado.endpoint_ms, 2),
+                        "serializacao_ms": round(estado.serializacao_ms, 2),
+                    }
+                )
+            )
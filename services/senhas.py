@@ -0,0 +1,208 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import metricas
+
+# Custo do scrypt (memória = 128 * N * r bytes: 16 MiB no padrão). Hashes
+# gravados com outro custo continuam válidos e são refeitos no login.
+SENHA_SCRYPT_N = int(os.environ.get("SENHA_SCRYPT_N", str(2**14)))
+SENHA_SCRYPT_R = int(os.environ.get("SENHA_SCRYPT_R", "8"))
+SENHA_SCRYPT_P = int(os.environ.get("SENHA_SCRYPT_P", "1"))
+# Threads dedicadas ao KDF (o scrypt do OpenSSL solta o GIL): no máximo
+# tantos hashes simultâneos, fora do threadpool que atende as rotas
+SENHA_WORKERS = int(
+    os.environ.get("SENHA_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))
+)
+# Pedidos esperando uma thread livre; além disso, recusa na hora (503)
+SENHA_FILA_MAX = int(os.environ.get("SENHA_FILA_MAX", "32"))
+# Pedido que esperou mais que isso (s) na fila é descartado sem calcular:
+# o cliente provavelmente já desistiu
+SENHA_FILA_TIMEOUT_S = float(os.environ.get("SENHA_FILA_TIMEOUT_S", "5"))
+
+PREFIXO = "scrypt"
+TAMANHO_SAL = 16
+TAMANHO_HASH = 32
+
+metricas.descrever(
+    "senhas_kdf_segundos",
+    "histogram",
+    "Duração do cálculo do KDF de senha (sem a espera na fila)",
+)
+metricas.descrever(
+    "senhas_rejeitadas_total",
+    "counter",
+    "Pedidos de hash de senha recusados por fila cheia ou espera esgotada",
+)
+metricas.descrever(
+    "senhas_rehash_total",
+    "counter",
+    "Hashes refeitos no login (SHA-256 legado ou custo antigo)",
+)
+
+
+class SenhasOcupado(Exception):
+    """Fila do KDF cheia ou espera esgotada: tente de novo em instantes."""
+
+
+# ========== FORMATO ==========
+
+
+def _scrypt(senha: str, sal: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        senha.encode(),
+        salt=sal,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r,
+        dklen=TAMANHO_HASH,
+    )
+
+
+def _b64(dados: bytes) -> str:
+    return base64.b64encode(dados).decode()
+
+
+def gerar_hash(senha: str) -> str:
+    """scrypt$N$r$p$sal$hash (base64), com sal aleatório."""
+    sal = os.urandom(TAMANHO_SAL)
+    inicio = time.perf_counter()
+    chave = _scrypt(senha, sal, SENHA_SCRYPT_N, SENHA_SCRYPT_R, SENHA_SCRYPT_P)
+    metricas.observar("senhas_kdf_segundos", time.perf_counter() - inicio)
+    return "$".join(
+        (
+            PREFIXO,
+            str(SENHA_SCRYPT_N),
+            str(SENHA_SCRYPT_R),
+            str(SENHA_SCRYPT_P),
+            _b64(sal),
+            _b64(chave),
+        )
+    )
+
+
+# Hash no formato e custo atuais que nenhuma senha confere (sal e hash
+# zerados). Login de usuário inexistente, ou com hash legado e senha errada,
+# confere contra ele: a falha custa o mesmo KDF de um usuário existente e o
+# tempo de resposta não revela quais usernames existem.
+HASH_FICTICIO = "$".join(
+    (
+        PREFIXO,
+        str(SENHA_SCRYPT_N),
+        str(SENHA_SCRYPT_R),
+        str(SENHA_SCRYPT_P),
+        _b64(bytes(TAMANHO_SAL)),
+        _b64(bytes(TAMANHO_HASH)),
+    )
+)
+
+
+def conferir(senha: str, hash_gravado: str):
+    """
+    Confere a senha com o hash gravado. Retorna (ok, novo_hash): novo_hash
+    vem preenchido quando o hash gravado é o SHA-256 legado (sem sal) ou
+    usa outro custo, e deve substituir o gravado.
+    """
+    if not hash_gravado.startswith(PREFIXO + "$"):
+        legado = hashlib.sha256(senha.encode()).hexdigest()
+        if not hmac.compare_digest(legado, hash_gravado):
+            conferir(senha, HASH_FICTICIO)
+            return False, None
+        metricas.incrementar("senhas_rehash_total")
+        return True, gerar_hash(senha)
+
+    _, n, r, p, sal, chave = hash_gravado.split("$")
+    n, r, p = int(n), int(r), int(p)
+    inicio = time.perf_counter()
+    calculada = _scrypt(senha, base64.b64decode(sal), n, r, p)
+    metricas.observar("senhas_kdf_segundos", time.perf_counter() - inicio)
+    if not hmac.compare_digest(calculada, base64.b64decode(chave)):
+        return False, None
+    if (n, r, p) != (SENHA_SCRYPT_N, SENHA_SCRYPT_R, SENHA_SCRYPT_P):
+        metricas.incrementar("senhas_rehash_total")
+        return True, gerar_hash(senha)
+    return True, None
+
+
+# ========== EXECUTOR DEDICADO ==========
+
+
+class ExecutorSenhas:
+    """
+    Pool de threads só para o KDF, com fila limitada.
+
+    Login e registro aguardam aqui sem ocupar uma thread do threadpool das
+    rotas: uma rajada de logins disputa SENHA_WORKERS threads e, no pior
+    caso, recebe 503, enquanto o resto da API segue atendendo.
+    """
+
+    def __init__(
+        self,
+        workers: int = SENHA_WORKERS,
+        fila_max: int = SENHA_FILA_MAX,
+        timeout_fila: float = SENHA_FILA_TIMEOUT_S,
+    ):
+        self.workers = workers
+        self.fila_max = fila_max
+        self.timeout_fila = timeout_fila
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="senhas")
+        self._lock = threading.Lock()
+        self._pendentes = 0  # na fila + calculando
+
+    def pendentes(self) -> int:
+        return self._pendentes
+
+    def _admitir(self):
+        with self._lock:
+            if self._pendentes >= self.workers + self.fila_max:
+                metricas.incrementar("senhas_rejeitadas_total", motivo="fila_cheia")
+                raise SenhasOcupado()
+            self._pendentes += 1
+
+    def _liberar(self, _futuro=None):
+        with self._lock:
+            self._pendentes -= 1
+
+    def _com_prazo(self, funcao, args, enfileirado_em: float):
+        if time.monotonic() - enfileirado_em > self.timeout_fila:
+            metricas.incrementar("senhas_rejeitadas_total", motivo="timeout_fila")
+            raise SenhasOcupado()
+        return funcao(*args)
+
+    def submeter(self, funcao, *args):
+        """concurrent.futures.Future com o resultado de funcao(*args)."""
+        self._admitir()
+        try:
+            futuro = self._executor.submit(
+                self._com_prazo, funcao, args, time.monotonic()
+            )
+        except BaseException:
+            self._liberar()
+            raise
+        futuro.add_done_callback(self._liberar)
+        return futuro
+
+    async def executar(self, funcao, *args):
+        """Aguarda funcao(*args) no pool sem bloquear o event loop."""
+        return await asyncio.wrap_future(self.submeter(funcao, *args))
+
+
+executor_senhas = ExecutorSenhas()
+
+
+def coletor_senhas():
+    return [
+        (
+            "senhas_pendentes",
+            "gauge",
+            "Pedidos de hash de senha na fila ou calculando",
+            {},
+            executor_senhas.pendentes(),
+        )
+    ]
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from database import engine
+from services.query_detector import normalizar_sql
+from services.request_timing import observadores_sql
+
+logger = logging.getLogger("api.slow_query")
+
+# Statements acima deste tempo (ms) entram no log de consultas lentas
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+# No PostgreSQL, "1" usa EXPLAIN (ANALYZE, BUFFERS), que executa a consulta
+SLOW_QUERY_EXPLAIN_ANALYZE = os.environ.get("SLOW_QUERY_EXPLAIN_ANALYZE") == "1"
+# Quantos formatos de SQL distintos ficam guardados em memória
+SLOW_QUERY_MAX_FORMATOS = 500
+
+
+def formato_parametros(parameters):
+    """Tipos dos parâmetros, sem os valores (ex: ['int', 'str'])."""
+    if isinstance(parameters, dict):
+        return {chave: type(valor).__name__ for chave, valor in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(valor).__name__ for valor in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    """
+    Guarda as consultas lentas agrupadas por formato de SQL. Na primeira
+    ocorrência de cada formato, captura o plano de execução em uma thread
+    separada, fora do caminho da requisição.
+    """
+
+    def __init__(self, engine, limite_ms: float = SLOW_QUERY_MS):
+        self.engine = engine
+        self.limite_ms = limite_ms
+        self._formatos = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="explain"
+        )
+        self._local = threading.local()
+
+    def observar(self, estado, statement, parameters, duracao_ms):
+        if duracao_ms < self.limite_ms:
+            return
+        if getattr(self._local, "explicando", False):
+            return
+
+        formato = normalizar_sql(statement)
+        rota = f"{estado.metodo} {estado.rota}" if estado is not None else None
+        parametros = formato_parametros(parameters)
+
+        logger.warning(
+            json.dumps(
+                {
+                    "duracao_ms": round(duracao_ms, 2),
+                    "rota": rota,
+                    "sql": formato,
+                    "parametros": parametros,
+                }
+            )
+        )
+
+        with self._lock:
+            registro = self._formatos.get(formato)
+            primeira_vez = registro is None
+            if primeira_vez:
+                if len(self._formatos) >= SLOW_QUERY_MAX_FORMATOS:
+                    self._descartar_mais_rapido()
+                registro = self._formatos[formato] = {
+                    "sql": formato,
+                    "parametros": parametros,
+                    "rota": rota,
+                    "ocorrencias": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "ultima_ocorrencia": None,
+                    "plano": None,
+                }
+            registro["ocorrencias"] += 1
+            registro["total_ms"] += duracao_ms
+            registro["max_ms"] = max(registro["max_ms"], duracao_ms)
+            registro["ultima_ocorrencia"] = datetime.now().isoformat()
+            registro["rota"] = rota or registro["rota"]
+
+        if primeira_vez and not isinstance(parameters, list):
+            self._executor.submit(self._capturar_plano, formato, statement, parameters)
+
+    def _descartar_mais_rapido(self):
+        formato = min(self._formatos, key=lambda f: self._formatos[f]["max_ms"])
+        del self._formatos[formato]
+
+    def _comando_explain(self) -> str:
+        if self.engine.dialect.name == "sqlite":
+            return "EXPLAIN QUERY PLAN "
+        if self.engine.dialect.name == "postgresql" and SLOW_QUERY_EXPLAIN_ANALYZE:
+            return "EXPLAIN (ANALYZE, BUFFERS) "
+        return "EXPLAIN "
+
+    def _capturar_plano(self, formato, statement, parameters):
+        comando = self._comando_explain()
+        # ANALYZE executa o statement: só é seguro para leituras
+        leitura = statement.lstrip().upper().startswith("SELECT")
+        if "ANALYZE" in comando and not leitura:
+            comando = "EXPLAIN "
+
+        self._local.explicando = True
+        try:
+            with self.engine.connect() as conn:
+                resultado = conn.exec_driver_sql(comando + statement, parameters)
+                linhas = resultado.fetchall()
+            plano = [" | ".join(str(coluna) for coluna in linha) for linha in linhas]
+        except Exception as e:
+            plano = [f"Erro ao capturar plano: {e}"]
+        finally:
+            self._local.explicando = False
+
+        with self._lock:
+            if formato in self._formatos:
+                self._formatos[formato]["plano"] = plano
+
+    def top(self, limite: int = 20, ordem: str = "total_ms") -> list:
+        """As `limite` consultas mais lentas, ordenadas por total_ms ou max_ms."""
+        with self._lock:
+            registros = [dict(r) for r in self._formatos.values()]
+        registros.sort(key=lambda r: r[ordem], reverse=True)
+        for registro in registros:
+            registro["media_ms"] = registro["total_ms"] / registro["ocorrencias"]
+        return registros[:limite]
+
+    def limpar(self):
+        with self._lock:
+            self._formatos.clear()
+
+
+slow_query_log = SlowQueryLog(engine)
+
+
+def ativar_slow_query_log():
+    """Registra o log de consultas lentas nos eventos de SQL."""
+    if slow_query_log.observar not in observadores_sql:
+        observadores_sql.append(slow_query_log.observar)
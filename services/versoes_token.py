@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from models import Usuario
+from services.metrics import metricas
+
+# Por quanto tempo (segundos) a versão lida de um usuário é reaproveitada.
+# Revogações feitas em outro worker só são vistas após esse intervalo nas
+# rotas comuns; as deste worker valem na hora, e as rotas de admin sempre
+# conferem no banco (auth_routes.verificar_admin).
+AUTH_VERSOES_TTL = float(os.environ.get("AUTH_VERSOES_TTL", "30"))
+
+metricas.descrever(
+    "auth_tokens_revogados_total",
+    "counter",
+    "Tokens recusados por versão antiga ou usuário removido",
+)
+
+
+class VersoesToken:
+    """
+    Versão atual do token de cada usuário, em memória.
+
+    O token carrega a versão do usuário no login (claim "ver"); promover,
+    rebaixar ou remover o usuário incrementa a versão (ou remove o usuário)
+    e os tokens antigos passam a ser recusados sem consultar o banco a cada
+    requisição. Cada usuário ativo custa uma consulta pela chave primária a
+    cada AUTH_VERSOES_TTL segundos; a tabela nunca é lida inteira.
+    """
+
+    def __init__(self, ttl: float = AUTH_VERSOES_TTL):
+        self.ttl = ttl
+        # usuario_id -> (versao, lida_em); versao None: usuário removido
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def versao(self, db: Session, usuario_id: int):
+        """Versão atual do usuário, ou None se ele não existe mais."""
+        entrada = self._versoes.get(usuario_id)
+        if entrada is not None and time.monotonic() - entrada[1] < self.ttl:
+            return entrada[0]
+
+        linha = db.query(Usuario.versao_token).filter(Usuario.id == usuario_id).first()
+        versao = linha[0] if linha else None
+        self.atualizar(usuario_id, versao)
+        return versao
+
+    def valido(self, db: Session, usuario_id: int, versao: int) -> bool:
+        if self.versao(db, usuario_id) == versao:
+            return True
+        metricas.incrementar("auth_tokens_revogados_total")
+        return False
+
+    def atualizar(self, usuario_id: int, versao):
+        """Registra a versão gravada ou lida (None para usuário removido)."""
+        with self._lock:
+            self._versoes[usuario_id] = (versao, time.monotonic())
+
+    def invalidar(self):
+        """Força a releitura de todos os usuários na próxima consulta."""
+        with self._lock:
+            self._versoes = {}
+
+
+versoes_token = VersoesToken()
@@ -0,0 +1,57 @@
+"""
+Controle de admissão por classe de rota (leituras, listagens, escritas,
+exportações).
+
+Execute: python -m pytest test_admissao.py
+"""
+
+import asyncio
+
+from services.admissao import Compartimento, classificar, compartimentos
+
+
+def test_classes_das_rotas():
+    assert classificar("GET", "/auth/me") == "leituras"
+    assert classificar("GET", "/orcamentos/12") == "leituras"
+    assert classificar("GET", "/orcamentos/") == "listagens"
+    assert classificar("GET", "/auditoria/orcamentos/3") == "listagens"
+    assert classificar("GET", "/auditoria/exportar") == "exportacoes"
+    assert classificar("PATCH", "/orcamentos/12/desconto") == "escritas"
+    assert classificar("GET", "/orcamentos/12/eventos") == "isenta"
+    assert classificar("POST", "/auth/login") == "isenta"
+
+
+def test_listagens_saturadas_nao_bloqueiam_leituras(
+    client, admin_headers, monkeypatch
+):
+    listagens = compartimentos["listagens"]
+    monkeypatch.setattr(listagens, "ativas", listagens.concorrencia)
+    monkeypatch.setattr(listagens, "fila", 0)
+
+    recusada = client.get("/orcamentos/", headers=admin_headers)
+    assert recusada.status_code == 503
+    assert recusada.headers["retry-after"] == "1"
+
+    assert client.get("/auth/me", headers=admin_headers).status_code == 200
+
+
+def test_fila_limitada_e_espera_com_prazo():
+    async def cenario():
+        compartimento = Compartimento("teste", concorrencia=1, fila=1)
+        assert await compartimento.entrar(1)
+
+        na_fila = asyncio.ensure_future(compartimento.entrar(1))
+        await asyncio.sleep(0)
+        assert compartimento.esperando() == 1
+        assert not await compartimento.entrar(1)  # fila cheia: recusa na hora
+
+        compartimento.sair()  # a vaga passa direto para quem esperava
+        assert await na_fila
+        assert compartimento.ativas == 1
+
+        assert not await compartimento.entrar(0.01)  # esperou demais
+        assert compartimento.esperando() == 0
+        compartimento.sair()
+        assert compartimento.ativas == 0
+
+    asyncio.run(cenario())
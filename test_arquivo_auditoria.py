@@ -0,0 +1,103 @@
+"""
+Arquivo da auditoria: eventos antigos em segmentos gzip NDJSON, lidos de
+forma transparente pelas listagens e pela reconstrução.
+
+Execute: python -m pytest test_arquivo_auditoria.py
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from services import arquivo_auditoria
+
+ATRASO = timedelta(days=400)
+
+
+def envelhecer_e_arquivar(orcamento_id):
+    """Joga os eventos do orçamento 400 dias para trás e arquiva (> 365 dias)."""
+    from database import SessionLocal
+    from models import HistoricoAuditoria
+
+    db = SessionLocal()
+    try:
+        for evento in db.query(HistoricoAuditoria).filter(
+            HistoricoAuditoria.orcamento_id == orcamento_id
+        ):
+            evento.data_alteracao = evento.data_alteracao - ATRASO
+        db.commit()
+        resultado = arquivo_auditoria.arquivar_auditoria(
+            db, {"dias": 365}, lambda p: None
+        )
+        restantes = (
+            db.query(HistoricoAuditoria)
+            .filter(HistoricoAuditoria.orcamento_id == orcamento_id)
+            .count()
+        )
+    finally:
+        db.close()
+    return resultado, restantes
+
+
+def test_listagens_e_reconstrucao_leem_o_arquivo(
+    client, admin_headers, orcamento_rascunho
+):
+    h = admin_headers
+    orcamento_id = orcamento_rascunho["id"]
+    item_id = orcamento_rascunho["itens"][0]["id"]
+    url_item = f"/orcamentos/{orcamento_id}/itens/{item_id}"
+
+    inicio = datetime.now(timezone.utc)
+    instantes = []
+    for horas in (11, 12, 13):
+        client.patch(url_item, json={"horas_estimadas": str(horas)}, headers=h)
+        instantes.append(datetime.now(timezone.utc))
+
+    resultado, restantes = envelhecer_e_arquivar(orcamento_id)
+    assert resultado["eventos"] >= 3
+    assert restantes == 0
+    assert any(
+        nome.endswith(".ndjson.gz")
+        for nome in os.listdir(arquivo_auditoria.AUDITORIA_ARQUIVO_DIR)
+    )
+
+    # Evento novo fica na tabela e vem antes dos arquivados
+    client.patch(url_item, json={"horas_estimadas": "14"}, headers=h)
+
+    def valores(url, **params):
+        resposta = client.get(url, params=params, headers=h)
+        assert resposta.status_code == 200, resposta.text
+        dados = resposta.json()
+        itens = dados["itens"] if isinstance(dados, dict) else dados
+        return [r["valor_novo"] for r in itens]
+
+    todos = ["14.0000", "13.0000", "12.0000", "11.0000"]
+    assert valores(f"/auditoria/orcamentos/{orcamento_id}") == todos
+    assert valores(f"/auditoria/orcamentos/{orcamento_id}", skip=2, limit=1) == [
+        "12.0000"
+    ]
+    assert valores(f"/auditoria/itens/{item_id}", skip=1) == todos[1:]
+
+    periodo = {
+        "de": (inicio - ATRASO).isoformat(),
+        "ate": (instantes[-1] - ATRASO).isoformat(),
+        "limit": 2,
+    }
+    pagina = client.get("/auditoria", params=periodo, headers=h).json()
+    assert [r["valor_novo"] for r in pagina["itens"]] == todos[1:3]
+    seguinte = client.get(
+        "/auditoria", params={**periodo, "cursor": pagina["proximo"]}, headers=h
+    ).json()
+    assert [r["valor_novo"] for r in seguinte["itens"]] == todos[3:]
+    assert seguinte["proximo"] is None
+
+    # Reconstrução antes do último evento arquivado
+    resposta = client.get(
+        f"/auditoria/orcamentos/{orcamento_id}/estado",
+        params={"em": (instantes[0] - ATRASO).isoformat()},
+        headers=h,
+    )
+    assert resposta.status_code == 200, resposta.text
+    horas = {
+        i["item_orcamento_id"]: i["horas_estimadas"] for i in resposta.json()["itens"]
+    }
+    assert float(horas[item_id]) == 11
@@ -0,0 +1,82 @@
+"""
+Listagem da auditoria com filtros e paginação por cursor (GET /auditoria).
+
+Execute: python -m pytest test_auditoria.py
+"""
+
+from datetime import datetime, timezone
+
+
+def alterar_horas(client, headers, orcamento, horas):
+    item = orcamento["itens"][0]
+    resposta = client.patch(
+        f"/orcamentos/{orcamento['id']}/itens/{item['id']}",
+        json={"horas_estimadas": str(horas)},
+        headers=headers,
+    )
+    assert resposta.status_code == 200, resposta.text
+
+
+def paginas(client, headers, params):
+    cursor = None
+    while True:
+        resposta = client.get(
+            "/auditoria",
+            params={**params, **({"cursor": cursor} if cursor else {})},
+            headers=headers,
+        )
+        assert resposta.status_code == 200, resposta.text
+        dados = resposta.json()
+        yield dados["itens"]
+        cursor = dados["proximo"]
+        if cursor is None:
+            return
+
+
+def test_percorre_paginas_sem_repetir(client, admin_headers, orcamento_rascunho):
+    inicio = datetime.now(timezone.utc)
+    for horas in range(11, 16):
+        alterar_horas(client, admin_headers, orcamento_rascunho, horas)
+
+    lidas = list(
+        paginas(
+            client,
+            admin_headers,
+            {"de": inicio.isoformat(), "tipo": "HORAS_ITEM", "limit": 2},
+        )
+    )
+
+    assert [len(p) for p in lidas] == [2, 2, 1]
+    registros = [r for p in lidas for r in p]
+    assert [r["valor_novo"] for r in registros] == [
+        f"{h}.0000" for h in range(15, 10, -1)
+    ]
+    datas = [datetime.fromisoformat(r["data_alteracao"]) for r in registros]
+    assert all(d.tzinfo is not None for d in datas)
+    assert datas == sorted(datas, reverse=True)
+
+
+def test_filtra_por_usuario_e_periodo(client, admin_headers, orcamento_rascunho):
+    inicio = datetime.now(timezone.utc)
+    alterar_horas(client, admin_headers, orcamento_rascunho, 12)
+    meio = datetime.now(timezone.utc)
+    alterar_horas(client, admin_headers, orcamento_rascunho, 13)
+
+    def listar(**params):
+        resposta = client.get("/auditoria", params=params, headers=admin_headers)
+        assert resposta.status_code == 200, resposta.text
+        return [r["valor_novo"] for r in resposta.json()["itens"]]
+
+    assert listar(de=inicio.isoformat(), ate=meio.isoformat()) == ["12.0000"]
+    assert listar(de=meio.isoformat()) == ["13.0000"]
+    # Data sem fuso é UTC
+    assert listar(de=meio.replace(tzinfo=None).isoformat()) == ["13.0000"]
+    assert listar(de=inicio.isoformat(), usuario_id=999999) == []
+    assert listar(de=inicio.isoformat(), tipo="DESCONTO_ORCAMENTO") == []
+
+
+def test_cursor_invalido(client, admin_headers):
+    resposta = client.get(
+        "/auditoria", params={"cursor": "nao-e-cursor"}, headers=admin_headers
+    )
+    assert resposta.status_code == 400
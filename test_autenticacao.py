@@ -0,0 +1,123 @@
+"""
+Autenticação sem consultar usuários: claims no token, cache de tokens
+verificados e revogação por versão do token.
+
+Execute: python -m pytest test_autenticacao.py
+"""
+
+import time
+import uuid
+
+from services.cache_autenticacao import CacheAutenticacao
+
+
+def _login(client, username, password="s3nha"):
+    dados = client.post(
+        "/auth/login", json={"username": username, "password": password}
+    ).json()
+    return dados["usuario"]["id"], {
+        "Authorization": f"Bearer {dados['access_token']}"
+    }
+
+
+def _novo_usuario(client):
+    username = f"sessao_{uuid.uuid4().hex[:8]}"
+    client.post("/auth/registro", json={"username": username, "password": "s3nha"})
+    return (username, *_login(client, username))
+
+
+def test_rotas_protegidas_nao_consultam_usuarios(
+    client, admin_headers, limite_consultas
+):
+    client.get("/clientes/", headers=admin_headers)
+
+    with limite_consultas(5) as contador:
+        resposta = client.get("/clientes/", headers=admin_headers)
+    assert resposta.status_code == 200
+    assert not any("usuarios" in sql for sql in contador.formatos)
+
+    # Rotas de admin conferem versão e flag em uma linha, pela chave primária
+    client.get("/auth/consultas-lentas", headers=admin_headers)
+    with limite_consultas(1) as contador:
+        resposta = client.get("/auth/consultas-lentas", headers=admin_headers)
+    assert resposta.status_code == 200
+    assert all("usuarios" in sql for sql in contador.formatos)
+
+    _, _, headers = _novo_usuario(client)
+    me = client.get("/auth/me", headers=headers).json()
+    assert me["admin"] == 0 and me["username"].startswith("sessao_")
+
+
+def test_mudanca_de_privilegio_revoga_tokens(client, admin_headers):
+    username, usuario_id, headers = _novo_usuario(client)
+    assert client.get("/auth/usuarios", headers=headers).status_code == 403
+
+    client.post(f"/auth/usuarios/{usuario_id}/promote", headers=admin_headers)
+    assert client.get("/auth/usuarios", headers=headers).status_code == 401
+    _, headers = _login(client, username)
+    assert client.get("/auth/usuarios", headers=headers).status_code == 200
+
+    client.post(f"/auth/usuarios/{usuario_id}/demote", headers=admin_headers)
+    assert client.get("/auth/usuarios", headers=headers).status_code == 401
+    _, headers = _login(client, username)
+    assert client.get("/auth/usuarios", headers=headers).status_code == 403
+
+    client.delete(f"/auth/usuarios/{usuario_id}", headers=admin_headers)
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_revogacao_de_outro_worker_vale_apos_recarga(client, admin_headers):
+    from database import SessionLocal
+    from models import Usuario
+    from services.versoes_token import versoes_token
+
+    _, usuario_id, headers = _novo_usuario(client)
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    db = SessionLocal()  # outro worker promovendo o usuário
+    try:
+        db.query(Usuario).filter(Usuario.id == usuario_id).update(
+            {Usuario.admin: 1, Usuario.versao_token: Usuario.versao_token + 1}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    versoes_token.invalidar()  # o mesmo que esperar AUTH_VERSOES_TTL
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_admin_rebaixado_em_outro_worker_perde_acesso_na_hora(client):
+    from database import SessionLocal
+    from models import Usuario
+
+    username, usuario_id, _ = _novo_usuario(client)
+    db = SessionLocal()
+    try:
+        db.query(Usuario).filter(Usuario.id == usuario_id).update({Usuario.admin: 1})
+        db.commit()
+        _, headers = _login(client, username)
+        assert client.get("/auth/usuarios", headers=headers).status_code == 200
+
+        # Outro worker rebaixa: este não recebe versoes_token.atualizar()
+        db.query(Usuario).filter(Usuario.id == usuario_id).update(
+            {Usuario.admin: 0, Usuario.versao_token: Usuario.versao_token + 1}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    assert client.get("/auth/usuarios", headers=headers).status_code == 401
+
+
+def test_cache_respeita_exp_e_limite():
+    cache = CacheAutenticacao(maximo=2)
+
+    cache.guardar(b"vencido", {"sub": "u", "exp": time.time() - 1})
+    assert cache.obter(b"vencido") is None
+    assert len(cache) == 0
+
+    for digest in (b"a", b"b", b"c"):
+        cache.guardar(digest, {"sub": digest.decode(), "exp": time.time() + 60})
+    assert cache.obter(b"a") is None  # o mais antigo saiu
+    assert cache.obter(b"c")["sub"] == "c"
@@ -0,0 +1,108 @@
+"""
+Cache das listagens de cadastro, invalidado pela versão das tabelas.
+
+Execute: python -m pytest test_cache_consultas.py
+"""
+
+import uuid
+
+from database import SessionLocal
+from models import Cliente, Orcamento, ServicosCatalogo
+from services.cache_consultas import CacheConsultas, cache_consultas, versoes
+from services.catalogo_cache import catalogo_cache
+from services.orcamento_service import recalculate_orcamento
+
+
+def test_lru_respeita_orcamento_em_bytes():
+    cache = CacheConsultas(maximo_bytes=10)
+    cache.guardar("a", b"1234")
+    cache.guardar("b", b"1234")
+    assert cache.obter("a") == b"1234"  # "a" passa a ser a mais recente
+
+    cache.guardar("c", b"1234")  # 12 bytes: sai a menos usada, "b"
+    assert cache.obter("b") is None
+    assert cache.obter("a") == b"1234"
+    assert cache.bytes == 8 and len(cache) == 2
+
+    cache.guardar("grande", b"x" * 11)  # maior que o orçamento: não guarda
+    assert cache.obter("grande") is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_escrita_invalida_listagem_em_cache(client, admin_headers):
+    params = {"limit": 1000}
+    antes = client.get("/clientes/", params=params, headers=admin_headers).json()
+
+    hits = cache_consultas.hits
+    repetida = client.get("/clientes/", params=params, headers=admin_headers)
+    assert repetida.json() == antes
+    assert cache_consultas.hits == hits + 1
+
+    cnpj = uuid.uuid4().hex[:14]
+    client.post(
+        "/clientes/",
+        json={"razao_social": "Cliente novo", "cnpj": cnpj},
+        headers=admin_headers,
+    )
+    depois = client.get("/clientes/", params=params, headers=admin_headers).json()
+    assert cnpj in {c["cnpj"] for c in depois}
+    assert len(depois) == len(antes) + 1
+
+
+def test_versao_muda_no_commit_de_qualquer_sessao(client, admin_headers):
+    client.get("/clientes/", headers=admin_headers)  # popula o cache
+
+    db = SessionLocal()
+    try:
+        (versao,) = versoes(db, ("clientes",))
+
+        # Escrita desfeita: a versão não muda
+        db.add(Cliente(razao_social="Desfeito", cnpj=uuid.uuid4().hex[:14]))
+        db.flush()
+        db.rollback()
+        assert versoes(db, ("clientes",)) == (versao,)
+
+        # Escrita confirmada fora das rotas (outro worker, um script...)
+        cliente = db.query(Cliente).first()
+        cliente.razao_social = f"Renomeado {uuid.uuid4().hex[:6]}"
+        db.commit()
+        assert versoes(db, ("clientes",)) == (versao + 1,)
+        nome, cliente_id = cliente.razao_social, cliente.id
+    finally:
+        db.close()
+
+    lista = client.get("/clientes/", headers=admin_headers).json()
+    assert {"id": cliente_id, "razao_social": nome}.items() <= next(
+        c for c in lista if c["id"] == cliente_id
+    ).items()
+
+    metricas = client.get("/metrics").text
+    assert 'cache_hit_ratio{cache="consultas"}' in metricas
+    assert 'cache_bytes{cache="consultas"}' in metricas
+
+
+def test_preco_do_catalogo_alterado_em_outro_worker(client, orcamento_rascunho):
+    atividade_id = orcamento_rascunho["itens"][0]["atividade_id"]
+
+    def recalcular():
+        db = SessionLocal()  # uma requisição
+        try:
+            orcamento = db.get(Orcamento, orcamento_rascunho["id"])
+            recalculate_orcamento(db, orcamento)
+            return orcamento.valor_total_bruto
+        finally:
+            db.close()
+
+    antes = recalcular()  # carrega o catálogo no cache
+
+    # Outro worker altera a complexidade: só a versão da tabela avisa este
+    outra = SessionLocal()
+    try:
+        outra.get(ServicosCatalogo, atividade_id).complexidade_ust = 5
+        outra.commit()
+    finally:
+        outra.close()
+
+    misses = catalogo_cache.misses
+    assert recalcular() > antes
+    assert catalogo_cache.misses == misses + 1
@@ -0,0 +1,110 @@
+"""
+Change feed (GET /changes) alimentado pelas rotas de escrita.
+
+Execute: python -m pytest test_change_feed.py
+"""
+
+from services import change_feed
+
+
+def cursor(client, headers):
+    return client.get("/changes", headers=headers).json()["cursor"]
+
+
+def test_escritas_aparecem_no_feed(client, admin_headers, orcamento_rascunho):
+    inicio = cursor(client, admin_headers)
+    orcamento_id = orcamento_rascunho["id"]
+
+    cliente = client.post(
+        "/clientes/",
+        json={"razao_social": "Feed", "cnpj": f"feed-{inicio}"},
+        headers=admin_headers,
+    ).json()
+    # Leitura sem mudança de valores não gera alteração
+    client.get(f"/orcamentos/{orcamento_id}", headers=admin_headers)
+    resposta = client.patch(
+        f"/orcamentos/{orcamento_id}/desconto",
+        json={"desconto_percentual": "5"},
+        headers=admin_headers,
+    )
+    client.patch(
+        f"/orcamentos/{orcamento_id}/desconto",
+        json={"desconto_percentual": "7"},
+        headers=admin_headers,
+    )
+    etag = client.get(f"/orcamentos/{orcamento_id}", headers=admin_headers).headers[
+        "etag"
+    ]
+
+    feed = client.get(f"/changes?since={inicio}", headers=admin_headers).json()
+    assert ["clientes", cliente["id"], "insert", feed["alteracoes"][0][3]] in feed[
+        "alteracoes"
+    ]
+    # Só a alteração mais recente do orçamento, com a versão do ETag
+    do_orcamento = [a for a in feed["alteracoes"] if a[:2] == ["orcamentos", orcamento_id]]
+    assert do_orcamento == [["orcamentos", orcamento_id, "update", int(etag.strip('"'))]]
+    assert resposta.status_code == 200
+    assert feed["mais"] is False
+
+    vazio = client.get(f"/changes?since={feed['cursor']}", headers=admin_headers)
+    assert vazio.json() == {"cursor": feed["cursor"], "mais": False, "alteracoes": []}
+
+
+def test_paginacao(client, admin_headers):
+    inicio = cursor(client, admin_headers)
+    for n in range(3):
+        client.post(
+            "/clientes/",
+            json={"razao_social": "Página", "cnpj": f"pag-{inicio}-{n}"},
+            headers=admin_headers,
+        )
+
+    pagina = client.get(f"/changes?since={inicio}&limit=2", headers=admin_headers)
+    assert pagina.json()["mais"] is True
+    assert len(pagina.json()["alteracoes"]) == 2
+    resto = client.get(
+        f"/changes?since={pagina.json()['cursor']}&limit=2", headers=admin_headers
+    ).json()
+    assert resto["mais"] is False
+    assert len(resto["alteracoes"]) == 1
+
+
+def test_compactacao_e_retencao(client, admin_headers, monkeypatch):
+    from database import SessionLocal
+    from models import Alteracao
+
+    inicio = cursor(client, admin_headers)
+    novo = client.post(
+        "/clientes/",
+        json={"razao_social": "Compacta", "cnpj": f"comp-{inicio}"},
+        headers=admin_headers,
+    ).json()
+    for nome in ("Compacta 2", "Compacta 3"):
+        client.put(
+            f"/clientes/{novo['id']}",
+            json={"razao_social": nome, "cnpj": novo["cnpj"]},
+            headers=admin_headers,
+        )
+
+    db = SessionLocal()
+    try:
+        change_feed.compactar_alteracoes(db)
+        restantes = (
+            db.query(Alteracao)
+            .filter(Alteracao.entidade == "clientes", Alteracao.entidade_id == novo["id"])
+            .all()
+        )
+        assert [a.operacao for a in restantes] == ["update"]
+
+        monkeypatch.setattr(change_feed, "ALTERACOES_RETENCAO_S", -1)
+        assert change_feed.compactar_alteracoes(db)["expiradas"] > 0
+    finally:
+        db.close()
+
+    assert (
+        client.get(f"/changes?since={inicio}", headers=admin_headers).status_code
+        == 410
+    )
+    assert client.get(
+        f"/changes?since={cursor(client, admin_headers)}", headers=admin_headers
+    ).status_code == 200
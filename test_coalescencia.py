@@ -0,0 +1,101 @@
+"""
+Coalescência de GETs idênticos simultâneos (single flight).
+
+Execute: python -m pytest test_coalescencia.py
+"""
+
+import asyncio
+
+import httpx
+
+from services.coalescencia import SingleFlightMiddleware
+
+
+def _app_contador(status=200):
+    """App ASGI lenta que conta quantas vezes executou."""
+    execucoes = []
+
+    async def app(scope, receive, send):
+        execucoes.append(scope["query_string"])
+        await asyncio.sleep(0.05)
+        corpo = f"execucao {len(execucoes)}".encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-length", str(len(corpo)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": corpo})
+
+    return app, execucoes
+
+
+def _niveis(authorization):
+    return {b"Bearer admin": "admin", b"Bearer usuario": "usuario"}.get(
+        authorization
+    )
+
+
+def _disparar(app, requisicoes):
+    async def cenario():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transporte, base_url="http://teste"
+        ) as client:
+            return await asyncio.gather(
+                *(
+                    client.get(url, headers={"Authorization": token})
+                    for url, token in requisicoes
+                )
+            )
+
+    return asyncio.run(cenario())
+
+
+def test_get_identicos_executam_uma_vez():
+    app, execucoes = _app_contador()
+    middleware = SingleFlightMiddleware(
+        app, prefixos=("/catalogo",), nivel_acesso=_niveis
+    )
+
+    respostas = _disparar(
+        middleware,
+        [("/catalogo/?tipo=ATIVIDADE&ativo=1", "Bearer usuario")] * 5
+        + [("/catalogo/?ativo=1&tipo=ATIVIDADE", "Bearer usuario")] * 5,
+    )
+
+    assert len(execucoes) == 1
+    assert {r.text for r in respostas} == {"execucao 1"}
+    assert middleware.em_voo() == 0  # nada fica guardado depois
+
+
+def test_nivel_de_acesso_separa_e_sem_credencial_nao_coalesce():
+    app, execucoes = _app_contador()
+    middleware = SingleFlightMiddleware(
+        app, prefixos=("/catalogo",), nivel_acesso=_niveis
+    )
+
+    _disparar(
+        middleware,
+        [("/catalogo/", "Bearer usuario")] * 3
+        + [("/catalogo/", "Bearer admin")] * 3
+        + [("/catalogo/", "Bearer invalido")] * 2,
+    )
+
+    assert len(execucoes) == 2 + 2  # um por nível + cada inválido
+
+
+def test_erro_da_lider_nao_e_compartilhado():
+    app, execucoes = _app_contador(status=500)
+    middleware = SingleFlightMiddleware(app, prefixos=("/catalogo",))
+
+    _disparar(middleware, [("/catalogo/", "")] * 3)
+
+    assert len(execucoes) == 3
+
+
+def test_listagem_de_cadastro_exige_token_valido(client, admin_headers):
+    invalido = {"Authorization": "Bearer nao-e-um-jwt"}
+    assert client.get("/catalogo/", headers=invalido).status_code == 401
+    assert client.get("/catalogo/", headers=admin_headers).status_code == 200
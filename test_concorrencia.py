@@ -0,0 +1,56 @@
+"""
+Concorrência otimista em orçamentos (row_version, ETag e If-Match).
+
+Execute: python -m pytest test_concorrencia.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+
+def test_if_match_desatualizado_retorna_412(client, admin_headers, orcamento_rascunho):
+    caminho = f"/orcamentos/{orcamento_rascunho['id']}"
+    etag = client.get(caminho, headers=admin_headers).headers["etag"]
+    item = orcamento_rascunho["itens"][0]
+
+    resposta = client.patch(
+        f"{caminho}/itens/{item['id']}",
+        json={"horas_estimadas": "7"},
+        headers={**admin_headers, "If-Match": etag},
+    )
+    assert resposta.status_code == 200
+    assert resposta.headers["etag"] != etag
+
+    # Segunda edição com o ETag antigo: alguém já alterou o orçamento
+    resposta = client.patch(
+        f"{caminho}/desconto",
+        json={"desconto_percentual": "10"},
+        headers={**admin_headers, "If-Match": etag},
+    )
+    assert resposta.status_code == 412
+
+
+def test_patches_concorrentes_mantem_totais(client, admin_headers, orcamento_rascunho):
+    caminho = f"/orcamentos/{orcamento_rascunho['id']}"
+    itens = orcamento_rascunho["itens"]
+    horas = {item["id"]: Decimal(10 + n) for n, item in enumerate(itens)}
+
+    def alterar(item_id):
+        # Quem perde a corrida recebe 409 e tenta de novo, como o frontend faria
+        while True:
+            resposta = client.patch(
+                f"{caminho}/itens/{item_id}",
+                json={"horas_estimadas": str(horas[item_id])},
+                headers=admin_headers,
+            )
+            if resposta.status_code != 409:
+                return resposta.status_code
+
+    with ThreadPoolExecutor(max_workers=len(itens)) as executor:
+        for _ in range(5):
+            assert set(executor.map(alterar, horas)) == {200}
+
+    orcamento = client.get(caminho, headers=admin_headers).json()
+    soma_itens = sum(Decimal(i["subtotal_bruto"]) for i in orcamento["itens"])
+    assert Decimal(orcamento["valor_total_bruto"]) == soma_itens
+    assert {i["id"]: Decimal(i["horas_estimadas"]) for i in orcamento["itens"]} == horas
@@ -0,0 +1,101 @@
+"""
+Orçamento de consultas SQL por endpoint.
+
+Execute: python -m pytest test_consultas.py
+"""
+
+
+def test_obter_orcamento(client, admin_headers, orcamento_rascunho, limite_consultas):
+    with limite_consultas(8):
+        resposta = client.get(
+            f"/orcamentos/{orcamento_rascunho['id']}", headers=admin_headers
+        )
+    assert resposta.status_code == 200
+
+
+def test_atualizar_horas_item(
+    client, admin_headers, orcamento_rascunho, limite_consultas
+):
+    item = orcamento_rascunho["itens"][0]
+    with limite_consultas(12):
+        resposta = client.patch(
+            f"/orcamentos/{orcamento_rascunho['id']}/itens/{item['id']}",
+            json={"horas_estimadas": "5"},
+            headers=admin_headers,
+        )
+    assert resposta.status_code == 200
+
+
+def test_listar_catalogo(client, admin_headers, limite_consultas):
+    with limite_consultas(2):
+        resposta = client.get("/catalogo/?tipo=ATIVIDADE", headers=admin_headers)
+    assert resposta.status_code == 200
+
+
+def test_listar_clientes(client, admin_headers, limite_consultas):
+    with limite_consultas(2):
+        resposta = client.get("/clientes/", headers=admin_headers)
+    assert resposta.status_code == 200
+
+
+def test_listar_auditoria(client, admin_headers, orcamento_rascunho, limite_consultas):
+    with limite_consultas(2):
+        resposta = client.get(
+            f"/auditoria/orcamentos/{orcamento_rascunho['id']}", headers=admin_headers
+        )
+    assert resposta.status_code == 200
+
+
+def test_exportar_auditoria(
+    client, admin_headers, orcamento_rascunho, limite_consultas
+):
+    item = orcamento_rascunho["itens"][0]
+    for horas in range(11, 21):
+        client.patch(
+            f"/orcamentos/{orcamento_rascunho['id']}/itens/{item['id']}",
+            json={"horas_estimadas": str(horas)},
+            headers=admin_headers,
+        )
+    # Nomes de usuário e orçamento vêm no mesmo SELECT, não por linha
+    with limite_consultas(3, repeticoes=1):
+        resposta = client.get(
+            "/auditoria/exportar",
+            params={"orcamento_id": orcamento_rascunho["id"]},
+            headers=admin_headers,
+        )
+    assert resposta.status_code == 200
+    assert len(resposta.text.splitlines()) == 11
+
+
+def test_listar_orcamentos(client, admin_headers, orcamento_rascunho, limite_consultas):
+    # Mais rascunhos no mesmo contrato: a listagem recalcula todos
+    corpo = {
+        "contrato_id": orcamento_rascunho["contrato_id"],
+        "projeto_id": orcamento_rascunho["projeto_id"],
+        "itens": [
+            {"atividade_id": item["atividade_id"], "horas_estimadas": "10"}
+            for item in orcamento_rascunho["itens"]
+        ],
+    }
+    for _ in range(4):
+        client.post("/orcamentos/", json=corpo, headers=admin_headers)
+    # Preço novo no catálogo: o recálculo altera itens e totais
+    client.put(
+        f"/catalogo/{orcamento_rascunho['itens'][0]['atividade_id']}",
+        json={"complexidade_ust": "3.0000"},
+        headers=admin_headers,
+    )
+
+    params = {"contrato_id": orcamento_rascunho["contrato_id"]}
+
+    # Primeira listagem grava os valores novos: um UPDATE por rascunho
+    # alterado (row_version impede o executemany), o resto em lote
+    with limite_consultas(12, repeticoes=5):
+        resposta = client.get("/orcamentos/", params=params, headers=admin_headers)
+    assert resposta.status_code == 200
+    assert len(resposta.json()) == 5
+
+    # Nada mudou: orçamentos, itens e versão do catálogo, sem nada por linha
+    with limite_consultas(3, repeticoes=1):
+        resposta = client.get("/orcamentos/", params=params, headers=admin_headers)
+    assert resposta.status_code == 200
@@ -0,0 +1,119 @@
+"""
+Eventos de orçamento por SSE (GET /orcamentos/{id}/eventos).
+
+Execute: python -m pytest test_eventos.py
+"""
+
+import asyncio
+import json
+
+from services import eventos
+
+
+def ler_evento(corpo: bytes):
+    linhas = dict(
+        linha.split(": ", 1) for linha in corpo.decode().strip().splitlines()
+    )
+    return linhas["event"], json.loads(linhas["data"])
+
+
+def test_stream_de_orcamento_inexistente(client, admin_headers):
+    resposta = client.get("/orcamentos/999999/eventos", headers=admin_headers)
+    assert resposta.status_code == 404
+
+
+def test_alteracao_e_publicada_no_commit(client, admin_headers, orcamento_rascunho):
+    orcamento_id = orcamento_rascunho["id"]
+    item = orcamento_rascunho["itens"][0]
+
+    async def cenario():
+        stream = eventos.transmitir(orcamento_id)
+        try:
+            snapshot = ler_evento(await stream.__anext__())
+            await asyncio.to_thread(
+                client.patch,
+                f"/orcamentos/{orcamento_id}/itens/{item['id']}",
+                json={"horas_estimadas": "20"},
+                headers=admin_headers,
+            )
+            alteracao = ler_evento(await asyncio.wait_for(stream.__anext__(), 5))
+        finally:
+            await stream.aclose()
+        return snapshot, alteracao
+
+    (tipo, snapshot), (tipo_alteracao, alteracao) = asyncio.run(cenario())
+
+    assert tipo == eventos.SNAPSHOT
+    assert len(snapshot["itens"]) == 3
+    assert tipo_alteracao == eventos.ALTERACAO
+    assert alteracao["row_version"] > snapshot["row_version"]
+    assert [i["id"] for i in alteracao["itens"]] == [item["id"]]
+    assert alteracao["valor_total_bruto"] != snapshot["valor_total_bruto"]
+    assert eventos.barramento.total_assinantes() == 0
+
+
+def test_polling_entrega_commit_de_outro_worker(client, orcamento_rascunho):
+    from sqlalchemy.orm import sessionmaker
+
+    from database import engine
+    from models import Orcamento
+    from services.change_feed import ativar_change_feed
+
+    # Sessões sem os eventos deste processo: simulam outro worker
+    OutroWorker = sessionmaker(bind=engine)
+    ativar_change_feed(OutroWorker)
+    orcamento_id = orcamento_rascunho["id"]
+    polling = eventos.DistribuidorPolling()
+
+    async def cenario():
+        assinante = eventos.barramento.assinar(orcamento_id)
+        try:
+            polling.verificar()  # posiciona o cursor
+            db = OutroWorker()
+            try:
+                db.get(Orcamento, orcamento_id).observacoes = "outro worker"
+                db.commit()
+            finally:
+                db.close()
+            await asyncio.to_thread(polling.verificar)
+            return await asyncio.wait_for(assinante.fila.get(), 5)
+        finally:
+            eventos.barramento.cancelar(assinante)
+
+    versao, corpo = asyncio.run(cenario())
+    tipo, dados = ler_evento(corpo)
+    assert tipo == eventos.SNAPSHOT
+    assert versao == dados["row_version"] == orcamento_rascunho["row_version"] + 1
+
+
+def test_fila_cheia_vira_recarregar(monkeypatch):
+    monkeypatch.setattr(eventos, "EVENTOS_FILA_MAX", 2)
+
+    async def cenario():
+        assinante = eventos.Assinante(1, asyncio.get_running_loop())
+        for versao in range(1, 6):
+            assinante.entregar(versao, b"x")
+        itens = []
+        while not assinante.fila.empty():
+            itens.append(assinante.fila.get_nowait())
+        return itens
+
+    itens = asyncio.run(cenario())
+    assert len(itens) == 2
+    assert itens[0][0] is None and b"event: recarregar" in itens[0][1]
+    assert itens[1][0] == 5
+
+
+def test_limite_de_assinantes():
+    barramento = eventos.BarramentoEventos(max_assinantes=1)
+
+    async def cenario():
+        barramento.assinar(1)
+        try:
+            barramento.assinar(2)
+        except eventos.LimiteAssinantes:
+            return True
+        return False
+
+    assert asyncio.run(cenario())
+    assert barramento.lotado()
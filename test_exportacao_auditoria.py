@@ -0,0 +1,115 @@
+"""
+Exportação da auditoria em streaming (GET /auditoria/exportar).
+
+Execute: python -m pytest test_exportacao_auditoria.py
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from services import arquivo_auditoria, exportacao_auditoria
+
+
+def alterar_horas(client, headers, orcamento, horas):
+    item = orcamento["itens"][0]
+    resposta = client.patch(
+        f"/orcamentos/{orcamento['id']}/itens/{item['id']}",
+        json={"horas_estimadas": str(horas)},
+        headers=headers,
+    )
+    assert resposta.status_code == 200, resposta.text
+
+
+def exportar(client, headers, **params):
+    resposta = client.get("/auditoria/exportar", params=params, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    return resposta
+
+
+def test_csv_por_orcamento_com_nome_do_usuario(
+    client, admin_headers, orcamento_rascunho
+):
+    for horas in (11, 12, 13):
+        alterar_horas(client, admin_headers, orcamento_rascunho, horas)
+
+    resposta = exportar(
+        client, admin_headers, formato="csv", orcamento_id=orcamento_rascunho["id"]
+    )
+    assert resposta.headers["content-type"].startswith("text/csv")
+    linhas = list(csv.DictReader(io.StringIO(resposta.text)))
+
+    assert [l["valor_novo"] for l in linhas] == ["11.0000", "12.0000", "13.0000"]
+    assert {l["usuario"] for l in linhas} == {"admin"}
+    assert {l["contrato_id"] for l in linhas} == {
+        str(orcamento_rascunho["contrato_id"])
+    }
+    assert {l["numero_orcamento"] for l in linhas} == {
+        orcamento_rascunho["numero_orcamento"]
+    }
+
+
+def test_ndjson_por_contrato_inclui_arquivados(
+    client, admin_headers, orcamento_rascunho, monkeypatch
+):
+    from database import SessionLocal
+    from models import HistoricoAuditoria
+
+    orcamento_id = orcamento_rascunho["id"]
+    alterar_horas(client, admin_headers, orcamento_rascunho, 11)
+    alterar_horas(client, admin_headers, orcamento_rascunho, 12)
+
+    # Os dois primeiros eventos vão para o arquivo
+    db = SessionLocal()
+    try:
+        for evento in db.query(HistoricoAuditoria).filter(
+            HistoricoAuditoria.orcamento_id == orcamento_id
+        ):
+            evento.data_alteracao -= timedelta(days=400)
+        db.commit()
+        arquivo_auditoria.arquivar_auditoria(db, {"dias": 365}, lambda p: None)
+    finally:
+        db.close()
+    alterar_horas(client, admin_headers, orcamento_rascunho, 13)
+
+    # Lotes pequenos: a resposta sai em vários blocos
+    monkeypatch.setattr(exportacao_auditoria, "AUDITORIA_EXPORTACAO_LOTE", 1)
+    resposta = exportar(
+        client,
+        admin_headers,
+        formato="ndjson",
+        contrato_id=orcamento_rascunho["contrato_id"],
+    )
+    linhas = [json.loads(l) for l in resposta.text.splitlines()]
+
+    assert [l["valor_novo"] for l in linhas] == ["11.0000", "12.0000", "13.0000"]
+    assert all(l["usuario"] == "admin" for l in linhas)
+    assert all(l["orcamento_id"] == orcamento_id for l in linhas)
+
+
+def test_filtro_por_periodo_e_usuario(client, admin_headers, orcamento_rascunho):
+    alterar_horas(client, admin_headers, orcamento_rascunho, 11)
+    meio = datetime.now(timezone.utc)
+    alterar_horas(client, admin_headers, orcamento_rascunho, 12)
+
+    def valores(**params):
+        resposta = exportar(
+            client,
+            admin_headers,
+            formato="ndjson",
+            orcamento_id=orcamento_rascunho["id"],
+            **params,
+        )
+        return [json.loads(l)["valor_novo"] for l in resposta.text.splitlines()]
+
+    assert valores(ate=meio.isoformat()) == ["11.0000"]
+    assert valores(de=meio.isoformat()) == ["12.0000"]
+    assert valores(usuario_id=999999) == []
+
+
+def test_formato_invalido(client, admin_headers):
+    resposta = client.get(
+        "/auditoria/exportar", params={"formato": "xml"}, headers=admin_headers
+    )
+    assert resposta.status_code == 422
@@ -0,0 +1,138 @@
+"""
+Header Idempotency-Key nas mutações de /orcamentos.
+
+Execute: python -m pytest test_idempotencia.py
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+from auth_routes import criar_access_token
+from database import SessionLocal
+from models import RespostaIdempotente
+
+
+def _novo_orcamento(orcamento):
+    return {
+        "contrato_id": orcamento["contrato_id"],
+        "projeto_id": orcamento["projeto_id"],
+        "itens": [
+            {"atividade_id": item["atividade_id"], "horas_estimadas": "3"}
+            for item in orcamento["itens"]
+        ],
+    }
+
+
+def _orcamentos_do_contrato(client, headers, contrato_id):
+    resposta = client.get(f"/orcamentos/?contrato_id={contrato_id}", headers=headers)
+    return len(resposta.json())
+
+
+def test_retentativa_devolve_resposta_guardada(
+    client, admin_headers, orcamento_rascunho
+):
+    headers = {**admin_headers, "Idempotency-Key": uuid.uuid4().hex}
+    corpo = _novo_orcamento(orcamento_rascunho)
+    antes = _orcamentos_do_contrato(
+        client, admin_headers, orcamento_rascunho["contrato_id"]
+    )
+
+    primeira = client.post("/orcamentos/", json=corpo, headers=headers)
+    segunda = client.post("/orcamentos/", json=corpo, headers=headers)
+
+    assert primeira.status_code == segunda.status_code == 201
+    assert segunda.headers["idempotent-replayed"] == "true"
+    assert segunda.json() == primeira.json()
+    depois = _orcamentos_do_contrato(
+        client, admin_headers, orcamento_rascunho["contrato_id"]
+    )
+    assert depois == antes + 1
+
+
+def test_mesma_chave_com_outro_corpo(client, admin_headers, orcamento_rascunho):
+    headers = {**admin_headers, "Idempotency-Key": uuid.uuid4().hex}
+    item = orcamento_rascunho["itens"][0]
+    caminho = f"/orcamentos/{orcamento_rascunho['id']}/itens/{item['id']}"
+
+    assert (
+        client.patch(caminho, json={"horas_estimadas": "4"}, headers=headers)
+    ).status_code == 200
+    resposta = client.patch(caminho, json={"horas_estimadas": "5"}, headers=headers)
+    assert resposta.status_code == 422
+
+
+def test_duplicatas_concorrentes_executam_uma_vez(
+    client, admin_headers, orcamento_rascunho
+):
+    headers = {**admin_headers, "Idempotency-Key": uuid.uuid4().hex}
+    corpo = _novo_orcamento(orcamento_rascunho)
+    antes = _orcamentos_do_contrato(
+        client, admin_headers, orcamento_rascunho["contrato_id"]
+    )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        respostas = list(
+            executor.map(
+                lambda _: client.post("/orcamentos/", json=corpo, headers=headers),
+                range(4),
+            )
+        )
+
+    assert {r.status_code for r in respostas} == {201}
+    assert len({r.json()["id"] for r in respostas}) == 1
+    depois = _orcamentos_do_contrato(
+        client, admin_headers, orcamento_rascunho["contrato_id"]
+    )
+    assert depois == antes + 1
+
+
+def test_reserva_abandonada_e_retomada(client, admin_headers, orcamento_rascunho):
+    """O processo da original morreu: a reserva vence e a retentativa executa."""
+    chave = uuid.uuid4().hex
+    usuario_id = client.get("/auth/me", headers=admin_headers).json()["id"]
+    db = SessionLocal()
+    try:
+        agora = datetime.now()
+        db.add(
+            RespostaIdempotente(
+                chave=chave,
+                dono=f"usuario:{usuario_id}",
+                impressao="original-que-morreu",
+                status="processando",
+                criado_em=agora - timedelta(minutes=5),
+                expira_em=agora - timedelta(minutes=4),
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    resposta = client.post(
+        "/orcamentos/",
+        json=_novo_orcamento(orcamento_rascunho),
+        headers={**admin_headers, "Idempotency-Key": chave},
+    )
+    assert resposta.status_code == 201
+
+
+def test_retentativa_com_token_renovado(client, admin_headers, orcamento_rascunho):
+    claims = jwt.get_unverified_claims(
+        admin_headers["Authorization"].removeprefix("Bearer ")
+    )
+    claims.pop("exp")
+    renovado = {
+        "Authorization": "Bearer "
+        + criar_access_token(claims, expires_delta=timedelta(minutes=7))
+    }
+    assert renovado != admin_headers
+
+    chave = {"Idempotency-Key": uuid.uuid4().hex}
+    corpo = _novo_orcamento(orcamento_rascunho)
+    primeira = client.post("/orcamentos/", json=corpo, headers={**admin_headers, **chave})
+    segunda = client.post("/orcamentos/", json=corpo, headers={**renovado, **chave})
+
+    assert segunda.headers["idempotent-replayed"] == "true"
+    assert segunda.json()["id"] == primeira.json()["id"]
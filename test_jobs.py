@@ -0,0 +1,121 @@
+"""
+Fila de jobs em segundo plano (tabela jobs + workers em thread).
+
+Execute: python -m pytest test_jobs.py
+"""
+
+import time
+
+import pytest
+
+from services import jobs
+
+
+def aguardar_job(client, headers, job_id, timeout=10):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+        if job["status"] in (jobs.CONCLUIDO, jobs.FALHOU):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"Job {job_id} não terminou em {timeout}s")
+
+
+def test_recalcular_orcamentos_retorna_202(client, admin_headers, orcamento_rascunho):
+    resposta = client.post(
+        f"/orcamentos/recalcular?contrato_id={orcamento_rascunho['contrato_id']}",
+        headers=admin_headers,
+    )
+    assert resposta.status_code == 202
+    assert resposta.headers["location"] == f"/jobs/{resposta.json()['id']}"
+
+    job = aguardar_job(client, admin_headers, resposta.json()["id"])
+    assert job["status"] == jobs.CONCLUIDO
+    assert job["progresso"] == 100
+    assert job["resultado"] == {"recalculados": 1}
+
+
+def test_job_com_erro_e_retentado_ate_falhar(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_BACKOFF_S", 0)
+
+    @jobs.tarefa("teste_sempre_falha")
+    def sempre_falha(db, parametros, progresso):
+        raise RuntimeError("falha de teste")
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        job_id = jobs.enfileirar(db, "teste_sempre_falha", max_tentativas=2).id
+    finally:
+        db.close()
+
+    job = aguardar_job(client, admin_headers, job_id)
+    assert job["status"] == jobs.FALHOU
+    assert job["tentativas"] == 2
+    assert "falha de teste" in job["erro"]
+
+
+def test_job_inexistente(client, admin_headers):
+    assert client.get("/jobs/999999", headers=admin_headers).status_code == 404
+
+
+def test_job_abandonado_e_retomado_por_um_so_worker():
+    from datetime import datetime, timedelta
+
+    from database import SessionLocal
+    from models import Job
+
+    jobs.fila_jobs.parar()  # só os dois workers do teste disputam o job
+    db = SessionLocal()
+    try:
+        parado = datetime.now() - timedelta(seconds=jobs.JOBS_TIMEOUT_S + 1)
+        job = Job(
+            tipo="recalcular_orcamentos",
+            status=jobs.EXECUTANDO,
+            parametros="{}",
+            progresso=0,
+            tentativas=1,
+            max_tentativas=3,
+            worker="morto:1",
+            criado_em=parado,
+            disponivel_em=parado,
+            atualizado_em=parado,
+        )
+        db.add(job)
+        db.commit()
+
+        # Os dois leram a mesma linha antes de qualquer UPDATE
+        lida = (job.id, jobs.EXECUTANDO, parado)
+        agora = datetime.now()
+        assert jobs.FilaJobs(workers=0)._tomar(db, *lida, agora)
+        assert not jobs.FilaJobs(workers=0)._tomar(db, *lida, agora)
+
+        db.refresh(job)
+        assert job.tentativas == 2
+        db.delete(job)
+        db.commit()
+    finally:
+        db.close()
+        jobs.fila_jobs.iniciar()
+
+
+def test_job_longo_sem_progresso_nao_e_retomado(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_TIMEOUT_S", 0.3)
+    monkeypatch.setattr(jobs.fila_jobs, "intervalo", 0.05)
+
+    @jobs.tarefa("teste_longo_sem_progresso")
+    def longo(db, parametros, progresso):
+        time.sleep(1.2)  # bem mais que JOBS_TIMEOUT_S
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        job_id = jobs.enfileirar(db, "teste_longo_sem_progresso").id
+    finally:
+        db.close()
+
+    job = aguardar_job(client, admin_headers, job_id)
+    assert job["status"] == jobs.CONCLUIDO
+    assert job["tentativas"] == 1  # o outro worker não o tomou
@@ -0,0 +1,121 @@
+"""
+Limite de taxa (token bucket) em login e registro.
+
+Execute: python -m pytest test_limite_taxa.py
+"""
+
+import asyncio
+import uuid
+
+import httpx
+
+from services import limite_taxa
+from services.limite_taxa import (
+    BaldesBanco,
+    BaldesMemoria,
+    GrupoRotas,
+    Limite,
+    RateLimitMiddleware,
+    ip_do_cliente,
+)
+
+
+def test_login_limitado_por_username(client, monkeypatch):
+    login = next(g for g in limite_taxa.GRUPOS if g.nome == "login")
+    monkeypatch.setattr(login, "por_usuario", Limite(2, 60))
+    alvo = f"alvo_{uuid.uuid4().hex[:8]}"
+
+    def tentar(username):
+        return client.post(
+            "/auth/login", json={"username": username, "password": "errada"}
+        )
+
+    assert [tentar(alvo).status_code for _ in range(2)] == [401, 401]
+    bloqueada = tentar(alvo.upper())  # mesma conta, outra caixa
+    assert bloqueada.status_code == 429
+    assert 1 <= int(bloqueada.headers["retry-after"]) <= 30
+
+    assert tentar(f"outro_{uuid.uuid4().hex[:8]}").status_code == 401
+
+
+def test_baldes_no_banco_repoem_fichas_com_o_tempo(client):
+    from database import SessionLocal
+    from models import BaldeLimiteTaxa
+
+    baldes = BaldesBanco()
+    chave = f"teste:ip:{uuid.uuid4().hex}"
+    limite = Limite(2, 60)
+
+    assert baldes.consumir(chave, limite) == 0
+    assert baldes.consumir(chave, limite) == 0
+    espera = baldes.consumir(chave, limite)
+    assert 0 < espera <= 30
+
+    db = SessionLocal()  # 30 s depois: uma ficha reposta
+    try:
+        balde = db.get(BaldeLimiteTaxa, chave)
+        balde.atualizado_em -= 30
+        db.commit()
+    finally:
+        db.close()
+    assert baldes.consumir(chave, limite) == 0
+    assert baldes.consumir(chave, limite) > 0
+
+    assert baldes.limpar_antigos(0) >= 1
+
+
+def test_baldes_em_memoria_limitados():
+    baldes = BaldesMemoria(maximo=2)
+    limite = Limite(1, 60)
+
+    assert baldes.consumir("a", limite) == 0
+    assert baldes.consumir("a", limite) > 0
+    baldes.consumir("b", limite)
+    baldes.consumir("c", limite)
+    assert len(baldes) == 2
+    assert baldes.consumir("a", limite) == 0  # descartado: volta cheio
+
+
+def test_ip_do_cliente_atras_de_proxies_confiaveis():
+    scope = {
+        "client": ("10.0.0.1", 5000),
+        "headers": [(b"x-forwarded-for", b"6.6.6.6, 200.1.1.1, 10.0.0.9")],
+    }
+    assert ip_do_cliente(scope, 0) == "10.0.0.1"
+    assert ip_do_cliente(scope, 1) == "10.0.0.9"
+    assert ip_do_cliente(scope, 2) == "200.1.1.1"  # 6.6.6.6 foi forjado
+    assert ip_do_cliente({**scope, "headers": []}, 1) == "10.0.0.1"
+
+
+def test_limite_por_ip_exige_proxies_configurados():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    grupos = (GrupoRotas("login", "POST", ("/auth/login",), por_ip=Limite(1, 60)),)
+
+    def statuses(proxies, ips):
+        middleware = RateLimitMiddleware(
+            app, grupos=grupos, baldes=BaldesMemoria(), proxies=proxies
+        )
+
+        async def cenario():
+            transporte = httpx.ASGITransport(app=middleware)
+            async with httpx.AsyncClient(
+                transport=transporte, base_url="http://teste"
+            ) as client:
+                return [
+                    (
+                        await client.post(
+                            "/auth/login", headers={"X-Forwarded-For": ip}
+                        )
+                    ).status_code
+                    for ip in ips
+                ]
+
+        return asyncio.run(cenario())
+
+    # Atrás de um proxy: cada cliente tem o seu balde
+    assert statuses("1", ["1.1.1.1", "2.2.2.2", "1.1.1.1"]) == [200, 200, 429]
+    # Sem a configuração, o limite por IP não é aplicado
+    assert statuses("", ["1.1.1.1", "1.1.1.1"]) == [200, 200]
@@ -0,0 +1,127 @@
+"""
+Reconstrução do orçamento no tempo a partir da auditoria, com checkpoints.
+
+Execute: python -m pytest test_reconstrucao.py
+"""
+
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from services import reconstrucao
+
+
+def instante():
+    time.sleep(0.01)
+    agora = datetime.now(timezone.utc)
+    time.sleep(0.01)
+    return agora.isoformat()
+
+
+def estado(client, headers, orcamento_id, em):
+    resposta = client.get(
+        f"/auditoria/orcamentos/{orcamento_id}/estado",
+        params={"em": em},
+        headers=headers,
+    )
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def resumo(dados, item_id):
+    horas = {i["item_orcamento_id"]: i["horas_estimadas"] for i in dados["itens"]}
+    return Decimal(horas[item_id]), Decimal(dados["desconto_percentual"])
+
+
+def test_reconstroi_com_e_sem_checkpoint(client, admin_headers, orcamento_rascunho):
+    from database import SessionLocal
+
+    h = admin_headers
+    orcamento_id = orcamento_rascunho["id"]
+    item_id = orcamento_rascunho["itens"][0]["id"]
+    url_item = f"/orcamentos/{orcamento_id}/itens/{item_id}"
+
+    t0 = instante()
+    client.patch(url_item, json={"horas_estimadas": "20"}, headers=h)
+    t1 = instante()
+    client.patch(
+        f"/orcamentos/{orcamento_id}/desconto",
+        json={"desconto_percentual": "5"},
+        headers=h,
+    )
+    t2 = instante()
+
+    esperado = {
+        t0: (Decimal("10"), Decimal("0")),
+        t1: (Decimal("20"), Decimal("0")),
+        t2: (Decimal("20"), Decimal("5")),
+    }
+    # Sem checkpoint: parte do estado atual e desfaz os eventos
+    for em, valores in esperado.items():
+        dados = estado(client, h, orcamento_id, em)
+        assert dados["checkpoint_id"] is None
+        assert resumo(dados, item_id) == valores
+
+    db = SessionLocal()
+    try:
+        reconstrucao.criar_checkpoints_auditoria(db, {"k": 1}, lambda p: None)
+    finally:
+        db.close()
+
+    client.patch(url_item, json={"horas_estimadas": "30"}, headers=h)
+    t3 = instante()
+    esperado[t3] = (Decimal("30"), Decimal("5"))
+
+    for em, valores in esperado.items():
+        dados = estado(client, h, orcamento_id, em)
+        assert dados["checkpoint_id"] is not None
+        assert resumo(dados, item_id) == valores
+
+    # Depois do checkpoint, só o evento seguinte é reaplicado
+    assert estado(client, h, orcamento_id, t3)["eventos_aplicados"] == 1
+
+
+def test_estado_de_orcamento_inexistente(client, admin_headers):
+    resposta = client.get(
+        "/auditoria/orcamentos/999999/estado",
+        params={"em": datetime.now(timezone.utc).isoformat()},
+        headers=admin_headers,
+    )
+    assert resposta.status_code == 404
+
+
+def test_job_de_checkpoint_agendado_periodicamente(
+    client, admin_headers, orcamento_rascunho, monkeypatch
+):
+    from database import SessionLocal
+    from models import Job
+    from services import jobs
+
+    monkeypatch.setattr(reconstrucao, "AUDITORIA_CHECKPOINT_EVENTOS", 1)
+    assert "criar_checkpoints_auditoria" in jobs._periodicas
+
+    def jobs_de_checkpoint():
+        db = SessionLocal()
+        try:
+            return (
+                db.query(Job).filter(Job.tipo == "criar_checkpoints_auditoria").count()
+            )
+        finally:
+            db.close()
+
+    # A escrita auditada não agenda nada (nem faz um segundo commit)
+    antes = jobs_de_checkpoint()
+    client.patch(
+        f"/orcamentos/{orcamento_rascunho['id']}/desconto",
+        json={"desconto_percentual": "3"},
+        headers=admin_headers,
+    )
+    assert jobs_de_checkpoint() == antes
+
+    jobs.fila_jobs.parar()  # o job fica pendente enquanto o teste confere
+    try:
+        assert jobs.fila_jobs.agendar_periodica("criar_checkpoints_auditoria")
+        assert jobs.fila_jobs.agendar_periodica("criar_checkpoints_auditoria") is None
+        assert jobs_de_checkpoint() == antes + 1
+    finally:
+        jobs.fila_jobs.iniciar()
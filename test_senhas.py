@@ -0,0 +1,157 @@
+"""
+Hash de senhas com scrypt num executor dedicado e limitado.
+
+Execute: python -m pytest test_senhas.py
+"""
+
+import hashlib
+import threading
+import uuid
+
+import pytest
+
+from services import senhas
+
+
+def test_login_troca_hash_legado_por_scrypt(client):
+    from database import SessionLocal
+    from models import Usuario
+
+    username = f"legado_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        db.add(
+            Usuario(
+                username=username,
+                password_hash=hashlib.sha256(b"segredo").hexdigest(),
+                admin=0,
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    errada = client.post(
+        "/auth/login", json={"username": username, "password": "outra"}
+    )
+    assert errada.status_code == 401
+
+    resposta = client.post(
+        "/auth/login", json={"username": username, "password": "segredo"}
+    )
+    assert resposta.status_code == 200, resposta.text
+
+    db = SessionLocal()
+    try:
+        gravado = db.query(Usuario).filter(Usuario.username == username).one()
+        assert gravado.password_hash.startswith("scrypt$")
+    finally:
+        db.close()
+
+    # O hash novo continua aceitando a mesma senha
+    resposta = client.post(
+        "/auth/login", json={"username": username, "password": "segredo"}
+    )
+    assert resposta.status_code == 200
+
+
+def test_registro_grava_scrypt_com_sal(client):
+    from database import SessionLocal
+    from models import Usuario
+
+    nomes = [f"novo_{uuid.uuid4().hex[:8]}" for _ in range(2)]
+    for nome in nomes:
+        resposta = client.post(
+            "/auth/registro", json={"username": nome, "password": "mesma-senha"}
+        )
+        assert resposta.status_code == 201, resposta.text
+
+    db = SessionLocal()
+    try:
+        hashes = [
+            u.password_hash
+            for u in db.query(Usuario).filter(Usuario.username.in_(nomes))
+        ]
+    finally:
+        db.close()
+    assert all(h.startswith("scrypt$") for h in hashes)
+    assert hashes[0] != hashes[1]  # sal aleatório
+    assert all(senhas.conferir("mesma-senha", h) == (True, None) for h in hashes)
+
+
+def test_executor_recusa_com_fila_cheia_ou_espera_esgotada():
+    executor = senhas.ExecutorSenhas(workers=1, fila_max=1, timeout_fila=0.05)
+    liberar = threading.Event()
+    ocupado = executor.submeter(liberar.wait)
+    na_fila = executor.submeter(lambda: "calculado")
+
+    with pytest.raises(senhas.SenhasOcupado):
+        executor.submeter(lambda: None)
+
+    liberar.wait(0.2)  # na_fila passa do prazo antes da thread ficar livre
+    liberar.set()
+    ocupado.result()
+    with pytest.raises(senhas.SenhasOcupado):
+        na_fila.result()
+    assert executor.pendentes() == 0
+
+
+def test_login_com_executor_saturado_devolve_503(client, monkeypatch):
+    cheio = senhas.ExecutorSenhas(workers=1, fila_max=0)
+    liberar = threading.Event()
+    cheio.submeter(liberar.wait)
+    monkeypatch.setattr(senhas, "executor_senhas", cheio)
+    try:
+        resposta = client.post(
+            "/auth/login", json={"username": "admin", "password": "admin123"}
+        )
+    finally:
+        liberar.set()
+
+    assert resposta.status_code == 503
+    assert resposta.headers["retry-after"] == "1"
+
+
+def test_login_de_usuario_inexistente_tambem_paga_o_kdf(client, monkeypatch):
+    conferidos = []
+    original = senhas.conferir
+
+    def conferir(senha, hash_gravado):
+        conferidos.append(hash_gravado)
+        return original(senha, hash_gravado)
+
+    monkeypatch.setattr(senhas, "conferir", conferir)
+    resposta = client.post(
+        "/auth/login",
+        json={"username": f"ninguem_{uuid.uuid4().hex[:8]}", "password": "x"},
+    )
+
+    assert resposta.status_code == 401
+    assert conferidos == [senhas.HASH_FICTICIO]
+    assert senhas.conferir("", senhas.HASH_FICTICIO) == (False, None)
+
+
+def test_registro_simultaneo_do_mesmo_username_responde_400(client, monkeypatch):
+    from database import SessionLocal
+    from models import Usuario
+
+    username = f"corrida_{uuid.uuid4().hex[:8]}"
+    original = senhas.gerar_hash
+
+    def gerar_hash(senha):
+        # O outro registro grava enquanto este calcula o KDF
+        db = SessionLocal()
+        try:
+            db.add(Usuario(username=username, password_hash="x", admin=0))
+            db.commit()
+        finally:
+            db.close()
+        return original(senha)
+
+    monkeypatch.setattr(senhas, "gerar_hash", gerar_hash)
+    resposta = client.post(
+        "/auth/registro", json={"username": username, "password": "segredo"}
+    )
+
+    assert resposta.status_code == 400
+    assert resposta.json()["detail"] == "Usuário já existe com esse username"